@@ -12,8 +12,26 @@ def create_app() -> Flask:
 
 	CORS(app)
 
+	from app import metrics
+
+	metrics.init_app(app)
+
+	if app.config["PROFILE_ENABLED"]:
+		from app import profiling
+
+		profiling.init_app(app)
+
+	if app.config["ADMISSION_ENABLED"]:
+		from app import admission
+
+		admission.init_app(app)
+
 	from app.routes import main
 
 	app.register_blueprint(main)
 
+	from app.services import inventory_service
+
+	inventory_service.start_planner()
+
 	return app
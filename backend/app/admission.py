@@ -0,0 +1,285 @@
+"""Admission control: per-user and per-class rate limits plus bounded concurrency pools."""
+
+import math
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from flask import Flask, g, jsonify, request
+
+from . import metrics
+
+
+ROUTE_CLASSES = ("chat", "write", "read")
+
+# Cheap endpoints that must stay answerable under overload, and the change feed,
+# whose long-lived streams are bounded by CHANGE_FEED_MAX_SUBSCRIBERS instead.
+EXEMPT_ENDPOINTS = frozenset({"main.health_check", "main.change_events", "metrics", "static"})
+
+
+class Rejected(Exception):
+	"""A request turned away with ``status`` (429 or 503) and a ``Retry-After`` hint in seconds."""
+
+	def __init__(self, status: int, message: str, retry_after: float, reason: str) -> None:
+		super().__init__(message)
+		self.status = status
+		self.retry_after = max(1, math.ceil(retry_after))
+		self.reason = reason
+
+
+class TokenBucket:
+	"""Classic token bucket holding up to ``burst`` tokens, refilled at ``rate`` per second."""
+
+	__slots__ = ("rate", "burst", "tokens", "updated")
+
+	def __init__(self, rate: float, burst: float, now: float) -> None:
+		self.rate = rate
+		self.burst = burst
+		self.tokens = burst
+		self.updated = now
+
+	def take(self, now: float) -> float:
+		"""Spend one token and return 0, or return the seconds until one is available."""
+
+		self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+		self.updated = now
+		if self.tokens >= 1:
+			self.tokens -= 1
+			return 0.0
+		return (1 - self.tokens) / self.rate
+
+
+class RateLimiter:
+	"""Token buckets by key, keeping at most ``max_keys`` (least recently used are dropped)."""
+
+	def __init__(self, rate: float, burst: float, max_keys: int = 10000) -> None:
+		if rate <= 0 or burst < 1:
+			raise ValueError("Rate must be positive and burst at least 1")
+		self.rate = rate
+		self.burst = burst
+		self.max_keys = max_keys
+		self._buckets: OrderedDict = OrderedDict()
+		self._lock = threading.Lock()
+
+	def check(self, key: str = "") -> float:
+		"""0 if ``key`` may proceed now, else the seconds it should wait."""
+
+		now = time.monotonic()
+		with self._lock:
+			bucket = self._buckets.get(key)
+			if bucket is None:
+				bucket = self._buckets[key] = TokenBucket(self.rate, self.burst, now)
+				while len(self._buckets) > self.max_keys:
+					self._buckets.popitem(last=False)
+			else:
+				self._buckets.move_to_end(key)
+			return bucket.take(now)
+
+
+class ConcurrencyLimiter:
+	"""At most ``max_active`` holders; up to ``max_queue`` more wait, each until its deadline.
+
+	A request arriving to a full queue, or still queued when its deadline passes,
+	is rejected with 503 rather than left to pile up behind work it cannot
+	overtake.
+	"""
+
+	def __init__(self, name: str, max_active: int, max_queue: int, max_wait: float) -> None:
+		if max_active <= 0 or max_queue < 0:
+			raise ValueError("Concurrency must be positive and queue length non-negative")
+		self.name = name
+		self.max_active = max_active
+		self.max_queue = max_queue
+		self.max_wait = max_wait
+		self._cond = threading.Condition(threading.Lock())
+		self.active = 0
+		self.waiting = 0
+
+		self.admitted = 0
+		self.queue_full = 0
+		self.timed_out = 0
+
+	def acquire(self, timeout: Optional[float] = None) -> float:
+		"""Take a slot and return the seconds spent queued; raise Rejected if none frees in time."""
+
+		wait = self.max_wait if timeout is None else min(timeout, self.max_wait)
+		with self._cond:
+			if self.active < self.max_active and not self.waiting:
+				self.active += 1
+				self.admitted += 1
+				return 0.0
+			if self.waiting >= self.max_queue:
+				self.queue_full += 1
+				raise Rejected(503, f"{self.name} is at capacity", self.max_wait, "queue_full")
+
+			started = time.monotonic()
+			deadline = started + wait
+			self.waiting += 1
+			try:
+				while self.active >= self.max_active:
+					remaining = deadline - time.monotonic()
+					if remaining <= 0:
+						self.timed_out += 1
+						raise Rejected(503, f"{self.name} is at capacity", self.max_wait, "deadline")
+					self._cond.wait(remaining)
+				self.active += 1
+				self.admitted += 1
+			finally:
+				self.waiting -= 1
+			return time.monotonic() - started
+
+	def release(self) -> None:
+		with self._cond:
+			self.active -= 1
+			self._cond.notify()
+
+	def stats(self) -> dict:
+		with self._cond:
+			return {
+				"max_active": self.max_active,
+				"max_queue": self.max_queue,
+				"active": self.active,
+				"waiting": self.waiting,
+				"admitted": self.admitted,
+				"queue_full": self.queue_full,
+				"timed_out": self.timed_out,
+			}
+
+
+class AdmissionController:
+	"""Rate limits and a separate concurrency pool for each route class.
+
+	Chat streams, writes and reads each get their own pool, so a flood of slow
+	chat streams or lock-bound writes cannot take the slots that validation
+	and other reads need. Rate limits apply per class and per user; a limit of
+	0 is off.
+	"""
+
+	def __init__(self, config: dict) -> None:
+		self.queue_timeout = config["ADMISSION_QUEUE_TIMEOUT"]
+		self.pools: dict = {}
+		self.class_limits: dict = {}
+		self.user_limits: dict = {}
+		for route_class in ROUTE_CLASSES:
+			prefix = f"ADMISSION_{route_class.upper()}_"
+			self.pools[route_class] = ConcurrencyLimiter(
+				route_class, config[prefix + "CONCURRENCY"], config[prefix + "QUEUE"], self.queue_timeout
+			)
+			rate = config[prefix + "RATE"]
+			if rate > 0:
+				# One second's worth of burst for the class as a whole.
+				self.class_limits[route_class] = RateLimiter(rate, max(1.0, rate), max_keys=1)
+			user_rate = config[prefix + "USER_RATE"]
+			if user_rate > 0:
+				self.user_limits[route_class] = RateLimiter(
+					user_rate, config[prefix + "USER_BURST"], config["ADMISSION_MAX_RATE_KEYS"]
+				)
+
+	@staticmethod
+	def classify(endpoint: Optional[str], method: str) -> Optional[str]:
+		"""Route class of a request, or None if it is exempt."""
+
+		if endpoint in EXEMPT_ENDPOINTS or method == "OPTIONS":
+			return None
+		if endpoint == "main.chat":
+			return "chat"
+		return "read" if method in ("GET", "HEAD") else "write"
+
+	def check_rate(self, route_class: str, user: str) -> None:
+		"""Raise a 429 Rejected if the class or this user is over its rate."""
+
+		for limiter, key, scope in (
+			(self.class_limits.get(route_class), "", "class"),
+			(self.user_limits.get(route_class), user, "user"),
+		):
+			if limiter is None:
+				continue
+			retry_after = limiter.check(key)
+			if retry_after:
+				raise Rejected(429, f"Too many {route_class} requests", retry_after, f"{scope}_rate")
+
+	def admit(self, route_class: str, user: str) -> ConcurrencyLimiter:
+		"""Apply the rate limits, then take a slot in the class's pool; the caller must release it."""
+
+		self.check_rate(route_class, user)
+		pool = self.pools[route_class]
+		waited = pool.acquire()
+		metrics.ADMISSION_QUEUE_SECONDS.labels(route_class).observe(waited)
+		return pool
+
+	def stats(self) -> dict:
+		return {route_class: pool.stats() for route_class, pool in self.pools.items()}
+
+
+def rejection_body(err: Rejected, route_class: str) -> dict:
+	"""Count the rejection and return its JSON payload."""
+
+	metrics.ADMISSION_REJECTIONS.labels(route_class, err.reason).inc()
+	return {"error": str(err)}
+
+
+def rejection_response(err: Rejected, route_class: str):
+	response = jsonify(rejection_body(err, route_class))
+	response.status_code = err.status
+	response.headers["Retry-After"] = str(err.retry_after)
+	return response
+
+
+def _request_user() -> str:
+	data = request.get_json(silent=True)
+	if isinstance(data, dict):
+		user = data.get("user_id") or data.get("manager_id")
+		if user:
+			return str(user)
+	return request.args.get("user_id") or request.args.get("manager_id") or request.remote_addr or ""
+
+
+def _release() -> None:
+	slot = g.pop("_admission_slot", None)
+	if slot is not None:
+		pool, route_class = slot
+		pool.release()
+		metrics.ADMISSION_ACTIVE.labels(route_class).dec()
+
+
+def init_app(app: Flask) -> None:
+	"""Admit every non-exempt request through ``app.extensions["admission"]``.
+
+	Rejections are answered with 429 (rate) or 503 (capacity) and a
+	``Retry-After`` header. A streamed response keeps its slot until the stream
+	is closed, so open chat streams count against the chat pool.
+	"""
+
+	controller = app.extensions["admission"] = AdmissionController(app.config)
+
+	@app.before_request
+	def _admit():
+		route_class = controller.classify(request.endpoint, request.method)
+		if route_class is None:
+			return None
+		try:
+			pool = controller.admit(route_class, _request_user())
+		except Rejected as err:
+			return rejection_response(err, route_class)
+		g._admission_slot = (pool, route_class)
+		metrics.ADMISSION_ACTIVE.labels(route_class).inc()
+		return None
+
+	@app.after_request
+	def _hand_off_stream(response):
+		slot = g.get("_admission_slot")
+		if slot is not None and response.is_streamed:
+			g._admission_slot = None
+			pool, route_class = slot
+
+			def release() -> None:
+				pool.release()
+				metrics.ADMISSION_ACTIVE.labels(route_class).dec()
+
+			response.call_on_close(release)
+		return response
+
+	@app.teardown_request
+	def _release_slot(_exc) -> None:
+		_release()
@@ -0,0 +1,324 @@
+"""ASGI application that streams /chat and /api/events asynchronously and serves the rest through Flask."""
+
+import asyncio
+import json
+import sqlite3
+from typing import Optional
+from urllib.parse import parse_qs
+
+import httpx
+from asgiref.wsgi import WsgiToAsgi
+from flask import Flask
+from openai import AsyncOpenAI
+
+from app import db
+from app.admission import Rejected, rejection_body
+from app.services import change_feed, chat_service
+
+
+def _header(scope, name: bytes) -> Optional[str]:
+	for key, value in scope.get("headers", ()):
+		if key.lower() == name:
+			return value.decode("latin-1")
+	return None
+
+
+def _request_branch(scope) -> Optional[str]:
+	"""Branch from the ``X-Branch`` header or ``?branch=``, matching the Flask routes."""
+
+	branch = _header(scope, b"x-branch")
+	if branch is not None:
+		return branch
+	values = parse_qs(scope.get("query_string", b"").decode("latin-1")).get("branch")
+	return values[0] if values else None
+
+
+class AsyncChatApp:
+	"""Serve ``POST /chat`` on the event loop and delegate every other request to Flask.
+
+	All chat streams share one pooled ``httpx.AsyncClient``. A semaphore caps the
+	number of concurrent upstream streams; requests that cannot get a slot within
+	``CHAT_QUEUE_TIMEOUT`` seconds are rejected with 503. Each SSE event is awaited
+	through ``send`` so a slow client applies backpressure to the upstream read,
+	and a client disconnect cancels the upstream stream.
+
+	``GET /api/events`` is also served here, so each change feed subscriber is
+	an idle task woken by the broker rather than a blocked WSGI thread.
+	"""
+
+	def __init__(
+		self,
+		flask_app: Flask,
+		api_key: Optional[str] = None,
+		base_url: Optional[str] = None,
+		model: Optional[str] = None,
+	) -> None:
+		self.flask_app = flask_app
+		self.wsgi = WsgiToAsgi(flask_app)
+		self.api_key = api_key or chat_service.OPENAI_API_KEY
+		self.base_url = base_url or chat_service.OPENAI_BASE_URL
+		self.model = model or chat_service.OPENAI_MODEL
+		self.max_streams = flask_app.config["CHAT_MAX_STREAMS"]
+		self.queue_timeout = flask_app.config["CHAT_QUEUE_TIMEOUT"]
+		self.upstream_timeout = flask_app.config["CHAT_UPSTREAM_TIMEOUT"]
+
+		self._http: Optional[httpx.AsyncClient] = None
+		self._client: Optional[AsyncOpenAI] = None
+		self._semaphore: Optional[asyncio.Semaphore] = None
+
+		self.active_streams = 0
+		self.completed_streams = 0
+		self.rejected_streams = 0
+		self.disconnected_streams = 0
+		self.cached_streams = 0
+
+	def _ensure_client(self) -> AsyncOpenAI:
+		# Created lazily so the pool and semaphore bind to the serving event loop.
+		if self._client is None:
+			self._http = httpx.AsyncClient(
+				limits=httpx.Limits(
+					max_connections=self.max_streams,
+					max_keepalive_connections=self.max_streams,
+				),
+				timeout=httpx.Timeout(self.upstream_timeout, connect=5.0),
+			)
+			self._client = AsyncOpenAI(api_key=self.api_key, base_url=self.base_url, http_client=self._http)
+			self._semaphore = asyncio.Semaphore(self.max_streams)
+		return self._client
+
+	async def aclose(self) -> None:
+		if self._http is not None:
+			await self._http.aclose()
+		self._http = None
+		self._client = None
+		self._semaphore = None
+
+	def stats(self) -> dict:
+		return {
+			"max_streams": self.max_streams,
+			"active_streams": self.active_streams,
+			"completed_streams": self.completed_streams,
+			"rejected_streams": self.rejected_streams,
+			"disconnected_streams": self.disconnected_streams,
+			"cached_streams": self.cached_streams,
+			"response_cache": chat_service.response_cache.stats(),
+			"conversations": chat_service.conversations.stats(),
+		}
+
+	async def __call__(self, scope, receive, send) -> None:
+		if scope["type"] == "lifespan":
+			await self._lifespan(receive, send)
+		elif scope["type"] == "http" and scope["path"] == "/chat" and scope["method"] == "POST":
+			await self._chat(scope, receive, send)
+		elif scope["type"] == "http" and scope["path"] == "/api/events" and scope["method"] == "GET":
+			await self._events(scope, receive, send)
+		else:
+			await self.wsgi(scope, receive, send)
+
+	async def _lifespan(self, receive, send) -> None:
+		while True:
+			message = await receive()
+			if message["type"] == "lifespan.startup":
+				await send({"type": "lifespan.startup.complete"})
+			elif message["type"] == "lifespan.shutdown":
+				await self.aclose()
+				await send({"type": "lifespan.shutdown.complete"})
+				return
+
+	async def _send_json(self, send, status: int, payload: dict, headers: tuple = ()) -> None:
+		body = json.dumps(payload).encode()
+		await send(
+			{
+				"type": "http.response.start",
+				"status": status,
+				"headers": [
+					(b"content-type", b"application/json"),
+					(b"content-length", str(len(body)).encode()),
+					(b"access-control-allow-origin", b"*"),
+					*headers,
+				],
+			}
+		)
+		await send({"type": "http.response.body", "body": body})
+
+	async def _start_stream(self, send) -> None:
+		await send(
+			{
+				"type": "http.response.start",
+				"status": 200,
+				"headers": [
+					(b"content-type", b"text/event-stream"),
+					(b"cache-control", b"no-cache"),
+					(b"x-accel-buffering", b"no"),
+					(b"access-control-allow-origin", b"*"),
+				],
+			}
+		)
+
+	async def _events(self, scope, receive, send) -> None:
+		loop = asyncio.get_running_loop()
+		wake = asyncio.Event()
+		query = parse_qs(scope.get("query_string", b"").decode("latin-1"))
+		try:
+			token = db.set_branch(_request_branch(scope))
+		except ValueError as err:
+			await self._send_json(send, 400, {"error": str(err)})
+			return
+
+		try:
+			topics = change_feed.parse_topics(query.get("topic", []))
+			# The role lookup may read SQLite; the worker thread inherits the branch bound above.
+			await asyncio.to_thread(change_feed.check_access, query.get("user_id", [""])[0], topics)
+			subscription = change_feed.broker.subscribe(
+				topics, _header(scope, b"last-event-id"), notify=lambda: loop.call_soon_threadsafe(wake.set)
+			)
+		except (ValueError, PermissionError) as err:
+			await self._send_json(send, 400, {"error": str(err)})
+			return
+		except sqlite3.Error as err:
+			await self._send_json(send, 500, {"error": f"database error: {err}"})
+			return
+		except change_feed.FeedFull as err:
+			await self._send_json(send, 503, {"error": str(err)}, ((b"retry-after", b"5"),))
+			return
+		finally:
+			db.reset_branch(token)
+
+		async def watch_disconnect() -> None:
+			while (await receive())["type"] != "http.disconnect":
+				pass
+
+		watch_task = asyncio.ensure_future(watch_disconnect())
+		try:
+			with subscription:
+				await self._start_stream(send)
+				chunk = change_feed.HEARTBEAT
+				while not watch_task.done():
+					if chunk:
+						await send({"type": "http.response.body", "body": chunk.encode(), "more_body": True})
+					# Cleared before draining, so a publish racing the drain still wakes the next wait.
+					wake.clear()
+					chunk = change_feed.render(*subscription.drain())
+					if chunk:
+						continue
+					wake_task = asyncio.ensure_future(wake.wait())
+					done, _pending = await asyncio.wait(
+						{wake_task, watch_task}, timeout=change_feed.CHANGE_FEED_HEARTBEAT, return_when=asyncio.FIRST_COMPLETED
+					)
+					wake_task.cancel()
+					if not done:
+						chunk = change_feed.HEARTBEAT
+		finally:
+			watch_task.cancel()
+			await asyncio.gather(watch_task, return_exceptions=True)
+
+	async def _chat(self, scope, receive, send) -> None:
+		body = b""
+		while True:
+			message = await receive()
+			if message["type"] == "http.disconnect":
+				return
+			body += message.get("body", b"")
+			if not message.get("more_body"):
+				break
+
+		try:
+			data = json.loads(body or b"{}")
+		except ValueError:
+			data = {}
+		if not isinstance(data, dict):
+			data = {}
+		user_message = (data.get("message", "") or "").strip()
+		user_id = (data.get("user_id", "") or "").strip() or None
+		session_id = data.get("session_id")
+
+		if not user_message:
+			await self._send_json(send, 400, {"error": "message is required"})
+			return
+		if not self.api_key or not self.model:
+			await self._send_json(send, 500, {"error": "OpenAI API is not configured"})
+			return
+
+		# The stream semaphore below is the chat concurrency pool here; only the rate limits apply.
+		admission = self.flask_app.extensions.get("admission")
+		if admission is not None:
+			client_addr = (scope.get("client") or ("",))[0]
+			try:
+				admission.check_rate("chat", user_id or client_addr)
+			except Rejected as err:
+				await self._send_json(
+					send, err.status, rejection_body(err, "chat"), ((b"retry-after", str(err.retry_after).encode()),)
+				)
+				return
+
+		try:
+			token = db.set_branch(_request_branch(scope))
+		except ValueError as err:
+			await self._send_json(send, 400, {"error": str(err)})
+			return
+
+		# Tool calls read the shard bound here; the upstream tasks below inherit it.
+		try:
+			await self._reply(receive, send, user_message, user_id, session_id)
+		finally:
+			db.reset_branch(token)
+
+	async def _reply(self, receive, send, user_message: str, user_id: Optional[str], session_id) -> None:
+		# Sessions and the reply cache may be SQLite-backed; keep their I/O off the event loop.
+		conversation = await asyncio.to_thread(
+			chat_service.open_session, None if session_id is None else str(session_id).strip()
+		)
+		cacheable = chat_service.is_cacheable(conversation)
+		cached = await asyncio.to_thread(chat_service.lookup_cached, user_message, self.model) if cacheable else None
+		if cached is not None:
+			# Cache hits never touch upstream, so they do not need a stream slot.
+			await self._start_stream(send)
+			events = list(chat_service.replay_events(cached))
+			if conversation is not None:
+				await asyncio.to_thread(chat_service.conversations.record, conversation.id, user_message, "".join(cached))
+				events.insert(0, chat_service.session_event(conversation))
+			for event in events:
+				await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+			await send({"type": "http.response.body", "body": b"", "more_body": False})
+			self.cached_streams += 1
+			return
+
+		client = self._ensure_client()
+		try:
+			await asyncio.wait_for(self._semaphore.acquire(), self.queue_timeout)
+		except asyncio.TimeoutError:
+			self.rejected_streams += 1
+			retry_after = str(max(1, int(self.queue_timeout))).encode()
+			await self._send_json(send, 503, {"error": "chat is at capacity"}, ((b"retry-after", retry_after),))
+			return
+
+		self.active_streams += 1
+		try:
+			await self._start_stream(send)
+
+			async def pump() -> None:
+				async for event in chat_service.astream_reply(
+					client, self.model, user_message, check_cache=False, user_id=user_id, conversation=conversation
+				):
+					await send({"type": "http.response.body", "body": event.encode(), "more_body": True})
+
+			async def watch_disconnect() -> None:
+				while (await receive())["type"] != "http.disconnect":
+					pass
+
+			pump_task = asyncio.ensure_future(pump())
+			watch_task = asyncio.ensure_future(watch_disconnect())
+			done, _pending = await asyncio.wait({pump_task, watch_task}, return_when=asyncio.FIRST_COMPLETED)
+
+			if pump_task in done:
+				watch_task.cancel()
+				pump_task.result()
+				await send({"type": "http.response.body", "body": b"", "more_body": False})
+				self.completed_streams += 1
+			else:
+				pump_task.cancel()
+				self.disconnected_streams += 1
+			await asyncio.gather(pump_task, watch_task, return_exceptions=True)
+		finally:
+			self.active_streams -= 1
+			self._semaphore.release()
@@ -0,0 +1,718 @@
+"""Shared SQLite data-access layer with a bounded connection pool."""
+
+import contextvars
+import os
+import queue
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Iterator, Optional
+
+from . import metrics
+
+
+DB_PATH = Path(os.getenv("PHARMACY_DB_PATH") or Path(__file__).resolve().parents[1] / "data" / "pharmacy.db")
+
+DEFAULT_BRANCH = os.getenv("PHARMACY_BRANCH", "main")
+BRANCHES = tuple(
+	dict.fromkeys([DEFAULT_BRANCH, *filter(None, (b.strip() for b in os.getenv("PHARMACY_BRANCHES", "").split(",")))])
+)
+BRANCH_DB_DIR = Path(os.getenv("PHARMACY_BRANCH_DIR") or DB_PATH.parent)
+
+POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "5.0"))
+BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+SYNCHRONOUS = os.getenv("DB_SYNCHRONOUS", "NORMAL")
+
+SINGLE_WRITER = os.getenv("DB_SINGLE_WRITER", "0") == "1"
+WRITE_BATCH_SIZE = int(os.getenv("DB_WRITE_BATCH_SIZE", "64"))
+WRITE_BATCH_WAIT = float(os.getenv("DB_WRITE_BATCH_WAIT", "0.001"))
+
+ConnectHook = Callable[[sqlite3.Connection], None]
+
+_trace = threading.local()
+_commit_hooks = threading.local()
+_branch: contextvars.ContextVar = contextvars.ContextVar("pharmacy_branch", default=None)
+_BRANCH_ID = re.compile(r"^[A-Za-z0-9_-]{1,64}$")
+
+
+def default_pragmas() -> tuple:
+	"""Pragmas applied once to every new pooled connection."""
+
+	return (
+		"PRAGMA foreign_keys = ON;",
+		"PRAGMA journal_mode = WAL;",
+		f"PRAGMA synchronous = {SYNCHRONOUS};",
+		f"PRAGMA busy_timeout = {BUSY_TIMEOUT_MS};",
+	)
+
+
+class PoolTimeout(sqlite3.OperationalError):
+	"""Raised when no pooled connection became free within the timeout."""
+
+
+class ConnectionPool:
+	"""Bounded, thread-safe pool of SQLite connections to one database file.
+
+	Connections are created lazily up to ``max_size`` and reused LIFO so hot
+	connections keep a warm page cache. Pragmas and connect hooks run once
+	per physical connection rather than once per request. If the database file
+	is replaced on disk (e.g. by ``init_db.initialize_database``) idle connections
+	pointing at the old file are discarded on checkout.
+	"""
+
+	def __init__(
+		self,
+		db_path: Path,
+		max_size: int = POOL_SIZE,
+		timeout: float = POOL_TIMEOUT,
+		pragmas: Optional[tuple] = None,
+	) -> None:
+		if max_size <= 0:
+			raise ValueError("Pool size must be positive")
+
+		self.db_path = Path(db_path)
+		self.max_size = max_size
+		self.timeout = timeout
+		self.pragmas = default_pragmas() if pragmas is None else tuple(pragmas)
+
+		self._hooks: list = []
+		self._idle: list = []
+		self._identity: dict = {}
+		self._size = 0
+		self._cond = threading.Condition(threading.Lock())
+		self._closed = False
+
+		self._checkouts = 0
+		self._waits = 0
+		self._wait_time = 0.0
+		self._created = 0
+		self._discarded = 0
+
+	def add_connect_hook(self, hook: ConnectHook) -> None:
+		"""Register a callable run once on every newly opened connection."""
+
+		with self._cond:
+			self._hooks.append(hook)
+
+	def file_identity(self) -> Optional[tuple]:
+		"""``(st_dev, st_ino)`` of the database file, or None if it does not exist."""
+
+		try:
+			stat = os.stat(self.db_path)
+		except FileNotFoundError:
+			return None
+		return (stat.st_dev, stat.st_ino)
+
+	def _open(self) -> sqlite3.Connection:
+		conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+		try:
+			for pragma in self.pragmas:
+				conn.execute(pragma)
+			for hook in list(self._hooks):
+				hook(conn)
+		except Exception:
+			conn.close()
+			raise
+		self._identity[id(conn)] = self.file_identity()
+		return conn
+
+	def _discard(self, conn: sqlite3.Connection) -> None:
+		self._identity.pop(id(conn), None)
+		try:
+			conn.close()
+		except sqlite3.Error:
+			pass
+
+	def acquire(self) -> sqlite3.Connection:
+		"""Check out a connection, blocking up to ``timeout`` seconds if the pool is exhausted."""
+
+		deadline = None
+		with self._cond:
+			while True:
+				if self._closed:
+					raise sqlite3.ProgrammingError("Connection pool is closed")
+				if self._idle:
+					conn = self._idle.pop()
+					break
+				if self._size < self.max_size:
+					self._size += 1
+					conn = None
+					break
+
+				if deadline is None:
+					self._waits += 1
+					deadline = time.monotonic() + self.timeout
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					raise PoolTimeout("Timed out waiting for a database connection")
+				started = time.monotonic()
+				self._cond.wait(remaining)
+				self._wait_time += time.monotonic() - started
+
+			self._checkouts += 1
+
+		if conn is not None and self._identity.get(id(conn)) != self.file_identity():
+			self._discard(conn)
+			with self._cond:
+				self._discarded += 1
+			conn = None
+
+		if conn is None:
+			try:
+				conn = self._open()
+			except Exception:
+				with self._cond:
+					self._size -= 1
+					self._cond.notify()
+				raise
+			with self._cond:
+				self._created += 1
+
+		return conn
+
+	def release(self, conn: sqlite3.Connection) -> None:
+		"""Return a connection to the pool, rolling back any open transaction."""
+
+		try:
+			if conn.in_transaction:
+				conn.rollback()
+		except sqlite3.Error:
+			self._discard(conn)
+			with self._cond:
+				self._size -= 1
+				self._discarded += 1
+				self._cond.notify()
+			return
+
+		with self._cond:
+			if self._closed:
+				self._size -= 1
+				self._discard(conn)
+			else:
+				self._idle.append(conn)
+			self._cond.notify()
+
+	@contextmanager
+	def connection(self) -> Iterator[sqlite3.Connection]:
+		"""Context manager yielding a pooled connection and returning it afterwards."""
+
+		conn = self.acquire()
+		tracer = getattr(_trace, "callback", None)
+		if tracer is not None:
+			conn.set_trace_callback(tracer)
+		try:
+			yield conn
+		finally:
+			if tracer is not None:
+				conn.set_trace_callback(None)
+				tracer(None)
+			self.release(conn)
+
+	@contextmanager
+	def transaction(self, immediate: bool = False) -> Iterator[sqlite3.Connection]:
+		"""Yield a pooled connection inside an explicit transaction.
+
+		Commits on success and rolls back on any exception. ``immediate`` takes the
+		write lock up front so read-then-write sequences cannot be interleaved by
+		another writer.
+		"""
+
+		with self.connection() as conn:
+			with metrics.Timer(metrics.DB_LOCK_WAIT_SECONDS.labels("immediate" if immediate else "deferred")):
+				conn.execute("BEGIN IMMEDIATE;" if immediate else "BEGIN;")
+			try:
+				yield conn
+			except BaseException:
+				conn.rollback()
+				raise
+			conn.commit()
+
+	def stats(self) -> dict:
+		"""Snapshot of pool counters."""
+
+		with self._cond:
+			return {
+				"max_size": self.max_size,
+				"size": self._size,
+				"idle": len(self._idle),
+				"in_use": self._size - len(self._idle),
+				"checkouts": self._checkouts,
+				"waits": self._waits,
+				"wait_time_seconds": round(self._wait_time, 6),
+				"created": self._created,
+				"discarded": self._discarded,
+			}
+
+	def close(self) -> None:
+		"""Close idle connections; checked-out ones are closed when released."""
+
+		with self._cond:
+			self._closed = True
+			idle, self._idle = self._idle, []
+			self._size -= len(idle)
+			self._cond.notify_all()
+		for conn in idle:
+			self._discard(conn)
+
+
+class WriteQueue:
+	"""Single writer thread that applies queued mutations with group commit.
+
+	Each submitted ``fn(conn, *args)`` runs under its own savepoint inside a
+	shared ``BEGIN IMMEDIATE`` transaction, so one failing job is rolled back
+	alone while the rest of its batch commits together. A batch is whatever is
+	queued when the writer wakes, plus anything arriving within ``max_wait``
+	seconds, capped at ``max_batch`` jobs.
+	"""
+
+	def __init__(
+		self,
+		pool: Optional[ConnectionPool] = None,
+		max_batch: int = WRITE_BATCH_SIZE,
+		max_wait: float = WRITE_BATCH_WAIT,
+		thread_name: str = "db-writer",
+	) -> None:
+		if max_batch <= 0:
+			raise ValueError("Write batch size must be positive")
+
+		self._pool = pool
+		self.thread_name = thread_name
+		self.max_batch = max_batch
+		self.max_wait = max_wait
+		self._queue: queue.SimpleQueue = queue.SimpleQueue()
+		self._thread: Optional[threading.Thread] = None
+		self._lock = threading.Lock()
+		self._closed = False
+
+		self.batches = 0
+		self.jobs = 0
+		self.failed_jobs = 0
+		self.failed_commits = 0
+		self.largest_batch = 0
+
+	@property
+	def pool(self) -> ConnectionPool:
+		return self._pool or get_pool()
+
+	def submit(self, fn: Callable[..., Any], *args, name: Optional[str] = None) -> Future:
+		"""Queue ``fn(conn, *args)`` and return a future for its result.
+
+		``fn`` runs in a copy of the caller's context, so it sees the caller's branch.
+		"""
+
+		if threading.current_thread() is self._thread:
+			raise RuntimeError("Cannot queue a write from inside a queued write")
+
+		future: Future = Future()
+		with self._lock:
+			if self._closed:
+				raise RuntimeError("Write queue is closed")
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._run, name=self.thread_name, daemon=True)
+				self._thread.start()
+			self._queue.put((fn, args, future, name or fn.__name__, contextvars.copy_context()))
+		return future
+
+	def _collect(self, first: tuple) -> list:
+		batch = [first]
+		deadline = time.monotonic() + self.max_wait
+		while len(batch) < self.max_batch:
+			try:
+				job = self._queue.get_nowait()
+			except queue.Empty:
+				remaining = deadline - time.monotonic()
+				if remaining <= 0:
+					break
+				try:
+					job = self._queue.get(timeout=remaining)
+				except queue.Empty:
+					break
+			if job is None:
+				self._queue.put(None)
+				break
+			batch.append(job)
+		return batch
+
+	def _run(self) -> None:
+		while True:
+			job = self._queue.get()
+			if job is None:
+				return
+			batch = [job for job in self._collect(job) if job[2].set_running_or_notify_cancel()]
+			if batch:
+				self._apply(batch)
+
+	def _apply(self, batch: list) -> None:
+		outcomes = []
+		try:
+			with self.pool.connection() as conn:
+				with metrics.Timer(metrics.DB_LOCK_WAIT_SECONDS.labels("queued")):
+					conn.execute("BEGIN IMMEDIATE;")
+				for fn, args, future, name, context in batch:
+					conn.execute("SAVEPOINT queued_write;")
+					try:
+						with _collect_commit_hooks() as hooks, metrics.time_query(name):
+							result = context.run(fn, conn, *args)
+					except Exception as err:  # noqa: BLE001 - delivered to the caller
+						conn.execute("ROLLBACK TO queued_write;")
+						conn.execute("RELEASE queued_write;")
+						outcomes.append((future, None, err, ()))
+						continue
+					conn.execute("RELEASE queued_write;")
+					outcomes.append((future, result, None, hooks))
+				conn.commit()
+		except Exception as err:  # noqa: BLE001 - the whole batch failed to commit
+			self.failed_commits += 1
+			for _fn, _args, future, _name, _context in batch:
+				future.set_exception(err)
+			return
+
+		self.batches += 1
+		self.jobs += len(batch)
+		self.largest_batch = max(self.largest_batch, len(batch))
+		for future, result, error, hooks in outcomes:
+			if error is None:
+				_run_commit_hooks(hooks)
+				future.set_result(result)
+			else:
+				self.failed_jobs += 1
+				future.set_exception(error)
+
+	def stats(self) -> dict:
+		return {
+			"batches": self.batches,
+			"jobs": self.jobs,
+			"failed_jobs": self.failed_jobs,
+			"failed_commits": self.failed_commits,
+			"largest_batch": self.largest_batch,
+			"pending": self._queue.qsize(),
+		}
+
+	def close(self, timeout: Optional[float] = None) -> None:
+		"""Apply everything already queued, then stop the writer thread."""
+
+		with self._lock:
+			self._closed = True
+			thread = self._thread
+		if thread is not None:
+			self._queue.put(None)
+			thread.join(timeout)
+
+
+class ShardRouter:
+	"""Maps each pharmacy branch to its own SQLite file, pool and write queue.
+
+	The default branch keeps ``DB_PATH``; every other branch lives in
+	``<directory>/pharmacy_<branch>.db``. Pools and write queues are created on
+	first use and cached per shard, so branches never share a file lock and
+	write throughput grows with the number of branches. Shard files are created
+	by ``data/init_db.py --branch``; routing to a missing one fails instead of
+	silently creating an empty database.
+	"""
+
+	def __init__(
+		self,
+		branches: tuple = BRANCHES,
+		default: str = DEFAULT_BRANCH,
+		directory: Path = BRANCH_DB_DIR,
+		default_path: Optional[Path] = None,
+	) -> None:
+		self.default = default
+		self.branches = tuple(dict.fromkeys([default, *branches]))
+		self.directory = Path(directory)
+		self.default_path = Path(default_path or DB_PATH)
+		self._pools: dict = {}
+		self._queues: dict = {}
+		self._lock = threading.Lock()
+
+	def resolve(self, branch: Optional[str]) -> str:
+		"""Return the branch id to use, raising ValueError for an unknown branch."""
+
+		branch = (branch or "").strip() or self.default
+		if not _BRANCH_ID.match(branch) or branch not in self.branches:
+			raise ValueError(f"Unknown branch: {branch}")
+		return branch
+
+	def path(self, branch: str) -> Path:
+		if branch == self.default:
+			return self.default_path
+		return self.directory / f"pharmacy_{branch}.db"
+
+	def pool(self, branch: str) -> ConnectionPool:
+		pool = self._pools.get(branch)
+		if pool is None:
+			with self._lock:
+				pool = self._pools.get(branch)
+				if pool is None:
+					path = self.path(self.resolve(branch))
+					if not path.exists():
+						raise sqlite3.OperationalError(f"Database for branch {branch} does not exist: {path}")
+					pool = self._pools[branch] = ConnectionPool(path)
+		return pool
+
+	def write_queue(self, branch: str) -> WriteQueue:
+		write_queue = self._queues.get(branch)
+		if write_queue is None:
+			pool = self.pool(branch)
+			with self._lock:
+				write_queue = self._queues.get(branch)
+				if write_queue is None:
+					write_queue = self._queues[branch] = WriteQueue(pool, thread_name=f"db-writer-{branch}")
+		return write_queue
+
+	def fan_out(self, fn: Callable[[], Any], branches: Optional[tuple] = None) -> dict:
+		"""Run ``fn()`` once per branch in parallel, each bound to its shard; return ``{branch: result}``.
+
+		The first exception raised by any branch is re-raised after all finish.
+		"""
+
+		branches = self.branches if branches is None else tuple(self.resolve(branch) for branch in branches)
+
+		def run(branch: str) -> Any:
+			with use_branch(branch):
+				return fn()
+
+		with ThreadPoolExecutor(max_workers=max(1, len(branches)), thread_name_prefix="db-fanout") as executor:
+			futures = {branch: executor.submit(run, branch) for branch in branches}
+		return {branch: future.result() for branch, future in futures.items()}
+
+	def stats(self) -> dict:
+		with self._lock:
+			pools = dict(self._pools)
+			queues = dict(self._queues)
+		return {
+			branch: {"pool": pool.stats(), "write_queue": queues[branch].stats() if branch in queues else None}
+			for branch, pool in pools.items()
+		}
+
+	def close(self) -> None:
+		with self._lock:
+			pools, self._pools = self._pools, {}
+			queues, self._queues = self._queues, {}
+		for write_queue in queues.values():
+			write_queue.close()
+		for pool in pools.values():
+			pool.close()
+
+
+_router: Optional[ShardRouter] = None
+_router_lock = threading.Lock()
+
+
+def get_router() -> ShardRouter:
+	"""Return the process-wide shard router, created on first use."""
+
+	global _router
+	if _router is None:
+		with _router_lock:
+			if _router is None:
+				_router = ShardRouter()
+	return _router
+
+
+def current_branch() -> str:
+	"""The branch bound to this thread or task, or the default branch."""
+
+	return _branch.get() or get_router().default
+
+
+def set_branch(branch: Optional[str]) -> contextvars.Token:
+	"""Bind ``branch`` to this thread or task; pass the token to ``reset_branch``."""
+
+	return _branch.set(get_router().resolve(branch))
+
+
+def reset_branch(token: contextvars.Token) -> None:
+	_branch.reset(token)
+
+
+@contextmanager
+def use_branch(branch: Optional[str]) -> Iterator[str]:
+	"""Route every ``db`` call inside the block to ``branch``'s shard."""
+
+	token = set_branch(branch)
+	try:
+		yield _branch.get()
+	finally:
+		reset_branch(token)
+
+
+def branches() -> tuple:
+	return get_router().branches
+
+
+def fan_out(fn: Callable[[], Any], branches: Optional[tuple] = None) -> dict:
+	"""Shorthand for ``get_router().fan_out()``."""
+
+	return get_router().fan_out(fn, branches)
+
+
+def get_pool() -> ConnectionPool:
+	"""Return the pool for the current branch, creating it on first use."""
+
+	return get_router().pool(current_branch())
+
+
+def connection():
+	"""Shorthand for ``get_pool().connection()``."""
+
+	return get_pool().connection()
+
+
+def transaction(immediate: bool = False):
+	"""Shorthand for ``get_pool().transaction()``."""
+
+	return get_pool().transaction(immediate)
+
+
+@contextmanager
+def read_snapshot() -> Iterator[sqlite3.Connection]:
+	"""Yield a dedicated read-only connection pinned to one WAL snapshot.
+
+	Every query on it sees the database as of its first read, however long the
+	caller keeps it. It is opened outside the pool so slow consumers such as
+	streamed exports cannot starve request handlers of pooled connections.
+	"""
+
+	uri = get_pool().db_path.resolve().as_uri() + "?mode=ro"
+	conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT_MS / 1000, check_same_thread=False)
+	try:
+		conn.execute("BEGIN;")
+		yield conn
+	finally:
+		conn.rollback()
+		conn.close()
+
+
+def get_write_queue() -> WriteQueue:
+	"""Return the current branch's write queue, created on first use."""
+
+	return get_router().write_queue(current_branch())
+
+
+def write(fn: Callable[..., Any], *args, name: Optional[str] = None) -> Any:
+	"""Run ``fn(conn, *args)`` in a write transaction and return its result.
+
+	With ``DB_SINGLE_WRITER=1`` the call is handed to the group-commit writer
+	thread and this blocks until its batch commits; otherwise it runs in its
+	own ``BEGIN IMMEDIATE`` transaction on the calling thread. Either way an
+	exception from ``fn`` rolls back only its own changes and is re-raised here.
+	Execution time is recorded under ``name``, defaulting to ``fn.__name__``.
+	"""
+
+	if SINGLE_WRITER:
+		return get_write_queue().submit(fn, *args, name=name).result()
+	with _collect_commit_hooks() as hooks:
+		with transaction(immediate=True) as conn:
+			with metrics.time_query(name or fn.__name__):
+				result = fn(conn, *args)
+	_run_commit_hooks(hooks)
+	return result
+
+
+def on_commit(callback: Callable[[], Any]) -> None:
+	"""Call ``callback()`` once the ``write`` it is registered from has committed.
+
+	It is dropped if that write's changes are rolled back, and so is a callback
+	registered outside ``write``, where there is no commit to wait for. Errors
+	raised by callbacks are ignored: the write they follow has already committed.
+	"""
+
+	pending = getattr(_commit_hooks, "pending", None)
+	if pending is not None:
+		pending.append(callback)
+
+
+@contextmanager
+def _collect_commit_hooks() -> Iterator[list]:
+	previous = getattr(_commit_hooks, "pending", None)
+	hooks = _commit_hooks.pending = []
+	try:
+		yield hooks
+	finally:
+		_commit_hooks.pending = previous
+
+
+def _run_commit_hooks(hooks: list) -> None:
+	for hook in hooks:
+		try:
+			hook()
+		except Exception:  # noqa: BLE001 - the write has already committed
+			pass
+
+
+def _pool_stat(key: str) -> Callable[[], Optional[float]]:
+	# Summed over every open shard.
+	def collect() -> Optional[float]:
+		shards = _router.stats() if _router is not None else {}
+		return sum(shard["pool"][key] for shard in shards.values()) if shards else None
+
+	return collect
+
+
+def _queue_stat(key: str) -> Callable[[], Optional[float]]:
+	def collect() -> Optional[float]:
+		shards = _router.stats() if _router is not None else {}
+		queues = [shard["write_queue"] for shard in shards.values() if shard["write_queue"] is not None]
+		return sum(stats[key] for stats in queues) if queues else None
+
+	return collect
+
+
+metrics.REGISTRY.register_callback(
+	"pharmacy_db_pool_waits_total", "Checkouts that had to wait for a free pooled connection.", "counter", _pool_stat("waits")
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_db_pool_wait_seconds_total", "Time spent waiting for a free pooled connection.", "counter",
+	_pool_stat("wait_time_seconds"),
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_db_pool_in_use", "Pooled connections currently checked out.", "gauge", _pool_stat("in_use")
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_db_shards_open", "Branch databases with an open connection pool.", "gauge",
+	lambda: len(_router.stats()) if _router is not None else None,
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_db_write_queue_pending", "Write jobs waiting for the group-commit writer.", "gauge", _queue_stat("pending")
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_db_write_queue_failed_commits_total", "Group-commit batches whose COMMIT failed.", "counter",
+	_queue_stat("failed_commits"),
+)
+
+
+@contextmanager
+def trace_statements(callback: Callable[[Optional[str]], None]) -> Iterator[None]:
+	"""Send every statement run on this thread's pooled connections to ``callback``.
+
+	``callback`` receives each SQL string as SQLite starts it and ``None`` when
+	the connection goes back to the pool. Jobs handed to the group-commit writer
+	run on its own thread and are not traced.
+	"""
+
+	previous = getattr(_trace, "callback", None)
+	_trace.callback = callback
+	try:
+		yield
+	finally:
+		_trace.callback = previous
+
+
+def pool_stats() -> dict:
+	return get_pool().stats()
+
+
+def reset_pool() -> None:
+	"""Close every shard's pool and write queue; the next use opens fresh ones."""
+
+	global _router
+	with _router_lock:
+		router, _router = _router, None
+	if router is not None:
+		router.close()
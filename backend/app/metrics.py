@@ -0,0 +1,365 @@
+"""Minimal in-process metrics registry rendered in the Prometheus text format."""
+
+import sqlite3
+import threading
+import time
+from bisect import bisect_left
+from typing import Callable, Optional
+
+from flask import Flask, Response, g, request
+
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+RATE_BUCKETS = (1, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+def _escape(value: str) -> str:
+	return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names: tuple, values: tuple, extra: str = "") -> str:
+	pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+	if extra:
+		pairs.append(extra)
+	return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value: float) -> str:
+	if value == float("inf"):
+		return "+Inf"
+	return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+	"""Named metrics plus callbacks that are sampled only when scraped."""
+
+	def __init__(self) -> None:
+		self._lock = threading.Lock()
+		self._metrics: dict = {}
+		self._callbacks: dict = {}
+
+	def register(self, metric: "_Metric") -> None:
+		with self._lock:
+			if metric.name in self._metrics or metric.name in self._callbacks:
+				raise ValueError(f"Duplicate metric: {metric.name}")
+			self._metrics[metric.name] = metric
+
+	def register_callback(self, name: str, documentation: str, kind: str, fn: Callable[[], Optional[float]]) -> None:
+		"""Expose ``fn()`` as a gauge or counter; re-registering a name replaces it."""
+
+		with self._lock:
+			if name in self._metrics:
+				raise ValueError(f"Duplicate metric: {name}")
+			self._callbacks[name] = (documentation, kind, fn)
+
+	def render(self) -> str:
+		with self._lock:
+			metrics = list(self._metrics.values())
+			callbacks = list(self._callbacks.items())
+
+		lines = []
+		for metric in metrics:
+			lines.append(f"# HELP {metric.name} {metric.documentation}")
+			lines.append(f"# TYPE {metric.name} {metric.kind}")
+			lines.extend(metric.samples())
+		for name, (documentation, kind, fn) in callbacks:
+			try:
+				value = fn()
+			except Exception:  # noqa: BLE001 - a broken callback must not break the scrape
+				continue
+			if value is None:
+				continue
+			lines.append(f"# HELP {name} {documentation}")
+			lines.append(f"# TYPE {name} {kind}")
+			lines.append(f"{name} {_format_value(value)}")
+		return "\n".join(lines) + "\n"
+
+
+REGISTRY = Registry()
+
+
+class _CounterChild:
+	def __init__(self) -> None:
+		self._lock = threading.Lock()
+		self.value = 0.0
+
+	def inc(self, amount: float = 1.0) -> None:
+		with self._lock:
+			self.value += amount
+
+
+class _GaugeChild(_CounterChild):
+	def dec(self, amount: float = 1.0) -> None:
+		with self._lock:
+			self.value -= amount
+
+	def set(self, value: float) -> None:
+		with self._lock:
+			self.value = value
+
+
+class _HistogramChild:
+	def __init__(self, buckets: tuple) -> None:
+		self._lock = threading.Lock()
+		self.buckets = buckets
+		self.counts = [0] * (len(buckets) + 1)
+		self.sum = 0.0
+
+	def observe(self, value: float) -> None:
+		index = bisect_left(self.buckets, value)
+		with self._lock:
+			self.counts[index] += 1
+			self.sum += value
+
+
+class _Metric:
+	kind = ""
+
+	def __init__(self, name: str, documentation: str, labelnames: tuple = (), registry: Registry = REGISTRY) -> None:
+		self.name = name
+		self.documentation = documentation
+		self.labelnames = tuple(labelnames)
+		self._lock = threading.Lock()
+		self._children: dict = {}
+		registry.register(self)
+
+	def _new_child(self):
+		raise NotImplementedError
+
+	def labels(self, *values):
+		"""Return the child for one combination of label values, creating it on first use."""
+
+		child = self._children.get(values)
+		if child is None:
+			if len(values) != len(self.labelnames):
+				raise ValueError(f"{self.name} expects labels {self.labelnames}")
+			with self._lock:
+				child = self._children.setdefault(values, self._new_child())
+		return child
+
+	def _items(self) -> list:
+		with self._lock:
+			return sorted(self._children.items())
+
+	def samples(self) -> list:
+		return [
+			f"{self.name}{_format_labels(self.labelnames, values)} {_format_value(child.value)}"
+			for values, child in self._items()
+		]
+
+
+class Counter(_Metric):
+	kind = "counter"
+
+	def _new_child(self) -> _CounterChild:
+		return _CounterChild()
+
+	def inc(self, amount: float = 1.0) -> None:
+		self.labels().inc(amount)
+
+
+class Gauge(_Metric):
+	kind = "gauge"
+
+	def _new_child(self) -> _GaugeChild:
+		return _GaugeChild()
+
+	def inc(self, amount: float = 1.0) -> None:
+		self.labels().inc(amount)
+
+	def dec(self, amount: float = 1.0) -> None:
+		self.labels().dec(amount)
+
+
+class Histogram(_Metric):
+	kind = "histogram"
+
+	def __init__(
+		self,
+		name: str,
+		documentation: str,
+		labelnames: tuple = (),
+		buckets: tuple = LATENCY_BUCKETS,
+		registry: Registry = REGISTRY,
+	) -> None:
+		self.buckets = tuple(sorted(buckets))
+		super().__init__(name, documentation, labelnames, registry)
+
+	def _new_child(self) -> _HistogramChild:
+		return _HistogramChild(self.buckets)
+
+	def observe(self, value: float) -> None:
+		self.labels().observe(value)
+
+	def samples(self) -> list:
+		lines = []
+		for values, child in self._items():
+			with child._lock:
+				counts, total = list(child.counts), child.sum
+			cumulative = 0
+			for bound, count in zip(self.buckets + (float("inf"),), counts):
+				cumulative += count
+				le = 'le="' + _format_value(float(bound)) + '"'
+				lines.append(f"{self.name}_bucket{_format_labels(self.labelnames, values, le)} {cumulative}")
+			labels = _format_labels(self.labelnames, values)
+			lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+			lines.append(f"{self.name}_count{labels} {cumulative}")
+		return lines
+
+
+HTTP_REQUEST_SECONDS = Histogram(
+	"pharmacy_http_request_duration_seconds",
+	"Time to produce a response, by route and status.",
+	("method", "route", "status"),
+)
+HTTP_ERRORS = Counter(
+	"pharmacy_http_errors_total",
+	"Error responses returned by the API routes, by exception type.",
+	("route", "type"),
+)
+DB_QUERY_SECONDS = Histogram(
+	"pharmacy_db_query_duration_seconds",
+	"Time spent running named SQLite queries and write jobs.",
+	("query",),
+)
+DB_LOCK_WAIT_SECONDS = Histogram(
+	"pharmacy_db_lock_wait_seconds",
+	"Time spent in BEGIN waiting for the SQLite lock.",
+	("mode",),
+)
+DB_LOCK_ERRORS = Counter(
+	"pharmacy_db_lock_errors_total",
+	"Requests that failed with 'database is locked' or 'busy' after SQLite's own retries.",
+	("route",),
+)
+CHAT_TTFT_SECONDS = Histogram(
+	"pharmacy_chat_time_to_first_token_seconds",
+	"Time from starting a chat reply to its first token.",
+	("source",),
+)
+CHAT_TOKENS_PER_SECOND = Histogram(
+	"pharmacy_chat_tokens_per_second",
+	"Token rate of completed chat replies.",
+	("source",),
+	buckets=RATE_BUCKETS,
+)
+CHAT_ACTIVE_STREAMS = Gauge("pharmacy_chat_active_streams", "Chat replies currently streaming.")
+CHAT_UPSTREAM_ERRORS = Counter(
+	"pharmacy_chat_upstream_errors_total",
+	"Chat replies that failed talking to the model API, by exception type.",
+	("type",),
+)
+
+ADMISSION_REJECTIONS = Counter(
+	"pharmacy_admission_rejections_total",
+	"Requests turned away by admission control, by route class and reason.",
+	("route_class", "reason"),
+)
+ADMISSION_QUEUE_SECONDS = Histogram(
+	"pharmacy_admission_queue_seconds",
+	"Time admitted requests waited for a concurrency slot.",
+	("route_class",),
+)
+ADMISSION_ACTIVE = Gauge(
+	"pharmacy_admission_active",
+	"Requests currently holding a concurrency slot, by route class.",
+	("route_class",),
+)
+
+
+def error_type(err: BaseException) -> str:
+	"""Label an exception the way the routes map it to a status code."""
+
+	if isinstance(err, PermissionError):
+		return "PermissionError"
+	if isinstance(err, sqlite3.Error):
+		return "sqlite3.Error"
+	if isinstance(err, ValueError):
+		return "ValueError"
+	return type(err).__name__
+
+
+def _route_label() -> str:
+	rule = request.url_rule
+	return rule.rule if rule is not None else "unmatched"
+
+
+def record_route_error(err: BaseException) -> None:
+	route = _route_label()
+	HTTP_ERRORS.labels(route, error_type(err)).inc()
+	if isinstance(err, sqlite3.OperationalError) and ("locked" in str(err) or "busy" in str(err)):
+		DB_LOCK_ERRORS.labels(route).inc()
+
+
+class Timer:
+	"""Context manager observing elapsed seconds into a histogram child."""
+
+	__slots__ = ("child", "started")
+
+	def __init__(self, child: _HistogramChild) -> None:
+		self.child = child
+
+	def __enter__(self) -> "Timer":
+		self.started = time.perf_counter()
+		return self
+
+	def __exit__(self, *exc) -> None:
+		self.child.observe(time.perf_counter() - self.started)
+
+
+def time_query(name: str) -> Timer:
+	return Timer(DB_QUERY_SECONDS.labels(name))
+
+
+class StreamMetrics:
+	"""Time-to-first-token, token rate and active-stream accounting for one chat reply."""
+
+	__slots__ = ("source", "started", "first_token_at", "tokens")
+
+	def __init__(self, source: str) -> None:
+		self.source = source
+		self.started = time.perf_counter()
+		self.first_token_at = None
+		self.tokens = 0
+		CHAT_ACTIVE_STREAMS.inc()
+
+	def token(self) -> None:
+		if self.first_token_at is None:
+			self.first_token_at = time.perf_counter()
+			CHAT_TTFT_SECONDS.labels(self.source).observe(self.first_token_at - self.started)
+		self.tokens += 1
+
+	def failed(self, err: BaseException) -> None:
+		CHAT_UPSTREAM_ERRORS.labels(type(err).__name__).inc()
+
+	def finish(self, completed: bool = True) -> None:
+		CHAT_ACTIVE_STREAMS.dec()
+		if completed and self.first_token_at is not None:
+			elapsed = time.perf_counter() - self.first_token_at
+			if elapsed > 0 and self.tokens > 1:
+				CHAT_TOKENS_PER_SECOND.labels(self.source).observe((self.tokens - 1) / elapsed)
+
+
+def _start_timer() -> None:
+	g._metrics_started = time.perf_counter()
+
+
+def _observe_request(response):
+	started = g.pop("_metrics_started", None)
+	if started is not None:
+		HTTP_REQUEST_SECONDS.labels(request.method, _route_label(), str(response.status_code)).observe(
+			time.perf_counter() - started
+		)
+	return response
+
+
+def metrics_view() -> Response:
+	return Response(REGISTRY.render(), mimetype="text/plain; version=0.0.4")
+
+
+def init_app(app: Flask) -> None:
+	"""Time every request and expose the registry at ``/metrics``."""
+
+	app.before_request(_start_timer)
+	app.after_request(_observe_request)
+	app.add_url_rule("/metrics", "metrics", metrics_view, methods=["GET"])
@@ -0,0 +1,225 @@
+"""Opt-in per-request wall-clock profiler with SQL statement timings."""
+
+import json
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from pathlib import Path
+from typing import Optional
+
+from flask import Flask, g, request
+
+from . import db
+
+
+FORMATS = ("collapsed", "speedscope")
+
+
+def _frame_label(code) -> str:
+	path = Path(code.co_filename)
+	return f"{code.co_name} ({path.parent.name}/{path.name}:{code.co_firstlineno})".replace(";", ",")
+
+
+class StatementTimer:
+	"""Time SQL statements from a ``db.trace_statements`` callback.
+
+	SQLite reports when a statement starts, not when it finishes, so each one is
+	charged the time until the next statement starts or its connection is
+	released. That includes any Python work in between, making each duration an
+	upper bound on the time spent inside SQLite.
+	"""
+
+	def __init__(self) -> None:
+		self.statements: list = []
+		self._current: Optional[str] = None
+		self._started = 0.0
+
+	def __call__(self, sql: Optional[str]) -> None:
+		now = time.perf_counter()
+		if self._current is not None:
+			self.statements.append((self._current, now - self._started))
+		self._current = " ".join(sql.split()) if sql is not None else None
+		self._started = now
+
+	@property
+	def total(self) -> float:
+		return sum(seconds for _sql, seconds in self.statements)
+
+	def summary(self) -> list:
+		"""Statements grouped by text, slowest total first."""
+
+		grouped: dict = {}
+		for sql, seconds in self.statements:
+			entry = grouped.setdefault(sql, {"sql": sql, "count": 0, "seconds": 0.0})
+			entry["count"] += 1
+			entry["seconds"] += seconds
+		return sorted(grouped.values(), key=lambda entry: entry["seconds"], reverse=True)
+
+
+class Sampler:
+	"""Sample one thread's Python stack every ``interval`` seconds from a helper thread."""
+
+	def __init__(self, thread_id: int, interval: float) -> None:
+		self.thread_id = thread_id
+		self.interval = interval
+		self.stacks: Counter = Counter()
+		self._stop = threading.Event()
+		self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+	def start(self) -> None:
+		self._thread.start()
+
+	def stop(self) -> None:
+		self._stop.set()
+		self._thread.join()
+
+	def _run(self) -> None:
+		while not self._stop.wait(self.interval):
+			frame = sys._current_frames().get(self.thread_id)
+			stack = []
+			while frame is not None:
+				stack.append(_frame_label(frame.f_code))
+				frame = frame.f_back
+			if stack:
+				stack.reverse()
+				self.stacks[tuple(stack)] += 1
+
+	@property
+	def samples(self) -> int:
+		return sum(self.stacks.values())
+
+	def collapsed(self) -> str:
+		"""Brendan Gregg's collapsed format: ``root;child;leaf count`` per line."""
+
+		return "".join(f"{';'.join(stack)} {count}\n" for stack, count in self.stacks.most_common())
+
+	def speedscope(self, name: str) -> dict:
+		frames: list = []
+		index: dict = {}
+		samples = []
+		for stack in self.stacks:
+			samples.append([index.setdefault(label, len(index)) for label in stack])
+		for label in index:
+			frames.append({"name": label})
+		weights = [count * self.interval for count in self.stacks.values()]
+		return {
+			"$schema": "https://www.speedscope.app/file-format-schema.json",
+			"shared": {"frames": frames},
+			"profiles": [
+				{
+					"type": "sampled",
+					"name": name,
+					"unit": "seconds",
+					"startValue": 0,
+					"endValue": sum(weights),
+					"samples": samples,
+					"weights": weights,
+				}
+			],
+			"name": name,
+			"exporter": "pharmacy-agent",
+		}
+
+
+class RequestProfile:
+	"""Wall-clock samples and SQL timings for one request."""
+
+	def __init__(self, interval: float) -> None:
+		self.id = uuid.uuid4().hex[:12]
+		self.started = time.perf_counter()
+		self.wall = 0.0
+		self.sampler = Sampler(threading.get_ident(), interval)
+		self.statements = StatementTimer()
+		self._trace = db.trace_statements(self.statements)
+
+	def start(self) -> None:
+		self._trace.__enter__()
+		self.sampler.start()
+
+	def stop(self) -> None:
+		self.sampler.stop()
+		self._trace.__exit__(None, None, None)
+		self.wall = time.perf_counter() - self.started
+
+	def write(self, directory: Path, fmt: str, name: str) -> Path:
+		"""Write the stack profile plus a ``.sql.json`` sidecar and return the profile path."""
+
+		directory.mkdir(parents=True, exist_ok=True)
+		stem = f"{time.strftime('%Y%m%dT%H%M%S')}-{self.id}"
+		if fmt == "speedscope":
+			path = directory / f"{stem}.speedscope.json"
+			path.write_text(json.dumps(self.sampler.speedscope(name)))
+		else:
+			path = directory / f"{stem}.collapsed.txt"
+			path.write_text(self.sampler.collapsed())
+		sidecar = {
+			"request": name,
+			"wall_seconds": self.wall,
+			"sql_seconds": self.statements.total,
+			"statements": self.statements.summary(),
+		}
+		(directory / f"{stem}.sql.json").write_text(json.dumps(sidecar, indent=2))
+		return path
+
+	def summary_header(self, path: Optional[Path]) -> str:
+		parts = [
+			f"id={self.id}",
+			f"wall_ms={self.wall * 1000:.2f}",
+			f"sql_ms={self.statements.total * 1000:.2f}",
+			f"queries={len(self.statements.statements)}",
+			f"samples={self.sampler.samples}",
+		]
+		if path is not None:
+			parts.append(f"file={path.name}")
+		return "; ".join(parts)
+
+
+def _wants_profile(app: Flask) -> bool:
+	if request.headers.get(app.config["PROFILE_HEADER"], "").strip() in ("1", "true", "yes"):
+		return True
+	rate = app.config["PROFILE_SAMPLE_RATE"]
+	return rate > 0 and random.random() < rate
+
+
+def init_app(app: Flask) -> None:
+	"""Profile requests that send ``PROFILE_HEADER: 1`` or fall in ``PROFILE_SAMPLE_RATE``.
+
+	Each profiled request writes its stacks to ``PROFILE_DIR`` in ``PROFILE_FORMAT``
+	and gets an ``X-Profile-Summary`` response header. Streamed bodies are only
+	profiled up to the point the view returns.
+	"""
+
+	fmt = app.config["PROFILE_FORMAT"]
+	if fmt not in FORMATS:
+		raise ValueError(f"PROFILE_FORMAT must be one of {', '.join(FORMATS)}")
+	directory = Path(app.config["PROFILE_DIR"])
+	interval = app.config["PROFILE_INTERVAL"]
+
+	@app.before_request
+	def _start_profile() -> None:
+		if _wants_profile(app):
+			g._profile = RequestProfile(interval)
+			g._profile.start()
+
+	@app.after_request
+	def _finish_profile(response):
+		profile = g.pop("_profile", None)
+		if profile is None:
+			return response
+		profile.stop()
+		try:
+			path = profile.write(directory, fmt, f"{request.method} {request.path}")
+		except OSError:
+			path = None
+		response.headers["X-Profile-Summary"] = profile.summary_header(path)
+		return response
+
+	@app.teardown_request
+	def _abandon_profile(_exc) -> None:
+		# Requests that fail before after_request still have to stop their sampler.
+		profile = g.pop("_profile", None)
+		if profile is not None:
+			profile.stop()
@@ -1,23 +1,102 @@
 """API routes blueprint for the Pharmacy Agent."""
 
-import json
-import os
+import functools
+import hashlib
 import sqlite3
-from flask import Blueprint, Response, jsonify, request
-from openai import OpenAI
+from flask import Blueprint, Response, current_app, g, jsonify, request
 
-from app.services import pharmacy_service, prescription_service, user_service
+from app import db, metrics
+from app.services import (
+    change_feed,
+    chat_service,
+    checkout_service,
+    export_service,
+    interaction_service,
+    inventory_service,
+    pharmacy_service,
+    prescription_service,
+    search_service,
+    user_service,
+)
+from app.services.idempotency_store import IdempotencyConflict, IdempotencyInProgress
+from app.services.idempotency_store import store as idempotency_store
 
 
 main = Blueprint("main", __name__)
 
-OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
-OPENAI_MODEL = os.getenv("OPENAI_MODEL")
-client = OpenAI(api_key=OPENAI_API_KEY) if OPENAI_API_KEY else None
-SYSTEM_PROMPT = (
-    "You are a helpful pharmacy assistant. Provide factual information only. "
-    "Do not give medical advice. Redirect advice requests to a healthcare professional."
-)
+BRANCH_HEADER = "X-Branch"
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+
+
+@main.before_request
+def bind_branch():
+    # Every route runs against the branch named by the header or ?branch=, else the default.
+    try:
+        g.branch_token = db.set_branch(request.headers.get(BRANCH_HEADER) or request.args.get("branch"))
+    except ValueError as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    return None
+
+
+@main.teardown_request
+def unbind_branch(_exc):
+    token = g.pop("branch_token", None)
+    if token is not None:
+        db.reset_branch(token)
+
+
+def idempotent(view):
+    """Run the view at most once per ``Idempotency-Key`` header and replay its recorded response.
+
+    Keys are scoped to the branch and endpoint. A retry that arrives while the
+    original is still running waits for it; reusing a key with a different body
+    is rejected with 422. Requests without the header run as usual.
+    """
+
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get(IDEMPOTENCY_HEADER, "").strip()
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+            return jsonify({"error": f"{IDEMPOTENCY_HEADER} must be at most {MAX_IDEMPOTENCY_KEY_LENGTH} characters"}), 400
+
+        def run():
+            response = current_app.make_response(view(*args, **kwargs))
+            return response.status_code, response.get_data(as_text=True)
+
+        fingerprint = hashlib.sha256(request.get_data()).hexdigest()
+        try:
+            status, body, replayed = idempotency_store.execute(
+                f"{db.current_branch()}:{request.endpoint}:{key}", fingerprint, run
+            )
+        except IdempotencyConflict as err:
+            metrics.record_route_error(err)
+            return jsonify({"error": str(err)}), 422
+        except IdempotencyInProgress as err:
+            metrics.record_route_error(err)
+            return jsonify({"error": str(err)}), 409
+
+        response = Response(body, status=status, mimetype="application/json")
+        if replayed:
+            response.headers["Idempotent-Replayed"] = "true"
+        return response
+
+    return wrapper
+
+
+def _in_branch(chunks):
+    """Re-bind the request's branch while a streamed body is generated after the view returns."""
+
+    branch = db.current_branch()
+
+    def generate():
+        with db.use_branch(branch):
+            yield from chunks
+
+    return generate()
 
 
 @main.route("/api/health", methods=["GET"])
@@ -25,6 +104,22 @@ def health_check():
     return jsonify({"status": "ok"})
 
 
+@main.route("/api/medications/search", methods=["GET"])
+def search_medications():
+    query = request.args.get("q", "")
+    limit = request.args.get("limit", str(search_service.SEARCH_LIMIT))
+
+    try:
+        results = search_service.search_medications(query, int(limit))
+        return jsonify({"query": query, "results": results, "count": len(results)})
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+
 @main.route("/api/prescriptions/validate", methods=["GET"])
 def validate_prescription():
     user_id = request.args.get("user_id", "")
@@ -36,12 +131,15 @@ def validate_prescription():
         item_id = prescription_service.validate_fulfillment(user_id, med_id, requested_qty)
         return jsonify({"item_id": item_id, "requested_qty": requested_qty})
     except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
         return jsonify({"error": str(err)}), 400
     except sqlite3.Error as err:
+        metrics.record_route_error(err)
         return jsonify({"error": f"database error: {err}"}), 500
 
 
 @main.route("/api/prescriptions/fulfill", methods=["POST"])
+@idempotent
 def fulfill_prescription():
     data = request.get_json() or {}
     user_id = data.get("user_id", "")
@@ -53,12 +151,92 @@ def fulfill_prescription():
         prescription_service.fulfill_prescription(user_id, med_id, requested_qty)
         return jsonify({"status": "fulfilled", "quantity": requested_qty})
     except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+
+@main.route("/api/prescriptions/fulfill/batch", methods=["POST"])
+@idempotent
+def fulfill_prescription_batch():
+    data = request.get_json() or {}
+    raw_lines = data.get("lines", [])
+    policy = data.get("policy", "atomic")
+
+    try:
+        if not isinstance(raw_lines, list):
+            raise ValueError("lines must be a list")
+        lines = [
+            (line.get("user_id", data.get("user_id", "")), line.get("med_id", ""), int(line.get("qty", 1)))
+            for line in raw_lines
+        ]
+        results = prescription_service.fulfill_batch(lines, policy)
+    except (ValueError, PermissionError, TypeError, AttributeError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+    fulfilled = sum(1 for result in results if result["status"] == "fulfilled")
+    if fulfilled == len(results):
+        status = "fulfilled"
+    elif fulfilled:
+        status = "partial"
+    else:
+        status = "rejected"
+
+    body = {"status": status, "policy": policy, "fulfilled": fulfilled, "results": results}
+    return jsonify(body), (400 if status == "rejected" else 200)
+
+
+@main.route("/api/checkout", methods=["POST"])
+@idempotent
+def checkout():
+    data = request.get_json() or {}
+    user_id = data.get("user_id", "")
+    med_id = data.get("med_id", "")
+    qty = data.get("qty", 1)
+
+    try:
+        requested_qty = int(qty)
+        sale = checkout_service.checkout(user_id, med_id, requested_qty)
+        return jsonify({"status": "completed", **sale})
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
         return jsonify({"error": str(err)}), 400
     except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+
+@main.route("/api/interactions/check", methods=["POST"])
+def check_interactions():
+    data = request.get_json() or {}
+    user_id = data.get("user_id", "")
+    med_id = data.get("med_id", "")
+    med_ids = data.get("med_ids", [])
+
+    try:
+        if user_id:
+            interactions = interaction_service.check_patient(user_id, med_id)
+        else:
+            if not isinstance(med_ids, list):
+                raise ValueError("med_ids must be a list")
+            interactions = interaction_service.check_basket(med_ids)
+        return jsonify({"interactions": interactions, "count": len(interactions)})
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
         return jsonify({"error": f"database error: {err}"}), 500
 
 
 @main.route("/api/pharmacies/restock", methods=["POST"])
+@idempotent
 def restock():
     data = request.get_json() or {}
     manager_id = data.get("manager_id", "")
@@ -70,12 +248,60 @@ def restock():
         pharmacy_service.process_restock(manager_id, med_id, requested_qty)
         return jsonify({"status": "restocked", "quantity": requested_qty})
     except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+
+@main.route("/api/inventory/restock-plan", methods=["GET"])
+def preview_restock_plan():
+    manager_id = request.args.get("manager_id", "")
+
+    try:
+        return jsonify(inventory_service.preview_restock_plan(manager_id))
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+
+@main.route("/api/inventory/restock-plan", methods=["POST"])
+@idempotent
+def apply_restock_plan():
+    data = request.get_json() or {}
+    manager_id = data.get("manager_id", "")
+
+    try:
+        plan = inventory_service.apply_restock_plan(manager_id)
+        return jsonify({"status": "restocked", **plan})
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+
+@main.route("/api/inventory/stock", methods=["GET"])
+def chain_stock():
+    med_ids = request.args.getlist("med_id")
+
+    try:
+        return jsonify({"branches": list(db.branches()), "stock": inventory_service.chain_stock(med_ids)})
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
         return jsonify({"error": str(err)}), 400
     except sqlite3.Error as err:
+        metrics.record_route_error(err)
         return jsonify({"error": f"database error: {err}"}), 500
 
 
 @main.route("/api/users/transaction", methods=["POST"])
+@idempotent
 def user_transaction():
     data = request.get_json() or {}
     user_id = data.get("user_id", "")
@@ -86,10 +312,54 @@ def user_transaction():
         user_service.process_transaction(user_id, amount)
         return jsonify({"status": "processed", "amount": amount})
     except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+
+
+@main.route("/api/exports/<name>", methods=["GET"])
+def export(name):
+    manager_id = request.args.get("manager_id", "")
+    fmt = request.args.get("format", "ndjson")
+
+    try:
+        export_service.check_export(manager_id, name, fmt)
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
         return jsonify({"error": str(err)}), 400
     except sqlite3.Error as err:
+        metrics.record_route_error(err)
         return jsonify({"error": f"database error: {err}"}), 500
 
+    headers = {"Content-Disposition": f'attachment; filename="{name}.{fmt}"'}
+    return Response(
+        _in_branch(export_service.stream_export(name, fmt)), mimetype=export_service.FORMATS[fmt], headers=headers
+    )
+
+
+@main.route("/api/events", methods=["GET"])
+def change_events():
+    try:
+        topics = change_feed.parse_topics(request.args.getlist("topic"))
+        change_feed.check_access(request.args.get("user_id", ""), topics)
+        subscription = change_feed.broker.subscribe(topics, request.headers.get("Last-Event-ID"))
+    except (ValueError, PermissionError) as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": str(err)}), 400
+    except sqlite3.Error as err:
+        metrics.record_route_error(err)
+        return jsonify({"error": f"database error: {err}"}), 500
+    except change_feed.FeedFull as err:
+        return jsonify({"error": str(err)}), 503, {"Retry-After": "5"}
+
+    headers = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    response = Response(change_feed.stream(subscription), mimetype="text/event-stream", headers=headers)
+    # The stream's own cleanup only runs once it has started; this covers a client gone before that.
+    response.call_on_close(subscription.close)
+    return response
+
 
 @main.route("/chat", methods=["POST"])
 def chat():
@@ -98,27 +368,12 @@ def chat():
 
     if not user_message:
         return jsonify({"error": "message is required"}), 400
-    if not OPENAI_API_KEY or not OPENAI_MODEL or client is None:
+    if not chat_service.is_configured():
         return jsonify({"error": "OpenAI API is not configured"}), 500
 
-    def stream():
-        try:
-            response = client.chat.completions.create(
-                model=OPENAI_MODEL,
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": user_message},
-                ],
-                stream=True,
-            )
-
-            for chunk in response:
-                content = chunk.choices[0].delta.content
-                if content:
-                    yield f"data: {json.dumps({'token': content})}\n\n"
-
-            yield "data: [DONE]\n\n"
-        except Exception as exc:  # noqa: BLE001
-            yield f"data: {json.dumps({'error': str(exc)})}\n\n"
-
-    return Response(stream(), mimetype="text/event-stream")
+    user_id = (data.get("user_id", "") or "").strip() or None
+    session_id = data.get("session_id")
+    conversation = chat_service.open_session(None if session_id is None else str(session_id).strip())
+    return Response(
+        _in_branch(chat_service.stream_reply(user_message, user_id, conversation)), mimetype="text/event-stream"
+    )
@@ -0,0 +1,208 @@
+"""OpenAI function-calling tools for the chat agent, served from the catalog index."""
+
+import contextvars
+import json
+import sqlite3
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+from . import search_service
+from .catalog import get_catalog
+
+
+TOOL_SPECS = [
+	{
+		"type": "function",
+		"function": {
+			"name": "find_medication",
+			"description": "Look up a medication by brand name, id, active ingredient or category; tolerates misspellings.",
+			"parameters": {
+				"type": "object",
+				"properties": {"query": {"type": "string", "description": "Brand name, id or active ingredient."}},
+				"required": ["query"],
+			},
+		},
+	},
+	{
+		"type": "function",
+		"function": {
+			"name": "check_stock",
+			"description": "Return how many units of a medication the pharmacy has in stock.",
+			"parameters": {
+				"type": "object",
+				"properties": {"medication": {"type": "string", "description": "Brand name or id."}},
+				"required": ["medication"],
+			},
+		},
+	},
+	{
+		"type": "function",
+		"function": {
+			"name": "prescription_status",
+			"description": "List a patient's prescriptions and remaining refill periods.",
+			"parameters": {
+				"type": "object",
+				"properties": {
+					"user_id": {"type": "string", "description": "Patient user id."},
+					"medication": {"type": "string", "description": "Optional brand name or id to filter by."},
+				},
+				"required": ["user_id"],
+			},
+		},
+	},
+	{
+		"type": "function",
+		"function": {
+			"name": "check_interactions",
+			"description": "Check a list of medications for known drug-drug interactions.",
+			"parameters": {
+				"type": "object",
+				"properties": {
+					"medications": {
+						"type": "array",
+						"items": {"type": "string"},
+						"description": "Brand names or ids.",
+					}
+				},
+				"required": ["medications"],
+			},
+		},
+	},
+]
+
+# Tools that read a patient's records; only offered when the caller is signed in.
+USER_TOOLS = frozenset({"prescription_status"})
+
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="agent-tool")
+
+
+def _public(med: dict) -> dict:
+	return {key: med[key] for key in ("id", "name", "active_ingredient", "category", "dosage_instructions", "requires_prescription", "retail_price")}
+
+
+def _resolve(name: str) -> Optional[dict]:
+	matches = get_catalog().find_medications(name)
+	return matches[0] if matches else None
+
+
+def find_medication(query: str) -> dict:
+	catalog = get_catalog()
+	matches = catalog.find_medications(query)
+	if not matches:
+		try:
+			found = search_service.search_medications(query, limit=5)
+		except ValueError:
+			found = []
+		matches = [med for med in (catalog.medication(result["id"]) for result in found) if med]
+	if not matches:
+		return {"error": f"No medication found for '{query}'"}
+	return {"medications": [_public(med) for med in matches]}
+
+
+def check_stock(medication: str) -> dict:
+	med = _resolve(medication)
+	if not med:
+		return {"error": f"No medication found for '{medication}'"}
+	return {
+		"id": med["id"],
+		"name": med["name"],
+		"stock_quantity": med["stock_quantity"],
+		"in_stock": med["stock_quantity"] > 0,
+	}
+
+
+def prescription_status(user_id: str, medication: Optional[str] = None) -> dict:
+	catalog = get_catalog()
+	med_id = None
+	if medication:
+		med = _resolve(medication)
+		if not med:
+			return {"error": f"No medication found for '{medication}'"}
+		med_id = med["id"]
+
+	prescriptions = []
+	for rx in catalog.user_prescriptions(user_id):
+		items = [
+			{
+				"medication": (catalog.medication(item["med_id"]) or {}).get("name", item["med_id"]),
+				"remaining_periods": item["remaining_periods"],
+				"initial_periods": item["initial_periods"],
+			}
+			for item in rx["items"]
+			if med_id is None or item["med_id"] == med_id
+		]
+		if items:
+			prescriptions.append({"id": rx["id"], "is_active": rx["is_active"], "issued_date": rx["issued_date"], "items": items})
+	return {"user_id": user_id, "prescriptions": prescriptions}
+
+
+def check_interactions(medications: list) -> dict:
+	resolved = {}
+	unknown = []
+	for name in medications:
+		med = _resolve(name)
+		if med:
+			resolved[med["id"]] = med["name"]
+		else:
+			unknown.append(name)
+
+	interactions = [
+		{
+			"medications": [resolved[found["med_1_id"]], resolved[found["med_2_id"]]],
+			"severity": found["severity"],
+			"description": found["description"],
+		}
+		for found in get_catalog().interactions_between(list(resolved))
+	]
+	return {"checked": sorted(resolved.values()), "unknown": unknown, "interactions": interactions}
+
+
+TOOLS = {
+	"find_medication": find_medication,
+	"check_stock": check_stock,
+	"prescription_status": prescription_status,
+	"check_interactions": check_interactions,
+}
+
+
+def tool_specs(user_id: Optional[str] = None) -> list:
+	"""Tool specs to offer the model; patient tools are left out for anonymous callers."""
+
+	if user_id:
+		return TOOL_SPECS
+	return [spec for spec in TOOL_SPECS if spec["function"]["name"] not in USER_TOOLS]
+
+
+def run_tool(name: str, arguments: str, user_id: Optional[str] = None) -> str:
+	"""Execute one tool call and return its JSON result; errors are returned, not raised."""
+
+	tool = TOOLS.get(name)
+	if tool is None:
+		return json.dumps({"error": f"Unknown tool '{name}'"})
+	if name in USER_TOOLS and not user_id:
+		return json.dumps({"error": "Sign in to look up prescriptions"})
+	try:
+		kwargs = json.loads(arguments or "{}")
+		if name in USER_TOOLS:
+			# A signed-in patient may only see their own records.
+			kwargs["user_id"] = user_id
+		return json.dumps(tool(**kwargs))
+	except (TypeError, ValueError) as err:
+		return json.dumps({"error": str(err)})
+	except sqlite3.Error as err:
+		return json.dumps({"error": f"database error: {err}"})
+	except Exception as err:  # noqa: BLE001 - a failing tool must not end the chat stream
+		return json.dumps({"error": f"{name} failed: {err}"})
+
+
+def run_tool_calls(calls: list, user_id: Optional[str] = None) -> list:
+	"""Run independent ``(name, arguments)`` calls in parallel, keeping their order."""
+
+	if len(calls) == 1:
+		name, arguments = calls[0]
+		return [run_tool(name, arguments, user_id)]
+	# Each call runs in its own copy of the caller's context so it reads the caller's branch.
+	contexts = [contextvars.copy_context() for _ in calls]
+	return list(
+		_executor.map(lambda context, call: context.run(run_tool, call[0], call[1], user_id), contexts, calls)
+	)
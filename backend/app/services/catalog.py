@@ -0,0 +1,333 @@
+"""In-process medication catalog index used by the chat agent tools."""
+
+import threading
+import time
+from typing import Optional
+
+from .. import db, metrics
+from .interaction_index import InteractionIndex
+
+
+REFRESH_INTERVAL = 1.0
+_CHUNK = 500
+
+_QUERIES = {
+	"medication": """
+		SELECT id, name, active_ingredient, category, dosage_instructions,
+			stock_quantity, requires_prescription, retail_price
+		FROM medications
+	""",
+	"prescription": "SELECT id, user_id, doctor_id, issued_date, is_active FROM prescriptions",
+	"prescription_item": """
+		SELECT id, prescription_id, med_id, initial_periods, remaining_periods
+		FROM prescription_items
+	""",
+	"interaction": "SELECT id, med_1_id, med_2_id, severity, description FROM interactions",
+}
+
+# Stock-only updates are logged under their own entity so they leave cached prices alone.
+_STOCK_QUERY = "SELECT id, stock_quantity FROM medications"
+
+_STORES = (
+	"medications", "prescriptions", "items", "interactions",
+	"_by_name", "_by_ingredient", "_rx_by_user", "_items_by_rx", "interaction_index",
+)
+
+
+class MedicationCatalog:
+	"""Read-mostly in-memory copy of medications, prescriptions and interactions.
+
+	The catalog is loaded once and then kept current from the ``catalog_changes``
+	log written by triggers: a refresh reloads only the rows whose version moved
+	since the last refresh. Lookups never touch SQLite; refreshes happen at most
+	once per ``refresh_interval`` seconds. A refresh mutates the maps in place,
+	so every lookup reads them under ``_lock`` and returns copies of the
+	containers it walks; a full load builds new maps and swaps them in.
+	"""
+
+	def __init__(self, pool: Optional[db.ConnectionPool] = None, refresh_interval: float = REFRESH_INTERVAL) -> None:
+		self._pool = pool
+		self.refresh_interval = refresh_interval
+		self._lock = threading.Lock()
+		self._loaded = False
+		self._version = 0
+		self._identity = None
+		self._checked_at = 0.0
+
+		self.medications: dict = {}
+		self.prescriptions: dict = {}
+		self.items: dict = {}
+		self.interactions: dict = {}
+		self._by_name: dict = {}
+		self._by_ingredient: dict = {}
+		self._rx_by_user: dict = {}
+		self._items_by_rx: dict = {}
+		self.interaction_index = InteractionIndex()
+
+		self.full_loads = 0
+		self.incremental_refreshes = 0
+		self.rows_refreshed = 0
+
+	@property
+	def pool(self) -> db.ConnectionPool:
+		return self._pool or db.get_pool()
+
+	def ensure_fresh(self) -> None:
+		"""Load on first use, then apply pending changes at most once per interval."""
+
+		now = time.monotonic()
+		if self._loaded and now - self._checked_at < self.refresh_interval:
+			return
+		with self._lock:
+			if self._loaded and now - self._checked_at < self.refresh_interval:
+				return
+			if self._loaded:
+				self._refresh()
+			else:
+				self._load()
+			self._checked_at = time.monotonic()
+
+	def reload(self) -> None:
+		"""Drop everything and load the catalog from scratch."""
+
+		with self._lock:
+			self._load()
+			self._checked_at = time.monotonic()
+
+	def _load(self) -> None:
+		# Build into a scratch catalog and swap its maps in only once every query
+		# has succeeded, so a failed load leaves the previous copy to serve from.
+		self._loaded = False
+		staged = MedicationCatalog(self._pool, self.refresh_interval)
+		pool = self.pool
+		identity = pool.file_identity()
+		with pool.connection() as conn, metrics.time_query("catalog_load"):
+			version = conn.execute("SELECT COALESCE(MAX(version), 0) FROM catalog_changes;").fetchone()[0]
+			for entity, query in _QUERIES.items():
+				for row in conn.execute(query + ";"):
+					staged._add(entity, row)
+
+		for name in _STORES:
+			setattr(self, name, getattr(staged, name))
+		self._identity = identity
+		self._version = version
+		self._loaded = True
+		self.full_loads += 1
+
+	def _refresh(self) -> None:
+		if self.pool.file_identity() != self._identity:
+			self._load()
+			return
+
+		with self.pool.connection() as conn, metrics.time_query("catalog_refresh"):
+			latest = conn.execute("SELECT COALESCE(MAX(version), 0) FROM catalog_changes;").fetchone()[0]
+			if latest == self._version:
+				return
+			if latest > self._version:
+				self._apply_changes(conn, latest)
+				return
+
+		# The change log went backwards: the database was rebuilt in place.
+		self._load()
+
+	def _apply_changes(self, conn, latest: int) -> None:
+		changed = conn.execute(
+			"SELECT entity, entity_id FROM catalog_changes WHERE version > ?;",
+			(self._version,),
+		).fetchall()
+		by_entity: dict = {}
+		for entity, entity_id in changed:
+			by_entity.setdefault(entity, []).append(entity_id)
+
+		for entity, ids in by_entity.items():
+			query = _STOCK_QUERY if entity == "medication_stock" else _QUERIES.get(entity)
+			if query is None:
+				continue
+			for start in range(0, len(ids), _CHUNK):
+				chunk = ids[start:start + _CHUNK]
+				placeholders = ", ".join("?" for _ in chunk)
+				rows = conn.execute(f"{query} WHERE id IN ({placeholders});", chunk).fetchall()
+				if entity == "medication_stock":
+					self._set_stock(rows)
+				else:
+					for entity_id in chunk:
+						self._remove(entity, entity_id)
+					for row in rows:
+						self._add(entity, row)
+				self.rows_refreshed += len(chunk)
+
+		self._version = latest
+		self.incremental_refreshes += 1
+
+	def _add(self, entity: str, row: tuple) -> None:
+		if entity == "medication":
+			med_id, name, ingredient, category, dosage, stock, requires_rx, retail_price = row
+			self.medications[med_id] = {
+				"id": med_id,
+				"name": name,
+				"active_ingredient": ingredient,
+				"category": category,
+				"dosage_instructions": dosage,
+				"stock_quantity": stock,
+				"requires_prescription": bool(requires_rx),
+				"retail_price": retail_price,
+			}
+			self._by_name[name.lower()] = med_id
+			self._by_ingredient.setdefault(ingredient.lower(), set()).add(med_id)
+		elif entity == "prescription":
+			rx_id, user_id, doctor_id, issued_date, is_active = row
+			self.prescriptions[rx_id] = {
+				"id": rx_id,
+				"user_id": user_id,
+				"doctor_id": doctor_id,
+				"issued_date": issued_date,
+				"is_active": bool(is_active),
+			}
+			self._rx_by_user.setdefault(user_id, set()).add(rx_id)
+		elif entity == "prescription_item":
+			item_id, rx_id, med_id, initial_periods, remaining_periods = row
+			self.items[item_id] = {
+				"id": item_id,
+				"prescription_id": rx_id,
+				"med_id": med_id,
+				"initial_periods": initial_periods,
+				"remaining_periods": remaining_periods,
+			}
+			self._items_by_rx.setdefault(rx_id, set()).add(item_id)
+		elif entity == "interaction":
+			interaction_id, med_1_id, med_2_id, severity, description = row
+			self.interactions[interaction_id] = {
+				"id": interaction_id,
+				"med_1_id": med_1_id,
+				"med_2_id": med_2_id,
+				"severity": severity,
+				"description": description,
+			}
+			self.interaction_index.add(self.interactions[interaction_id])
+
+	def _set_stock(self, rows: list) -> None:
+		for med_id, stock_quantity in rows:
+			med = self.medications.get(med_id)
+			if med:
+				# A new record, as lookups hand the stored dicts out to callers.
+				self.medications[med_id] = {**med, "stock_quantity": stock_quantity}
+
+	def _remove(self, entity: str, entity_id: str) -> None:
+		if entity == "medication":
+			med = self.medications.pop(entity_id, None)
+			if med:
+				if self._by_name.get(med["name"].lower()) == entity_id:
+					del self._by_name[med["name"].lower()]
+				self._by_ingredient.get(med["active_ingredient"].lower(), set()).discard(entity_id)
+		elif entity == "prescription":
+			rx = self.prescriptions.pop(entity_id, None)
+			if rx:
+				self._rx_by_user.get(rx["user_id"], set()).discard(entity_id)
+		elif entity == "prescription_item":
+			item = self.items.pop(entity_id, None)
+			if item:
+				self._items_by_rx.get(item["prescription_id"], set()).discard(entity_id)
+		elif entity == "interaction":
+			self.interactions.pop(entity_id, None)
+			self.interaction_index.remove(entity_id)
+
+	def find_medications(self, query: str) -> list:
+		"""Resolve an id, brand name or active ingredient to medication records."""
+
+		self.ensure_fresh()
+		key = query.strip().lower()
+		with self._lock:
+			if query in self.medications:
+				return [self.medications[query]]
+			if key in self._by_name:
+				return [self.medications[self._by_name[key]]]
+			ids = sorted(self._by_ingredient.get(key, ()))
+			return [self.medications[med_id] for med_id in ids if med_id in self.medications]
+
+	def medication(self, med_id: str) -> Optional[dict]:
+		self.ensure_fresh()
+		with self._lock:
+			return self.medications.get(med_id)
+
+	def missing(self, med_ids: list) -> list:
+		"""The given medication ids that are not in the catalog, in order."""
+
+		self.ensure_fresh()
+		with self._lock:
+			return [med_id for med_id in med_ids if med_id not in self.medications]
+
+	def user_prescriptions(self, user_id: str) -> list:
+		"""Prescriptions for a user with their items, newest first."""
+
+		self.ensure_fresh()
+		result = []
+		with self._lock:
+			for rx_id in list(self._rx_by_user.get(user_id, ())):
+				rx = self.prescriptions.get(rx_id)
+				if not rx:
+					continue
+				items = [self.items[item_id] for item_id in self._items_by_rx.get(rx_id, ()) if item_id in self.items]
+				result.append({**rx, "items": sorted(items, key=lambda item: item["id"])})
+		return sorted(result, key=lambda rx: rx["issued_date"], reverse=True)
+
+	def interactions_between(self, med_ids: list) -> list:
+		"""Known interactions among any two of the given medications, most severe first."""
+
+		self.ensure_fresh()
+		with self._lock:
+			return self.interaction_index.between(med_ids)
+
+	def interactions_with(self, user_id: str, med_id: str) -> list:
+		"""Interactions between ``med_id`` and the user's active prescriptions, most severe first."""
+
+		self.ensure_fresh()
+		with self._lock:
+			return self.interaction_index.with_candidate(self._active_med_ids(user_id), med_id)
+
+	def active_med_ids(self, user_id: str) -> set:
+		"""Medications on the user's active prescriptions that still have periods left."""
+
+		self.ensure_fresh()
+		with self._lock:
+			return self._active_med_ids(user_id)
+
+	def _active_med_ids(self, user_id: str) -> set:
+		med_ids = set()
+		for rx_id in self._rx_by_user.get(user_id, ()):
+			rx = self.prescriptions.get(rx_id)
+			if not rx or not rx["is_active"]:
+				continue
+			for item_id in self._items_by_rx.get(rx_id, ()):
+				item = self.items.get(item_id)
+				if item and item["remaining_periods"] > 0:
+					med_ids.add(item["med_id"])
+		return med_ids
+
+	def stats(self) -> dict:
+		return {
+			"medications": len(self.medications),
+			"prescriptions": len(self.prescriptions),
+			"prescription_items": len(self.items),
+			"interactions": len(self.interactions),
+			"version": self._version,
+			"full_loads": self.full_loads,
+			"incremental_refreshes": self.incremental_refreshes,
+			"rows_refreshed": self.rows_refreshed,
+		}
+
+
+_catalogs: dict = {}
+_catalog_lock = threading.Lock()
+
+
+def get_catalog() -> MedicationCatalog:
+	"""Return the current branch's catalog, created on first use."""
+
+	branch = db.current_branch()
+	catalog = _catalogs.get(branch)
+	if catalog is None:
+		with _catalog_lock:
+			catalog = _catalogs.get(branch)
+			if catalog is None:
+				catalog = _catalogs[branch] = MedicationCatalog()
+	return catalog
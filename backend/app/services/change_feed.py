@@ -0,0 +1,293 @@
+"""In-process feed of committed stock, prescription and budget changes, fanned out to SSE subscribers."""
+
+import json
+import os
+import threading
+from collections import deque
+from datetime import datetime, timezone
+from typing import Callable, Iterator, Optional
+
+from .. import db, metrics
+from .reference_cache import get_reference_cache
+
+
+CHANGE_FEED_BUFFER = int(os.getenv("CHANGE_FEED_BUFFER", "256"))
+CHANGE_FEED_HISTORY = int(os.getenv("CHANGE_FEED_HISTORY", "1024"))
+CHANGE_FEED_MAX_SUBSCRIBERS = int(os.getenv("CHANGE_FEED_MAX_SUBSCRIBERS", "10000"))
+CHANGE_FEED_HEARTBEAT = float(os.getenv("CHANGE_FEED_HEARTBEAT", "15"))
+
+TOPIC_KINDS = ("user", "med", "branch")
+MAX_TOPICS = 50
+
+HEARTBEAT = ": keepalive\n\n"
+
+
+class FeedFull(RuntimeError):
+	"""The broker already has its maximum number of subscribers."""
+
+
+class ChangeEvent:
+	"""One published change; its SSE text is rendered once and shared by every subscriber."""
+
+	__slots__ = ("id", "type", "topics", "payload", "text")
+
+	def __init__(self, event_id: int, event_type: str, topics: tuple, payload: dict) -> None:
+		self.id = event_id
+		self.type = event_type
+		self.topics = topics
+		self.payload = payload
+		self.text = f"id: {event_id}\nevent: {event_type}\ndata: {json.dumps(payload)}\n\n"
+
+
+def parse_topics(values: list) -> frozenset:
+	"""Validate ``kind:id`` topics (also accepted comma-separated); branch topics must name a known branch."""
+
+	topics = set()
+	for value in values:
+		for topic in filter(None, (part.strip() for part in value.split(","))):
+			kind, _, key = topic.partition(":")
+			if kind not in TOPIC_KINDS or not key:
+				raise ValueError(f"Topic must look like {', '.join(kind + ':<id>' for kind in TOPIC_KINDS)}")
+			if kind == "branch":
+				key = db.get_router().resolve(key)
+			topics.add(f"{kind}:{key}")
+	if not topics:
+		raise ValueError("At least one topic is required")
+	if len(topics) > MAX_TOPICS:
+		raise ValueError(f"At most {MAX_TOPICS} topics may be subscribed at once")
+	return frozenset(topics)
+
+
+def check_access(user_id: Optional[str], topics: frozenset) -> None:
+	"""Medication topics are open to anyone; a user may follow their own ``user:`` topic, managers any topic."""
+
+	private = {topic for topic in topics if not topic.startswith("med:")}
+	if not private:
+		return
+	if not user_id:
+		raise PermissionError("Only managers can follow other users or whole branches")
+
+	user = get_reference_cache().user(user_id)
+	if not user:
+		raise ValueError("User not found")
+	if user["role"] != "manager" and private != {f"user:{user_id}"}:
+		raise PermissionError("Only managers can follow other users or whole branches")
+
+
+class Subscription:
+	"""A subscriber's bounded buffer of events.
+
+	When the buffer is full the oldest event is dropped and counted, and the
+	stream tells the client to resynchronize instead of letting one slow reader
+	hold memory or block publishers. ``notify`` is called (from the publishing
+	thread) only when the buffer goes from empty to non-empty, so a burst of
+	events costs one wakeup.
+	"""
+
+	def __init__(
+		self, broker: "ChangeBroker", topics: frozenset, max_buffer: int, notify: Optional[Callable[[], None]] = None
+	) -> None:
+		self.broker = broker
+		self.topics = topics
+		self.max_buffer = max_buffer
+		self.dropped = 0
+		self._events: deque = deque()
+		self._lock = threading.Lock()
+		self._ready = threading.Event()
+		self._notify = notify
+
+	def offer(self, event: ChangeEvent) -> None:
+		with self._lock:
+			was_empty = not self._events and not self.dropped
+			if len(self._events) >= self.max_buffer:
+				self._events.popleft()
+				self.dropped += 1
+			self._events.append(event)
+			self._ready.set()
+		if was_empty and self._notify is not None:
+			self._notify()
+
+	def mark_gap(self) -> None:
+		"""Record that events were missed before this subscription started."""
+
+		with self._lock:
+			self.dropped += 1
+			self._ready.set()
+
+	def drain(self) -> tuple:
+		"""Take everything buffered: ``(events, dropped)``."""
+
+		with self._lock:
+			events, self._events = list(self._events), deque()
+			dropped, self.dropped = self.dropped, 0
+			self._ready.clear()
+		return events, dropped
+
+	def wait(self, timeout: Optional[float] = None) -> bool:
+		return self._ready.wait(timeout)
+
+	def close(self) -> None:
+		self.broker.unsubscribe(self)
+
+	def __enter__(self) -> "Subscription":
+		return self
+
+	def __exit__(self, *_exc) -> None:
+		self.close()
+
+
+class ChangeBroker:
+	"""Fans published events out to the subscriptions of their topics.
+
+	Subscriptions are indexed by topic, so publishing touches only the matching
+	subscribers however many are connected. Events get increasing ids and the
+	last ``history`` are kept, so a reconnecting client sending ``Last-Event-ID``
+	gets what it missed, or a resync marker if that has already been evicted.
+	"""
+
+	def __init__(
+		self,
+		max_buffer: int = CHANGE_FEED_BUFFER,
+		history: int = CHANGE_FEED_HISTORY,
+		max_subscribers: int = CHANGE_FEED_MAX_SUBSCRIBERS,
+	) -> None:
+		self.max_buffer = max_buffer
+		self.max_subscribers = max_subscribers
+		self._history: deque = deque(maxlen=history)
+		self._by_topic: dict = {}
+		self._subscribers: set = set()
+		self._lock = threading.Lock()
+		self._last_id = 0
+
+		self.published = 0
+		self.delivered = 0
+
+	def subscribe(
+		self,
+		topics: frozenset,
+		last_event_id: Optional[str] = None,
+		notify: Optional[Callable[[], None]] = None,
+	) -> Subscription:
+		"""Register a subscription to ``topics``; raise FeedFull at ``max_subscribers``."""
+
+		try:
+			resume_after = None if last_event_id in (None, "") else int(last_event_id)
+		except ValueError:
+			raise ValueError("Last-Event-ID must be an integer") from None
+
+		subscription = Subscription(self, topics, self.max_buffer, notify)
+		with self._lock:
+			if len(self._subscribers) >= self.max_subscribers:
+				raise FeedFull("Too many change feed subscribers")
+			self._subscribers.add(subscription)
+			for topic in topics:
+				self._by_topic.setdefault(topic, set()).add(subscription)
+
+			if resume_after is not None and resume_after < self._last_id:
+				oldest = self._history[0].id if self._history else self._last_id + 1
+				if resume_after < oldest - 1:
+					subscription.mark_gap()
+				for event in self._history:
+					if event.id > resume_after and not topics.isdisjoint(event.topics):
+						subscription.offer(event)
+		return subscription
+
+	def unsubscribe(self, subscription: Subscription) -> None:
+		with self._lock:
+			if subscription not in self._subscribers:
+				return
+			self._subscribers.discard(subscription)
+			for topic in subscription.topics:
+				subscribers = self._by_topic.get(topic)
+				if subscribers is not None:
+					subscribers.discard(subscription)
+					if not subscribers:
+						del self._by_topic[topic]
+
+	def publish(self, event_type: str, topics: tuple, payload: dict) -> ChangeEvent:
+		"""Record an event and hand it to every subscription of any of ``topics``.
+
+		Delivery happens under the broker lock, so every subscriber sees events
+		in id order.
+		"""
+
+		with self._lock:
+			self._last_id += 1
+			event = ChangeEvent(self._last_id, event_type, topics, payload)
+			self._history.append(event)
+			targets = set()
+			for topic in topics:
+				targets.update(self._by_topic.get(topic, ()))
+			for subscription in targets:
+				subscription.offer(event)
+			self.published += 1
+			self.delivered += len(targets)
+		return event
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"subscribers": len(self._subscribers),
+				"topics": len(self._by_topic),
+				"published": self.published,
+				"delivered": self.delivered,
+				"last_event_id": self._last_id,
+			}
+
+
+broker = ChangeBroker()
+
+
+def publish_on_commit(event_type: str, payload: dict, user_id: Optional[str] = None, med_id: Optional[str] = None) -> None:
+	"""Publish an event for the current branch once the enclosing ``db.write`` commits.
+
+	Call it from inside a write function after its checks have passed; if the
+	write rolls back, nothing is published.
+	"""
+
+	branch = db.current_branch()
+	topics = [f"branch:{branch}"]
+	if user_id is not None:
+		topics.append(f"user:{user_id}")
+	if med_id is not None:
+		topics.append(f"med:{med_id}")
+	payload = {"branch": branch, **payload, "at": datetime.now(timezone.utc).isoformat()}
+	db.on_commit(lambda: broker.publish(event_type, tuple(topics), payload))
+
+
+def render(events: list, dropped: int) -> str:
+	"""SSE text for drained events, preceded by a ``resync`` event if any were dropped."""
+
+	chunk = "".join(event.text for event in events)
+	if dropped:
+		chunk = f"event: resync\ndata: {json.dumps({'dropped': dropped})}\n\n" + chunk
+	return chunk
+
+
+def stream(subscription: Subscription, heartbeat: float = CHANGE_FEED_HEARTBEAT) -> Iterator[str]:
+	"""Yield SSE text for ``subscription`` until the client goes away, with a comment every ``heartbeat`` seconds when idle."""
+
+	try:
+		yield HEARTBEAT
+		while True:
+			chunk = render(*subscription.drain())
+			if chunk:
+				yield chunk
+			elif not subscription.wait(heartbeat):
+				yield HEARTBEAT
+	finally:
+		subscription.close()
+
+
+metrics.REGISTRY.register_callback(
+	"pharmacy_change_feed_subscribers", "Open change feed subscriptions.", "gauge",
+	lambda: broker.stats()["subscribers"],
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_change_feed_published_total", "Change events published after commit.", "counter",
+	lambda: broker.published,
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_change_feed_delivered_total", "Change events queued to subscribers.", "counter",
+	lambda: broker.delivered,
+)
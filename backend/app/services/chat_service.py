@@ -0,0 +1,276 @@
+"""Chat completion streaming against an OpenAI-compatible API."""
+
+import asyncio
+import json
+import os
+from typing import AsyncIterator, Iterator, Optional
+
+from openai import AsyncOpenAI, OpenAI
+
+from .. import metrics
+from . import agent_tools
+from .conversation_store import Conversation, ConversationStore
+from .response_cache import ResponseCache, cache_key
+
+
+OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_MODEL = os.getenv("OPENAI_MODEL")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL") or None
+client = OpenAI(api_key=OPENAI_API_KEY, base_url=OPENAI_BASE_URL) if OPENAI_API_KEY else None
+
+SYSTEM_PROMPT = (
+	"You are a helpful pharmacy assistant. Provide factual information only. "
+	"Do not give medical advice. Redirect advice requests to a healthcare professional."
+)
+
+DONE_EVENT = "data: [DONE]\n\n"
+
+CHAT_CACHE_SIZE = int(os.getenv("CHAT_CACHE_SIZE", "1024"))
+CHAT_CACHE_TTL = float(os.getenv("CHAT_CACHE_TTL", "3600"))
+CHAT_CACHE_PATH = os.getenv("CHAT_CACHE_PATH") or None
+response_cache = ResponseCache(CHAT_CACHE_SIZE, CHAT_CACHE_TTL, CHAT_CACHE_PATH)
+
+CHAT_SESSION_MAX = int(os.getenv("CHAT_SESSION_MAX", "1000"))
+CHAT_SESSION_TTL = float(os.getenv("CHAT_SESSION_TTL", "86400"))
+CHAT_SESSION_PATH = os.getenv("CHAT_SESSION_PATH") or None
+CHAT_HISTORY_TOKENS = int(os.getenv("CHAT_HISTORY_TOKENS", "2000"))
+CHAT_SUMMARY_TOKENS = int(os.getenv("CHAT_SUMMARY_TOKENS", "300"))
+conversations = ConversationStore(
+	CHAT_SESSION_MAX, CHAT_SESSION_TTL, CHAT_SESSION_PATH, CHAT_HISTORY_TOKENS, CHAT_SUMMARY_TOKENS
+)
+
+CHAT_TOOLS_ENABLED = os.getenv("CHAT_TOOLS_ENABLED", "1") == "1"
+CHAT_MAX_TOOL_ROUNDS = int(os.getenv("CHAT_MAX_TOOL_ROUNDS", "4"))
+
+
+def is_configured() -> bool:
+	return bool(OPENAI_API_KEY and OPENAI_MODEL and client is not None)
+
+
+def format_event(payload: dict) -> str:
+	"""Encode one SSE ``data:`` event in the format the frontend parses."""
+
+	return f"data: {json.dumps(payload)}\n\n"
+
+
+def build_messages(user_message: str, conversation: Optional[Conversation] = None) -> list:
+	"""System prompt first so every request shares a cacheable prefix, then any session history."""
+
+	history = conversation.messages() if conversation is not None else []
+	return [{"role": "system", "content": SYSTEM_PROMPT}, *history, {"role": "user", "content": user_message}]
+
+
+def open_session(session_id: Optional[str]) -> Optional[Conversation]:
+	"""Resolve a request's ``session_id``: None opts out, empty or unknown starts a new session."""
+
+	return None if session_id is None else conversations.open(session_id)
+
+
+def is_cacheable(conversation: Optional[Conversation]) -> bool:
+	"""Replies only depend on the question alone when there is no earlier history."""
+
+	return conversation is None or not (conversation.turns or conversation.summary)
+
+
+def session_event(conversation: Conversation) -> str:
+	return format_event({"session_id": conversation.id})
+
+
+def lookup_cached(user_message: str, model: str) -> Optional[list]:
+	"""Return the cached token list for this question, or None on a miss."""
+
+	return response_cache.get(cache_key(user_message, SYSTEM_PROMPT, model or ""))
+
+
+def replay_events(tokens: list) -> Iterator[str]:
+	"""Re-emit a cached reply in the same SSE format as a live stream."""
+
+	for token in tokens:
+		yield format_event({"token": token})
+	yield DONE_EVENT
+
+
+class _ToolCallCollector:
+	"""Reassemble streamed tool-call deltas into complete calls."""
+
+	def __init__(self) -> None:
+		self.calls: dict = {}
+
+	def __bool__(self) -> bool:
+		return bool(self.calls)
+
+	def add(self, deltas: list) -> None:
+		for delta in deltas:
+			call = self.calls.setdefault(delta.index, {"id": "", "name": "", "arguments": ""})
+			if delta.id:
+				call["id"] = delta.id
+			if delta.function:
+				call["name"] += delta.function.name or ""
+				call["arguments"] += delta.function.arguments or ""
+
+	def ordered(self) -> list:
+		return [self.calls[index] for index in sorted(self.calls)]
+
+	def messages(self, content: str, results: list) -> list:
+		"""Assistant tool-call message followed by one tool message per result."""
+
+		calls = self.ordered()
+		assistant = {
+			"role": "assistant",
+			"content": content or None,
+			"tool_calls": [
+				{"id": call["id"], "type": "function", "function": {"name": call["name"], "arguments": call["arguments"]}}
+				for call in calls
+			],
+		}
+		return [assistant] + [
+			{"role": "tool", "tool_call_id": call["id"], "content": result}
+			for call, result in zip(calls, results)
+		]
+
+
+def _request_kwargs(model: str, messages: list, tool_round: int, user_id: Optional[str] = None) -> dict:
+	kwargs = {"model": model, "messages": messages, "stream": True}
+	if CHAT_TOOLS_ENABLED and tool_round < CHAT_MAX_TOOL_ROUNDS:
+		kwargs["tools"] = agent_tools.tool_specs(user_id)
+	return kwargs
+
+
+def _consume_chunk(chunk, collector: _ToolCallCollector) -> Optional[str]:
+	if not chunk.choices:
+		return None
+	delta = chunk.choices[0].delta
+	if delta.tool_calls:
+		collector.add(delta.tool_calls)
+	return delta.content or None
+
+
+def _record_turn(conversation: Optional[Conversation], user_message: str, tokens: list) -> None:
+	if conversation is not None:
+		conversations.record(conversation.id, user_message, "".join(tokens))
+
+
+def stream_reply(
+	user_message: str, user_id: Optional[str] = None, conversation: Optional[Conversation] = None
+) -> Iterator[str]:
+	"""Yield SSE events for a reply using the blocking client, serving cache hits first.
+
+	When the model calls tools, they run against the in-memory catalog and the
+	conversation continues until the model answers in text. Replies that used
+	tools depend on live data and are not cached. With a ``conversation`` the
+	first event carries its ``session_id`` and the finished turn is recorded.
+	"""
+
+	if conversation is not None:
+		yield session_event(conversation)
+
+	key = cache_key(user_message, SYSTEM_PROMPT, OPENAI_MODEL or "") if is_cacheable(conversation) else None
+	cached = response_cache.get(key) if key else None
+	if cached is not None:
+		_record_turn(conversation, user_message, cached)
+		yield from replay_events(cached)
+		return
+
+	messages = build_messages(user_message, conversation)
+	tokens = []
+	used_tools = False
+	stream = metrics.StreamMetrics("sync")
+	completed = False
+	try:
+		for tool_round in range(CHAT_MAX_TOOL_ROUNDS + 1):
+			response = client.chat.completions.create(**_request_kwargs(OPENAI_MODEL, messages, tool_round, user_id))
+
+			collector = _ToolCallCollector()
+			text = []
+			for chunk in response:
+				content = _consume_chunk(chunk, collector)
+				if content:
+					stream.token()
+					tokens.append(content)
+					text.append(content)
+					yield format_event({"token": content})
+
+			if not collector:
+				break
+			used_tools = True
+			calls = [(call["name"], call["arguments"]) for call in collector.ordered()]
+			messages.extend(collector.messages("".join(text), agent_tools.run_tool_calls(calls, user_id)))
+
+		if key and not used_tools:
+			response_cache.put(key, tokens)
+		_record_turn(conversation, user_message, tokens)
+		completed = True
+		yield DONE_EVENT
+	except Exception as exc:  # noqa: BLE001
+		stream.failed(exc)
+		yield format_event({"error": str(exc)})
+	finally:
+		stream.finish(completed)
+
+
+async def astream_reply(
+	async_client: AsyncOpenAI,
+	model: str,
+	user_message: str,
+	check_cache: bool = True,
+	user_id: Optional[str] = None,
+	conversation: Optional[Conversation] = None,
+) -> AsyncIterator[str]:
+	"""Yield SSE events for a reply using a shared async client.
+
+	The upstream stream is closed as soon as the consumer stops iterating, so a
+	client disconnect releases the upstream connection back to the pool. Only
+	complete replies without tool calls are cached; pass ``check_cache=False`` if
+	the caller has already looked the question up. Sessions are handled as in
+	``stream_reply``; an interrupted reply is not recorded. Cache and session
+	reads and writes may hit SQLite, so they run in worker threads.
+	"""
+
+	if conversation is not None:
+		yield session_event(conversation)
+
+	key = cache_key(user_message, SYSTEM_PROMPT, model or "") if is_cacheable(conversation) else None
+	cached = await asyncio.to_thread(response_cache.get, key) if key and check_cache else None
+	if cached is not None:
+		await asyncio.to_thread(_record_turn, conversation, user_message, cached)
+		for event in replay_events(cached):
+			yield event
+		return
+
+	messages = build_messages(user_message, conversation)
+	tokens = []
+	used_tools = False
+	stream = metrics.StreamMetrics("async")
+	completed = False
+	try:
+		for tool_round in range(CHAT_MAX_TOOL_ROUNDS + 1):
+			response = await async_client.chat.completions.create(**_request_kwargs(model, messages, tool_round, user_id))
+
+			collector = _ToolCallCollector()
+			text = []
+			async with response:
+				async for chunk in response:
+					content = _consume_chunk(chunk, collector)
+					if content:
+						stream.token()
+						tokens.append(content)
+						text.append(content)
+						yield format_event({"token": content})
+
+			if not collector:
+				break
+			used_tools = True
+			calls = [(call["name"], call["arguments"]) for call in collector.ordered()]
+			results = await asyncio.to_thread(agent_tools.run_tool_calls, calls, user_id)
+			messages.extend(collector.messages("".join(text), results))
+
+		if key and not used_tools:
+			await asyncio.to_thread(response_cache.put, key, tokens)
+		await asyncio.to_thread(_record_turn, conversation, user_message, tokens)
+		completed = True
+		yield DONE_EVENT
+	except Exception as exc:  # noqa: BLE001
+		stream.failed(exc)
+		yield format_event({"error": str(exc)})
+	finally:
+		stream.finish(completed)
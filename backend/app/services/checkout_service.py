@@ -0,0 +1,81 @@
+"""Single-request sale: fulfillment, pricing and charging in one transaction."""
+
+import sqlite3
+from typing import Optional
+
+from .. import db
+from . import change_feed
+from .prescription_service import _apply_fulfillment
+from .reference_cache import get_reference_cache
+from .user_service import _apply_transaction
+
+
+def checkout(user_id: str, med_id: str, quantity: int) -> dict:
+	"""Sell ``quantity`` of a medication to a user and charge them for it.
+
+	Prescription medications consume prescription periods exactly like
+	``fulfill_prescription``; over-the-counter ones only need stock. The
+	stock decrement, debt increase and ledger entry commit together or not at
+	all. The price is the medication's retail price, computed here rather than
+	by the client.
+	"""
+
+	if quantity <= 0:
+		raise ValueError("Requested quantity must be positive")
+
+	cache = get_reference_cache()
+	if not cache.user(user_id):
+		raise ValueError("User not found")
+	med = cache.medication(med_id)
+	if not med:
+		raise ValueError("Medication not found")
+
+	unit_price = med["retail_price"]
+	amount = unit_price * quantity
+	item_id = db.write(
+		_apply_checkout, user_id, med_id, quantity, med["requires_prescription"], amount, name="checkout"
+	)
+
+	return {
+		"user_id": user_id,
+		"med_id": med_id,
+		"quantity": quantity,
+		"item_id": item_id,
+		"unit_price": unit_price,
+		"amount": amount,
+	}
+
+
+def _apply_checkout(
+	conn: sqlite3.Connection,
+	user_id: str,
+	med_id: str,
+	quantity: int,
+	requires_prescription: bool,
+	amount: float,
+) -> Optional[str]:
+	cursor = conn.cursor()
+
+	item_id = None
+	if requires_prescription:
+		item_id = _apply_fulfillment(cursor, user_id, med_id, quantity)
+	else:
+		cursor.execute(
+			"""
+			UPDATE medications
+			SET stock_quantity = stock_quantity - ?
+			WHERE id = ? AND stock_quantity >= ?
+			RETURNING stock_quantity;
+			""",
+			(quantity, med_id, quantity),
+		)
+		stock_row = cursor.fetchone()
+		if not stock_row:
+			cursor.execute("SELECT 1 FROM medications WHERE id = ?;", (med_id,))
+			if not cursor.fetchone():
+				raise ValueError("Medication not found")
+			raise ValueError("Insufficient stock")
+		change_feed.publish_on_commit("stock", {"med_id": med_id, "stock_quantity": stock_row[0]}, med_id=med_id)
+
+	_apply_transaction(conn, user_id, amount)
+	return item_id
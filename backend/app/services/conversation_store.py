@@ -0,0 +1,227 @@
+"""Server-side chat sessions whose history is kept within a token budget."""
+
+import json
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from ..db import ConnectionPool
+
+
+MESSAGE_OVERHEAD_TOKENS = 4
+TRUNCATION_MARK = " [...]"
+
+
+def estimate_tokens(text: str) -> int:
+	"""Cheap token estimate (about four characters per token for English text)."""
+
+	return len(text) // 4 + 1
+
+
+def _clip(text: str, limit: int) -> str:
+	text = " ".join(text.split())
+	return text if len(text) <= limit else text[:limit].rstrip() + TRUNCATION_MARK
+
+
+class Conversation:
+	"""One session: a rolling summary of compacted turns plus the recent turns verbatim."""
+
+	__slots__ = ("id", "summary", "turns", "updated_at")
+
+	def __init__(self, conversation_id: str, summary: Optional[list] = None, turns: Optional[list] = None) -> None:
+		self.id = conversation_id
+		self.summary = list(summary or [])
+		self.turns = list(turns or [])
+		self.updated_at = time.time()
+
+	@property
+	def history_tokens(self) -> int:
+		return sum(tokens for _role, _content, tokens in self.turns)
+
+	def copy(self) -> "Conversation":
+		clone = Conversation(self.id, self.summary, self.turns)
+		clone.updated_at = self.updated_at
+		return clone
+
+	def messages(self) -> list:
+		"""Chat messages for the summary (if any) followed by the recent turns."""
+
+		messages = []
+		if self.summary:
+			messages.append({"role": "system", "content": "Earlier in this conversation:\n" + "\n".join(self.summary)})
+		messages.extend({"role": role, "content": content} for role, content, _tokens in self.turns)
+		return messages
+
+
+class ConversationStore:
+	"""Bounded LRU of chat sessions with idle expiry, optionally backed by a SQLite file.
+
+	Each recorded turn is compacted immediately, so the history sent upstream never
+	exceeds ``history_tokens`` and the work per turn does not grow with the length
+	of the conversation. Once over budget, the oldest turns are folded into a short
+	extractive summary until the history is back under ``low_water`` of the budget;
+	compacting in chunks keeps the prompt prefix unchanged for several turns so
+	provider-side prompt caching can apply.
+	"""
+
+	def __init__(
+		self,
+		max_sessions: int = 1000,
+		ttl: float = 86400.0,
+		path: Optional[Path] = None,
+		history_tokens: int = 2000,
+		summary_tokens: int = 300,
+		low_water: float = 0.5,
+	) -> None:
+		self.max_sessions = max_sessions
+		self.ttl = ttl
+		self.history_tokens = history_tokens
+		self.summary_tokens = summary_tokens
+		self.low_water = low_water
+		self._sessions: OrderedDict = OrderedDict()
+		self._lock = threading.Lock()
+		self._pool: Optional[ConnectionPool] = None
+
+		self.created = 0
+		self.expired = 0
+		self.evictions = 0
+		self.compactions = 0
+
+		if path:
+			self._pool = ConnectionPool(Path(path), max_size=2)
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute(
+						"""
+						CREATE TABLE IF NOT EXISTS chat_sessions (
+							id TEXT PRIMARY KEY,
+							summary TEXT NOT NULL,
+							turns TEXT NOT NULL,
+							updated_at REAL NOT NULL
+						);
+						"""
+					)
+
+	def create(self) -> Conversation:
+		conversation = Conversation(uuid.uuid4().hex)
+		with self._lock:
+			self._remember(conversation)
+			self.created += 1
+		return conversation.copy()
+
+	def get(self, conversation_id: str) -> Optional[Conversation]:
+		"""Return a snapshot of the session, or None if it is unknown or expired."""
+
+		now = time.time()
+		with self._lock:
+			conversation = self._sessions.get(conversation_id)
+			if conversation is not None:
+				if now - conversation.updated_at < self.ttl:
+					self._sessions.move_to_end(conversation_id)
+					return conversation.copy()
+				del self._sessions[conversation_id]
+				self.expired += 1
+
+		conversation = self._disk_get(conversation_id, now)
+		if conversation is None:
+			return None
+		with self._lock:
+			self._remember(conversation)
+		return conversation.copy()
+
+	def open(self, conversation_id: str) -> Conversation:
+		"""Return the session ``conversation_id``, or a new one if it is empty or unknown."""
+
+		return (self.get(conversation_id) if conversation_id else None) or self.create()
+
+	def record(self, conversation_id: str, user_message: str, reply: str) -> None:
+		"""Append one question and answer to the session and compact it to the budget."""
+
+		per_message = max(self.history_tokens // 4, 1)
+		turns = []
+		for role, content in (("user", user_message), ("assistant", reply)):
+			if estimate_tokens(content) > per_message:
+				content = content[: per_message * 4].rstrip() + TRUNCATION_MARK
+			turns.append((role, content, estimate_tokens(content) + MESSAGE_OVERHEAD_TOKENS))
+
+		with self._lock:
+			known = conversation_id in self._sessions
+		stored = None if known else self._disk_get(conversation_id, time.time())
+
+		with self._lock:
+			conversation = self._sessions.get(conversation_id) or stored or Conversation(conversation_id)
+			conversation.turns.extend(turns)
+			conversation.updated_at = time.time()
+			self._compact(conversation)
+			self._remember(conversation)
+			snapshot = conversation.copy()
+
+		if self._pool is not None:
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute(
+						"INSERT OR REPLACE INTO chat_sessions (id, summary, turns, updated_at) VALUES (?, ?, ?, ?);",
+						(snapshot.id, json.dumps(snapshot.summary), json.dumps(snapshot.turns), snapshot.updated_at),
+					)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._sessions.clear()
+		if self._pool is not None:
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute("DELETE FROM chat_sessions;")
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"sessions": len(self._sessions),
+				"max_sessions": self.max_sessions,
+				"created": self.created,
+				"expired": self.expired,
+				"evictions": self.evictions,
+				"compactions": self.compactions,
+			}
+
+	def _compact(self, conversation: Conversation) -> None:
+		if conversation.history_tokens <= self.history_tokens:
+			return
+
+		target = int(self.history_tokens * self.low_water)
+		turns = conversation.turns
+		# Keep the newest exchange verbatim even if it alone is over the target.
+		while len(turns) > 2 and conversation.history_tokens > target:
+			question, answer = turns[0][1], turns[1][1]
+			del turns[:2]
+			conversation.summary.append(f"- User asked: {_clip(question, 160)} Assistant: {_clip(answer, 240)}")
+
+		summary_tokens = sum(estimate_tokens(line) for line in conversation.summary)
+		while len(conversation.summary) > 1 and summary_tokens > self.summary_tokens:
+			summary_tokens -= estimate_tokens(conversation.summary.pop(0))
+		self.compactions += 1
+
+	def _remember(self, conversation: Conversation) -> None:
+		self._sessions[conversation.id] = conversation
+		self._sessions.move_to_end(conversation.id)
+		while len(self._sessions) > self.max_sessions:
+			self._sessions.popitem(last=False)
+			self.evictions += 1
+
+	def _disk_get(self, conversation_id: str, now: float) -> Optional[Conversation]:
+		if self._pool is None:
+			return None
+
+		with self._pool.connection() as conn:
+			row = conn.execute(
+				"SELECT summary, turns, updated_at FROM chat_sessions WHERE id = ? AND updated_at > ?;",
+				(conversation_id, now - self.ttl),
+			).fetchone()
+		if not row:
+			return None
+
+		conversation = Conversation(conversation_id, json.loads(row[0]), [tuple(turn) for turn in json.loads(row[1])])
+		conversation.updated_at = row[2]
+		return conversation
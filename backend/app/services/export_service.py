@@ -0,0 +1,98 @@
+"""Streaming NDJSON/CSV exports of prescriptions, debts and financial history."""
+
+import csv
+import io
+import json
+import os
+from typing import Iterator
+
+from .. import db
+from .reference_cache import get_reference_cache
+
+
+EXPORT_CHUNK_ROWS = int(os.getenv("EXPORT_CHUNK_ROWS", "1000"))
+
+EXPORTS = {
+	"prescriptions": (
+		("id", "user_id", "doctor_id", "issued_date", "is_active"),
+		"SELECT id, user_id, doctor_id, issued_date, is_active FROM prescriptions ORDER BY id;",
+	),
+	"prescription_items": (
+		("id", "prescription_id", "med_id", "initial_periods", "remaining_periods"),
+		"""
+		SELECT id, prescription_id, med_id, initial_periods, remaining_periods
+		FROM prescription_items
+		ORDER BY id;
+		""",
+	),
+	"debts": (
+		("user_id", "name", "role", "debt"),
+		"SELECT id, name, role, debt FROM users WHERE debt != 0 ORDER BY id;",
+	),
+	"ledger": (
+		("id", "account_id", "kind", "budget_delta", "revenue_delta", "reference", "created_at"),
+		"""
+		SELECT id, account_id, kind, budget_delta, revenue_delta, reference, created_at
+		FROM financial_ledger
+		ORDER BY id;
+		""",
+	),
+	"financials": (
+		("account_id", "total_budget", "total_revenue"),
+		"SELECT id, total_budget, total_revenue FROM pharmacy_financials ORDER BY id;",
+	),
+}
+
+FORMATS = {"ndjson": "application/x-ndjson", "csv": "text/csv"}
+
+
+def check_export(user_id: str, name: str, fmt: str) -> None:
+	"""Validate an export request before any response is started."""
+
+	if name not in EXPORTS:
+		raise ValueError(f"Unknown export: {name}")
+	if fmt not in FORMATS:
+		raise ValueError(f"Format must be one of {', '.join(FORMATS)}")
+
+	user = get_reference_cache().user(user_id)
+	if not user:
+		raise ValueError("User not found")
+	if user["role"] != "manager":
+		raise PermissionError("Only managers can export data")
+
+
+def _ndjson_chunk(columns: tuple, rows: list) -> str:
+	return "".join(json.dumps(dict(zip(columns, row))) + "\n" for row in rows)
+
+
+def _csv_writer() -> tuple:
+	buffer = io.StringIO()
+	return buffer, csv.writer(buffer, lineterminator="\n")
+
+
+def stream_export(name: str, fmt: str, chunk_rows: int = EXPORT_CHUNK_ROWS) -> Iterator[str]:
+	"""Yield the export as text chunks of at most ``chunk_rows`` rows each.
+
+	Rows are pulled from the cursor with ``fetchmany`` inside one read snapshot,
+	so memory stays bounded by the chunk size and the export is consistent even
+	while writes continue. The snapshot is released when the generator is
+	exhausted or closed.
+	"""
+
+	columns, query = EXPORTS[name]
+	with db.read_snapshot() as conn:
+		cursor = conn.execute(query)
+		if fmt == "csv":
+			buffer, writer = _csv_writer()
+			writer.writerow(columns)
+			yield buffer.getvalue()
+		while True:
+			rows = cursor.fetchmany(chunk_rows)
+			if not rows:
+				break
+			if fmt == "csv":
+				buffer, writer = _csv_writer()
+				writer.writerows(rows)
+				yield buffer.getvalue()
+			else:
+				yield _ndjson_chunk(columns, rows)
@@ -0,0 +1,252 @@
+"""Recorded responses of mutating requests, keyed by the client's Idempotency-Key."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+from concurrent.futures import TimeoutError as FutureTimeout
+from pathlib import Path
+from typing import Callable, Optional
+
+from .. import metrics
+from ..db import ConnectionPool
+
+
+IDEMPOTENCY_MAX_KEYS = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+IDEMPOTENCY_TTL = float(os.getenv("IDEMPOTENCY_TTL", "86400"))
+IDEMPOTENCY_WAIT = float(os.getenv("IDEMPOTENCY_WAIT", "30"))
+IDEMPOTENCY_PATH = os.getenv("IDEMPOTENCY_PATH") or None
+IDEMPOTENCY_CLAIM_TIMEOUT = float(os.getenv("IDEMPOTENCY_CLAIM_TIMEOUT", "300"))
+
+_POLL_INTERVAL = 0.01
+
+
+class IdempotencyConflict(ValueError):
+	"""The key was already used for a request with a different body."""
+
+
+class IdempotencyInProgress(RuntimeError):
+	"""The original request is still running after the wait timeout."""
+
+
+class IdempotencyStore:
+	"""Bounded LRU of ``(status, body)`` responses with expiry, optionally backed by a SQLite file.
+
+	``execute`` runs a request at most once per key: a repeat gets the recorded
+	response, and a repeat arriving while the first is still running waits for
+	its result instead of running again. With ``path`` set, keys are claimed in
+	the file first, so processes sharing it coalesce the same way (by polling)
+	and recorded responses survive restarts; a claim older than ``claim_timeout``
+	is treated as abandoned by a crashed process. Only responses below 500 are
+	recorded; server errors and exceptions release the key so a retry runs.
+	"""
+
+	def __init__(
+		self,
+		max_entries: int = IDEMPOTENCY_MAX_KEYS,
+		ttl: float = IDEMPOTENCY_TTL,
+		path: Optional[Path] = None,
+		wait_timeout: float = IDEMPOTENCY_WAIT,
+		claim_timeout: float = IDEMPOTENCY_CLAIM_TIMEOUT,
+	) -> None:
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self.wait_timeout = wait_timeout
+		self.claim_timeout = claim_timeout
+		self._entries: OrderedDict = OrderedDict()
+		self._inflight: dict = {}
+		self._lock = threading.Lock()
+		self._pool: Optional[ConnectionPool] = None
+
+		self.executions = 0
+		self.replays = 0
+		self.disk_replays = 0
+		self.coalesced = 0
+		self.conflicts = 0
+		self.evictions = 0
+
+		if path:
+			self._pool = ConnectionPool(Path(path), max_size=2)
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute(
+						"""
+						CREATE TABLE IF NOT EXISTS idempotency_keys (
+							key TEXT PRIMARY KEY,
+							fingerprint TEXT NOT NULL,
+							status INTEGER,
+							body TEXT,
+							stored_at REAL NOT NULL
+						);
+						"""
+					)
+					conn.execute(
+						"CREATE INDEX IF NOT EXISTS idx_idempotency_keys_stored_at ON idempotency_keys (stored_at);"
+					)
+
+	def execute(self, key: str, fingerprint: str, fn: Callable[[], tuple]) -> tuple:
+		"""Return ``(status, body, replayed)`` for ``key``, calling ``fn() -> (status, body)`` at most once.
+
+		Raises IdempotencyConflict if ``key`` was first used with a different
+		``fingerprint`` and IdempotencyInProgress if the original request is
+		still running after ``wait_timeout`` seconds.
+		"""
+
+		now = time.time()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None and now - entry[0] >= self.ttl:
+				del self._entries[key]
+				entry = None
+			if entry is not None:
+				self._entries.move_to_end(key)
+				return self._replay(entry, fingerprint, "replays")
+
+			future = self._inflight.get(key)
+			owner = future is None
+			if owner:
+				future = self._inflight[key] = Future()
+			else:
+				self.coalesced += 1
+
+		if not owner:
+			try:
+				entry = future.result(self.wait_timeout)
+			except FutureTimeout:
+				raise IdempotencyInProgress("A request with this Idempotency-Key is still in progress") from None
+			if entry is None:
+				# The original failed without recording anything; this retry runs on its own.
+				return self.execute(key, fingerprint, fn)
+			with self._lock:
+				return self._replay(entry, fingerprint, None)
+
+		entry = None
+		claimed = False
+		try:
+			entry = self._claim(key, fingerprint)
+			if entry is not None:
+				with self._lock:
+					self._remember(key, entry)
+					return self._replay(entry, fingerprint, "disk_replays")
+
+			claimed = True
+			status, body = fn()
+			with self._lock:
+				self.executions += 1
+			if status < 500:
+				entry = (time.time(), fingerprint, status, body)
+				with self._lock:
+					self._remember(key, entry)
+				self._disk_store(key, entry)
+			else:
+				self._disk_release(key)
+			return status, body, False
+		except BaseException:
+			if claimed:
+				self._disk_release(key)
+			raise
+		finally:
+			with self._lock:
+				self._inflight.pop(key, None)
+			future.set_result(entry)
+
+	def _replay(self, entry: tuple, fingerprint: str, counter: Optional[str]) -> tuple:
+		_stored_at, stored_fingerprint, status, body = entry
+		if stored_fingerprint != fingerprint:
+			self.conflicts += 1
+			raise IdempotencyConflict("Idempotency-Key was already used with a different request")
+		if counter:
+			setattr(self, counter, getattr(self, counter) + 1)
+		return status, body, True
+
+	def _remember(self, key: str, entry: tuple) -> None:
+		self._entries[key] = entry
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+			self.evictions += 1
+
+	def _claim(self, key: str, fingerprint: str) -> Optional[tuple]:
+		"""Claim ``key`` in the file, or return the response another process recorded for it."""
+
+		if self._pool is None:
+			return None
+
+		deadline = time.monotonic() + self.wait_timeout
+		while True:
+			now = time.time()
+			with self._pool.connection() as conn:
+				with conn:
+					# Expired rows, and claims abandoned by a crashed process, no longer hold the key.
+					conn.execute(
+						"DELETE FROM idempotency_keys WHERE key = ? AND (stored_at <= ? OR (status IS NULL AND stored_at <= ?));",
+						(key, now - self.ttl, now - self.claim_timeout),
+					)
+					claimed = conn.execute(
+						"INSERT OR IGNORE INTO idempotency_keys (key, fingerprint, stored_at) VALUES (?, ?, ?);",
+						(key, fingerprint, now),
+					).rowcount
+					row = None if claimed else conn.execute(
+						"SELECT stored_at, fingerprint, status, body FROM idempotency_keys WHERE key = ?;", (key,)
+					).fetchone()
+			if claimed:
+				return None
+			if row is not None and row[2] is not None:
+				return row
+			if time.monotonic() >= deadline:
+				raise IdempotencyInProgress("A request with this Idempotency-Key is still in progress")
+			time.sleep(_POLL_INTERVAL)
+
+	def _disk_store(self, key: str, entry: tuple) -> None:
+		if self._pool is None:
+			return
+		stored_at, fingerprint, status, body = entry
+		with self._pool.connection() as conn:
+			with conn:
+				conn.execute(
+					"INSERT OR REPLACE INTO idempotency_keys (key, fingerprint, status, body, stored_at) VALUES (?, ?, ?, ?, ?);",
+					(key, fingerprint, status, body, stored_at),
+				)
+				conn.execute("DELETE FROM idempotency_keys WHERE stored_at <= ?;", (stored_at - self.ttl,))
+
+	def _disk_release(self, key: str) -> None:
+		if self._pool is None:
+			return
+		with self._pool.connection() as conn:
+			with conn:
+				conn.execute("DELETE FROM idempotency_keys WHERE key = ? AND status IS NULL;", (key,))
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+		if self._pool is not None:
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute("DELETE FROM idempotency_keys;")
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"entries": len(self._entries),
+				"max_entries": self.max_entries,
+				"in_flight": len(self._inflight),
+				"executions": self.executions,
+				"replays": self.replays,
+				"disk_replays": self.disk_replays,
+				"coalesced": self.coalesced,
+				"conflicts": self.conflicts,
+				"evictions": self.evictions,
+			}
+
+
+store = IdempotencyStore(path=IDEMPOTENCY_PATH)
+
+metrics.REGISTRY.register_callback(
+	"pharmacy_idempotent_replays_total", "Mutating requests answered from a recorded response.", "counter",
+	lambda: store.replays + store.disk_replays,
+)
+metrics.REGISTRY.register_callback(
+	"pharmacy_idempotent_coalesced_total", "Retries that waited for the original request instead of running.", "counter",
+	lambda: store.coalesced,
+)
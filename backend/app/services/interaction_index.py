@@ -0,0 +1,109 @@
+"""Symmetric drug-interaction pair index."""
+
+from typing import Iterable
+
+
+SEVERITY_RANK = {
+	"contraindicated": 0,
+	"severe": 1,
+	"major": 1,
+	"high": 1,
+	"moderate": 2,
+	"medium": 2,
+	"minor": 3,
+	"low": 3,
+}
+_UNKNOWN_RANK = len(set(SEVERITY_RANK.values()))
+
+
+def severity_rank(severity: str) -> int:
+	"""Sort key for a severity label; unknown labels sort after every known one."""
+
+	return SEVERITY_RANK.get((severity or "").strip().lower(), _UNKNOWN_RANK)
+
+
+class InteractionIndex:
+	"""Canonicalized pair index over interaction rows.
+
+	Medication ids are interned to small integers and each unordered pair is
+	stored once under ``(low << 32) | high``, so ``(a, b)`` and ``(b, a)`` hit the
+	same entry. An adjacency set per medication lets a basket be checked in one
+	pass by intersecting each member's neighbours with the basket instead of
+	probing every pair.
+	"""
+
+	def __init__(self) -> None:
+		self._codes: dict = {}
+		self._pairs: dict = {}
+		self._neighbours: dict = {}
+		self._rows: dict = {}
+
+	def __len__(self) -> int:
+		return len(self._rows)
+
+	def _code(self, med_id: str) -> int:
+		code = self._codes.get(med_id)
+		if code is None:
+			code = self._codes[med_id] = len(self._codes)
+		return code
+
+	@staticmethod
+	def _key(first: int, second: int) -> int:
+		low, high = (first, second) if first < second else (second, first)
+		return (low << 32) | high
+
+	def add(self, interaction: dict) -> None:
+		self.remove(interaction["id"])
+		first = self._code(interaction["med_1_id"])
+		second = self._code(interaction["med_2_id"])
+		entry = {**interaction, "severity_rank": severity_rank(interaction["severity"])}
+
+		self._rows[interaction["id"]] = (first, second)
+		self._pairs.setdefault(self._key(first, second), {})[interaction["id"]] = entry
+		self._neighbours.setdefault(first, set()).add(second)
+		self._neighbours.setdefault(second, set()).add(first)
+
+	def remove(self, interaction_id: str) -> None:
+		codes = self._rows.pop(interaction_id, None)
+		if codes is None:
+			return
+		first, second = codes
+		key = self._key(first, second)
+		entries = self._pairs.get(key, {})
+		entries.pop(interaction_id, None)
+		if not entries:
+			self._pairs.pop(key, None)
+			self._neighbours.get(first, set()).discard(second)
+			self._neighbours.get(second, set()).discard(first)
+
+	def clear(self) -> None:
+		self._codes.clear()
+		self._pairs.clear()
+		self._neighbours.clear()
+		self._rows.clear()
+
+	def between(self, med_ids: Iterable[str]) -> list:
+		"""Every interaction among any two of ``med_ids``, most severe first."""
+
+		codes = {self._codes[med_id] for med_id in med_ids if med_id in self._codes}
+		found = []
+		for code in codes:
+			for other in self._neighbours.get(code, set()) & codes:
+				if code < other:
+					found.extend(self._pairs[self._key(code, other)].values())
+		found.sort(key=lambda entry: (entry["severity_rank"], entry["med_1_id"], entry["med_2_id"]))
+		return found
+
+	def with_candidate(self, current: Iterable[str], candidate: str) -> list:
+		"""Interactions between ``candidate`` and any of ``current``, most severe first."""
+
+		code = self._codes.get(candidate)
+		if code is None:
+			return []
+		current_codes = {self._codes[med_id] for med_id in current if med_id in self._codes}
+		current_codes.discard(code)
+		found = []
+		for other in self._neighbours.get(code, set()) & current_codes:
+			found.extend(self._pairs[self._key(code, other)].values())
+		found.sort(key=lambda entry: (entry["severity_rank"], entry["med_1_id"], entry["med_2_id"]))
+		return found
@@ -0,0 +1,37 @@
+"""Drug-interaction checks for baskets and patients."""
+
+from .catalog import get_catalog
+
+
+def _public(entry: dict) -> dict:
+	return {key: entry[key] for key in ("id", "med_1_id", "med_2_id", "severity", "description")}
+
+
+def _require_known(catalog, med_ids: list) -> None:
+	for med_id in med_ids:
+		if not isinstance(med_id, str):
+			raise ValueError("Medication ids must be strings")
+	missing = catalog.missing(med_ids)
+	if missing:
+		raise ValueError(f"Medication not found: {missing[0]}")
+
+
+def check_basket(med_ids: list) -> list:
+	"""Return every interaction among the given medications, most severe first."""
+
+	if not med_ids:
+		raise ValueError("At least one medication is required")
+
+	catalog = get_catalog()
+	_require_known(catalog, med_ids)
+	return [_public(entry) for entry in catalog.interactions_between(med_ids)]
+
+
+def check_patient(user_id: str, med_id: str) -> list:
+	"""Return interactions between ``med_id`` and the patient's active prescriptions."""
+
+	if not isinstance(user_id, str):
+		raise ValueError("user_id must be a string")
+	catalog = get_catalog()
+	_require_known(catalog, [med_id])
+	return [_public(entry) for entry in catalog.interactions_with(user_id, med_id)]
@@ -0,0 +1,288 @@
+"""Reorder points from recorded consumption and budget-constrained restock plans."""
+
+import math
+import os
+import sqlite3
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+
+from .. import db
+from . import change_feed, ledger_service
+from .reference_cache import get_reference_cache
+
+
+INVENTORY_WINDOW_DAYS = int(os.getenv("INVENTORY_WINDOW_DAYS", "28"))
+INVENTORY_LEAD_TIME_DAYS = float(os.getenv("INVENTORY_LEAD_TIME_DAYS", "3"))
+INVENTORY_REVIEW_DAYS = float(os.getenv("INVENTORY_REVIEW_DAYS", "7"))
+INVENTORY_SERVICE_Z = float(os.getenv("INVENTORY_SERVICE_Z", "1.65"))
+INVENTORY_MIN_STOCK = int(os.getenv("INVENTORY_MIN_STOCK", "10"))
+INVENTORY_BUDGET_RESERVE = float(os.getenv("INVENTORY_BUDGET_RESERVE", "0.0"))
+INVENTORY_PLAN_INTERVAL = float(os.getenv("INVENTORY_PLAN_INTERVAL", "0"))
+
+_CHUNK = 900
+
+_DEMAND_QUERY = """
+	SELECT m.id, m.stock_quantity, m.wholesale_price, COALESCE(c.total, 0), COALESCE(c.total_sq, 0)
+	FROM medications m
+	LEFT JOIN (
+		SELECT med_id, SUM(quantity) AS total, SUM(quantity * quantity) AS total_sq
+		FROM medication_consumption
+		WHERE day >= ?
+		GROUP BY med_id
+	) c ON c.med_id = m.id;
+"""
+
+
+def reorder_levels(total: float, total_sq: float) -> tuple:
+	"""Return ``(daily_demand, reorder_point, target_level)`` for one medication.
+
+	Days without a consumption row count as zero demand. The reorder point covers
+	expected demand over the lead time plus ``INVENTORY_SERVICE_Z`` standard
+	deviations of safety stock; the target adds one review period of demand.
+	Neither is allowed below ``INVENTORY_MIN_STOCK``.
+	"""
+
+	days = max(INVENTORY_WINDOW_DAYS, 1)
+	mean = total / days
+	std = math.sqrt(max(total_sq / days - mean * mean, 0.0))
+	safety = INVENTORY_SERVICE_Z * std * math.sqrt(INVENTORY_LEAD_TIME_DAYS)
+	reorder_point = max(math.ceil(mean * INVENTORY_LEAD_TIME_DAYS + safety), INVENTORY_MIN_STOCK)
+	target = max(reorder_point + math.ceil(mean * INVENTORY_REVIEW_DAYS), reorder_point)
+	return mean, reorder_point, target
+
+
+def _allocate(candidates: list, budget: float) -> float:
+	"""Fund candidate quantities in priority order and return the budget left.
+
+	Allocation runs in two passes over the candidates sorted by days of cover
+	(fewest first): the first raises every item to its reorder point, the second
+	tops items up to their target. An item that does not fit in full gets as many
+	units as the remaining budget buys, so cheap urgent items are never starved
+	by an expensive one ahead of them.
+	"""
+
+	for field in ("to_reorder_point", "to_target"):
+		for item in candidates:
+			wanted = item[field]
+			if wanted <= 0:
+				continue
+			price = item["unit_cost"]
+			affordable = wanted if price <= 0 else min(wanted, int(budget // price))
+			if affordable <= 0:
+				continue
+			item["quantity"] += affordable
+			budget -= affordable * price
+	return budget
+
+
+def plan_restock(budget: Optional[float] = None) -> dict:
+	"""Build a restock plan for the whole catalog within the available budget.
+
+	``budget`` defaults to the ledger balance less ``INVENTORY_BUDGET_RESERVE``
+	(a fraction kept back). Only medications at or below their reorder point are
+	considered.
+	"""
+
+	started = time.perf_counter()
+	# Consumption days are recorded by SQLite's date('now'), which is UTC.
+	today = datetime.now(timezone.utc).date()
+	since = (today - timedelta(days=INVENTORY_WINDOW_DAYS - 1)).isoformat()
+	with db.connection() as conn:
+		cursor = conn.cursor()
+		if budget is None:
+			total_budget, _total_revenue = ledger_service.balances(cursor)
+			budget = max(total_budget * (1 - INVENTORY_BUDGET_RESERVE), 0.0)
+		rows = cursor.execute(_DEMAND_QUERY, (since,)).fetchall()
+
+	candidates = []
+	for med_id, stock, unit_cost, total, total_sq in rows:
+		mean, reorder_point, target = reorder_levels(total, total_sq)
+		if stock > reorder_point:
+			continue
+		candidates.append(
+			{
+				"med_id": med_id,
+				"stock": stock,
+				"unit_cost": unit_cost,
+				"daily_demand": round(mean, 4),
+				"reorder_point": reorder_point,
+				"target": target,
+				"days_of_cover": stock / mean if mean > 0 else math.inf,
+				"to_reorder_point": max(reorder_point - stock, 0),
+				"to_target": target - max(stock, reorder_point),
+				"quantity": 0,
+			}
+		)
+	candidates.sort(
+		key=lambda item: (item["days_of_cover"], item["stock"] - item["reorder_point"], item["unit_cost"])
+	)
+
+	remaining = _allocate(candidates, budget)
+	lines = []
+	for item in candidates:
+		if item["quantity"] <= 0:
+			continue
+		lines.append(
+			{
+				"med_id": item["med_id"],
+				"quantity": item["quantity"],
+				"unit_cost": item["unit_cost"],
+				"stock": item["stock"],
+				"reorder_point": item["reorder_point"],
+				"target": item["target"],
+				"daily_demand": item["daily_demand"],
+			}
+		)
+
+	return {
+		"budget": budget,
+		"cost": round(budget - remaining, 2),
+		"below_reorder_point": len(candidates),
+		"unfunded": sum(1 for item in candidates if item["quantity"] < item["to_reorder_point"]),
+		"lines": lines,
+		"planning_seconds": round(time.perf_counter() - started, 4),
+	}
+
+
+def _require_manager(user_id: str) -> None:
+	user = get_reference_cache().user(user_id)
+	if not user:
+		raise ValueError("User not found")
+	if user["role"] != "manager":
+		raise PermissionError("Only managers can restock inventory")
+
+
+def preview_restock_plan(user_id: str) -> dict:
+	_require_manager(user_id)
+	return plan_restock()
+
+
+def apply_restock_plan(user_id: Optional[str] = None) -> dict:
+	"""Plan and apply a restock in one write transaction.
+
+	``user_id`` must be a manager; the background planner passes None. The plan
+	is re-checked against the budget under the write lock, so a concurrent
+	spend makes the whole plan fail rather than overdraw.
+	"""
+
+	if user_id is not None:
+		_require_manager(user_id)
+	plan = plan_restock()
+	if plan["lines"]:
+		db.write(_apply_plan, plan["lines"], name="restock_plan")
+	return plan
+
+
+def chain_stock(med_ids: list) -> dict:
+	"""Stock of each medication in every branch, read from all shards in parallel.
+
+	Returns ``{med_id: {"name", "total", "branches": {branch: quantity}}}``; a
+	medication missing from a branch's catalog is left out of that branch.
+	"""
+
+	med_ids = list(dict.fromkeys(med_ids))
+	if not med_ids:
+		raise ValueError("At least one med_id is required")
+	placeholders = ", ".join("?" for _ in med_ids)
+	query = f"SELECT id, name, stock_quantity FROM medications WHERE id IN ({placeholders});"
+
+	def read_branch() -> list:
+		with db.connection() as conn:
+			return conn.execute(query, med_ids).fetchall()
+
+	merged: dict = {}
+	for branch, rows in db.fan_out(read_branch).items():
+		for med_id, name, quantity in rows:
+			entry = merged.setdefault(med_id, {"name": name, "total": 0, "branches": {}})
+			entry["total"] += quantity
+			entry["branches"][branch] = quantity
+	return merged
+
+
+def _apply_plan(conn: sqlite3.Connection, lines: list) -> None:
+	cursor = conn.cursor()
+	total_cost = sum(line["quantity"] * line["unit_cost"] for line in lines)
+
+	total_budget, _total_revenue = ledger_service.balances(cursor)
+	if total_budget < total_cost:
+		raise ValueError("Insufficient budget for restock plan")
+
+	cursor.executemany(
+		"UPDATE medications SET stock_quantity = stock_quantity + ? WHERE id = ?;",
+		[(line["quantity"], line["med_id"]) for line in lines],
+	)
+	med_ids = [line["med_id"] for line in lines]
+	# Chunked to stay under SQLite's bound-parameter limit however long the plan is.
+	for start in range(0, len(med_ids), _CHUNK):
+		chunk = med_ids[start:start + _CHUNK]
+		cursor.execute(
+			f"SELECT id, stock_quantity FROM medications WHERE id IN ({', '.join('?' for _ in chunk)});", chunk
+		)
+		for med_id, stock_quantity in cursor.fetchall():
+			change_feed.publish_on_commit("stock", {"med_id": med_id, "stock_quantity": stock_quantity}, med_id=med_id)
+	ledger_service.record_entry(cursor, "restock", -total_cost, reference=f"plan:{len(lines)}")
+
+
+class RestockPlanner:
+	"""Daemon thread that applies a restock plan to every branch each ``interval`` seconds."""
+
+	def __init__(self, interval: float) -> None:
+		self.interval = interval
+		self.runs = 0
+		self.failures = 0
+		self.last_plans: dict = {}
+		self.last_error: Optional[str] = None
+		self._stop = threading.Event()
+		self._thread: Optional[threading.Thread] = None
+		self._lock = threading.Lock()
+
+	def start(self) -> None:
+		with self._lock:
+			if self._thread is None:
+				self._thread = threading.Thread(target=self._run, name="restock-planner", daemon=True)
+				self._thread.start()
+
+	def stop(self, timeout: Optional[float] = None) -> None:
+		self._stop.set()
+		if self._thread is not None:
+			self._thread.join(timeout)
+
+	def _run(self) -> None:
+		while not self._stop.wait(self.interval):
+			self.last_error = None
+			for branch in db.branches():
+				try:
+					with db.use_branch(branch):
+						self.last_plans[branch] = apply_restock_plan()
+				except Exception as err:  # noqa: BLE001 - one failed run must not stop the planner
+					self.failures += 1
+					self.last_error = f"{branch}: {type(err).__name__}: {err}"
+			self.runs += 1
+
+	def stats(self) -> dict:
+		plans = list(self.last_plans.values())
+		return {
+			"interval": self.interval,
+			"runs": self.runs,
+			"failures": self.failures,
+			"last_error": self.last_error,
+			"last_lines": sum(len(plan["lines"]) for plan in plans),
+			"last_cost": sum(plan["cost"] for plan in plans),
+		}
+
+
+_planner: Optional[RestockPlanner] = None
+
+
+def start_planner() -> Optional[RestockPlanner]:
+	"""Start the process-wide background planner if ``INVENTORY_PLAN_INTERVAL`` is set."""
+
+	global _planner
+	if INVENTORY_PLAN_INTERVAL <= 0:
+		return None
+	if _planner is None:
+		_planner = RestockPlanner(INVENTORY_PLAN_INTERVAL)
+	_planner.start()
+	return _planner
@@ -0,0 +1,139 @@
+"""Append-only pharmacy financial ledger with snapshot compaction."""
+
+import os
+import sqlite3
+from datetime import datetime, timezone
+from typing import Optional
+
+from .. import db
+from . import change_feed
+
+
+DEFAULT_ACCOUNT = 1
+LEDGER_COMPACT_EVERY = int(os.getenv("LEDGER_COMPACT_EVERY", "1000"))
+
+_PENDING_QUERY = """
+	SELECT
+		COALESCE(SUM(l.budget_delta), 0),
+		COALESCE(SUM(l.revenue_delta), 0),
+		COUNT(l.id),
+		MAX(l.id)
+	FROM financial_ledger l
+	WHERE l.account_id = ? AND l.id > ?;
+"""
+
+
+def record_entry(
+	cursor: sqlite3.Cursor,
+	kind: str,
+	budget_delta: float,
+	revenue_delta: float = 0.0,
+	reference: Optional[str] = None,
+	account_id: int = DEFAULT_ACCOUNT,
+) -> int:
+	"""Append one ledger entry inside the caller's transaction and return its id.
+
+	Every ``LEDGER_COMPACT_EVERY`` entries the account is compacted in the same
+	transaction, which keeps balance reads bounded without a background job.
+	"""
+
+	cursor.execute(
+		"""
+		INSERT INTO financial_ledger (account_id, kind, budget_delta, revenue_delta, reference, created_at)
+		VALUES (?, ?, ?, ?, ?, ?);
+		""",
+		(account_id, kind, budget_delta, revenue_delta, reference, datetime.now(timezone.utc).isoformat()),
+	)
+	entry_id = cursor.lastrowid
+	# Deltas only: clients apply them to the balance they last read, ordered by event id.
+	change_feed.publish_on_commit(
+		"budget",
+		{
+			"account_id": account_id,
+			"entry_id": entry_id,
+			"kind": kind,
+			"budget_delta": budget_delta,
+			"revenue_delta": revenue_delta,
+			"reference": reference,
+		},
+	)
+	if LEDGER_COMPACT_EVERY > 0 and entry_id % LEDGER_COMPACT_EVERY == 0:
+		_compact(cursor, account_id)
+	return entry_id
+
+
+def balances(cursor: sqlite3.Cursor, account_id: int = DEFAULT_ACCOUNT) -> tuple:
+	"""Return (total_budget, total_revenue): the snapshot plus uncompacted ledger entries."""
+
+	cursor.execute(
+		"SELECT total_budget, total_revenue, ledger_position FROM financial_snapshots WHERE id = ?;",
+		(account_id,),
+	)
+	snapshot = cursor.fetchone()
+	if not snapshot:
+		raise ValueError("Pharmacy financials not initialized")
+
+	total_budget, total_revenue, position = snapshot
+	budget_delta, revenue_delta, _count, _last = cursor.execute(_PENDING_QUERY, (account_id, position)).fetchone()
+	return total_budget + budget_delta, total_revenue + revenue_delta
+
+
+def _compact(cursor: sqlite3.Cursor, account_id: int) -> int:
+	cursor.execute("SELECT ledger_position FROM financial_snapshots WHERE id = ?;", (account_id,))
+	row = cursor.fetchone()
+	if not row:
+		raise ValueError("Pharmacy financials not initialized")
+
+	budget_delta, revenue_delta, count, last_id = cursor.execute(_PENDING_QUERY, (account_id, row[0])).fetchone()
+	if not count:
+		return 0
+
+	cursor.execute(
+		"""
+		UPDATE financial_snapshots
+		SET total_budget = total_budget + ?,
+			total_revenue = total_revenue + ?,
+			ledger_position = ?,
+			compacted_at = ?
+		WHERE id = ?;
+		""",
+		(budget_delta, revenue_delta, last_id, datetime.now(timezone.utc).isoformat(), account_id),
+	)
+	return count
+
+
+def compact(account_id: int = DEFAULT_ACCOUNT) -> int:
+	"""Fold pending ledger entries into the account snapshot; return how many were folded.
+
+	Ledger rows are kept as the audit trail; only the snapshot position moves.
+	"""
+
+	return db.write(lambda conn: _compact(conn.cursor(), account_id), name="ledger_compact")
+
+
+def history(account_id: int = DEFAULT_ACCOUNT, limit: int = 100) -> list:
+	"""Most recent ledger entries for an account, newest first."""
+
+	with db.connection() as conn:
+		rows = conn.execute(
+			"""
+			SELECT id, kind, budget_delta, revenue_delta, reference, created_at
+			FROM financial_ledger
+			WHERE account_id = ?
+			ORDER BY id DESC
+			LIMIT ?;
+			""",
+			(account_id, limit),
+		).fetchall()
+
+	return [
+		{
+			"id": entry_id,
+			"kind": kind,
+			"budget_delta": budget_delta,
+			"revenue_delta": revenue_delta,
+			"reference": reference,
+			"created_at": created_at,
+		}
+		for entry_id, kind, budget_delta, revenue_delta, reference, created_at in rows
+	]
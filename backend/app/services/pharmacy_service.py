@@ -1,11 +1,10 @@
 """Service for inventory restocking with budget enforcement."""
 
 import sqlite3
-from contextlib import closing
-from pathlib import Path
 
-
-DB_PATH = Path(__file__).resolve().parents[2] / "data" / "pharmacy.db"
+from .. import db
+from . import change_feed, ledger_service
+from .reference_cache import get_reference_cache
 
 
 def process_restock(user_id: str, med_id: str, qty: int) -> None:
@@ -14,42 +13,34 @@ def process_restock(user_id: str, med_id: str, qty: int) -> None:
     if qty <= 0:
         raise ValueError("Quantity must be positive")
 
-    with closing(sqlite3.connect(DB_PATH)) as conn:
-        conn.execute("PRAGMA foreign_keys = ON;")
-        with conn:
-            cursor = conn.cursor()
-
-            cursor.execute("SELECT role FROM users WHERE id = ?;", (user_id,))
-            role_row = cursor.fetchone()
-            if not role_row:
-                raise ValueError("User not found")
-            if role_row[0] != "manager":
-                raise PermissionError("Only managers can restock inventory")
-
-            cursor.execute(
-                "SELECT wholesale_price, stock_quantity FROM medications WHERE id = ?;",
-                (med_id,),
-            )
-            med_row = cursor.fetchone()
-            if not med_row:
-                raise ValueError("Medication not found")
-
-            wholesale_price, current_stock = med_row
-            total_cost = wholesale_price * qty
-
-            cursor.execute("SELECT total_budget FROM pharmacy_financials WHERE id = 1;")
-            budget_row = cursor.fetchone()
-            if not budget_row:
-                raise ValueError("Pharmacy financials not initialized")
-
-            if budget_row[0] < total_cost:
-                raise ValueError("Insufficient budget to restock")
-
-            cursor.execute(
-                "UPDATE medications SET stock_quantity = stock_quantity + ? WHERE id = ?;",
-                (qty, med_id),
-            )
-            cursor.execute(
-                "UPDATE pharmacy_financials SET total_budget = total_budget - ? WHERE id = 1;",
-                (total_cost,),
-            )
+    cache = get_reference_cache()
+    user = cache.user(user_id)
+    if not user:
+        raise ValueError("User not found")
+    if user["role"] != "manager":
+        raise PermissionError("Only managers can restock inventory")
+
+    med = cache.medication(med_id)
+    if not med:
+        raise ValueError("Medication not found")
+
+    db.write(_apply_restock, med_id, qty, med["wholesale_price"] * qty, name="restock")
+
+
+def _apply_restock(conn: sqlite3.Connection, med_id: str, qty: int, total_cost: float) -> None:
+    cursor = conn.cursor()
+
+    # Snapshot plus pending ledger entries, read under the write lock.
+    total_budget, _total_revenue = ledger_service.balances(cursor)
+    if total_budget < total_cost:
+        raise ValueError("Insufficient budget to restock")
+
+    cursor.execute(
+        "UPDATE medications SET stock_quantity = stock_quantity + ? WHERE id = ? RETURNING stock_quantity;",
+        (qty, med_id),
+    )
+    row = cursor.fetchone()
+    if not row:
+        raise ValueError("Medication not found")
+    change_feed.publish_on_commit("stock", {"med_id": med_id, "stock_quantity": row[0]}, med_id=med_id)
+    ledger_service.record_entry(cursor, "restock", -total_cost, reference=f"{med_id}:{qty}")
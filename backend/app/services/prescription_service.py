@@ -1,11 +1,34 @@
 """Prescription validation and fulfillment services."""
 
 import sqlite3
-from contextlib import closing
-from pathlib import Path
 
+from .. import db, metrics
+from . import change_feed
 
-DB_PATH = Path(__file__).resolve().parents[2] / "data" / "pharmacy.db"
+
+_ACTIVE_ITEM_QUERY = """
+	SELECT pi.id, pi.remaining_periods
+	FROM prescriptions p
+	JOIN prescription_items pi ON pi.prescription_id = p.id
+	WHERE p.user_id = ? AND pi.med_id = ? AND p.is_active = 1
+	ORDER BY pi.remaining_periods DESC
+	LIMIT 1;
+"""
+
+
+def _find_active_item(cursor: sqlite3.Cursor, user_id: str, med_id: str, requested_qty: int) -> str:
+	cursor.execute(_ACTIVE_ITEM_QUERY, (user_id, med_id))
+	row = cursor.fetchone()
+
+	if not row:
+		raise ValueError("No active prescription found for this medication")
+
+	item_id, remaining_periods = row
+
+	if remaining_periods < requested_qty:
+		raise ValueError("Not enough remaining periods for requested quantity")
+
+	return item_id
 
 
 def validate_fulfillment(user_id: str, med_id: str, requested_qty: int) -> str:
@@ -14,90 +37,223 @@ def validate_fulfillment(user_id: str, med_id: str, requested_qty: int) -> str:
 	if requested_qty <= 0:
 		raise ValueError("Requested quantity must be positive")
 
-	with closing(sqlite3.connect(DB_PATH)) as conn:
-		conn.execute("PRAGMA foreign_keys = ON;")
-		with conn:
-			cursor = conn.cursor()
+	with db.connection() as conn, metrics.time_query("validate_fulfillment"):
+		return _find_active_item(conn.cursor(), user_id, med_id, requested_qty)
+
 
-			cursor.execute(
-				"""
-				SELECT pi.id, pi.remaining_periods
-				FROM prescriptions p
-				JOIN prescription_items pi ON pi.prescription_id = p.id
-				WHERE p.user_id = ? AND pi.med_id = ? AND p.is_active = 1;
-				""",
-				(user_id, med_id),
-			)
-			row = cursor.fetchone()
+def _apply_fulfillment(cursor: sqlite3.Cursor, user_id: str, med_id: str, quantity: int) -> str:
+	"""Run the conditional fulfillment updates on an open write transaction; return item id."""
 
-			if not row:
-				raise ValueError("No active prescription found for this medication")
+	cursor.execute(
+		"""
+		UPDATE prescription_items
+		SET remaining_periods = remaining_periods - ?
+		WHERE id = (
+			SELECT pi.id
+			FROM prescriptions p
+			JOIN prescription_items pi ON pi.prescription_id = p.id
+			WHERE p.user_id = ? AND pi.med_id = ? AND p.is_active = 1
+			ORDER BY pi.remaining_periods DESC
+			LIMIT 1
+		) AND remaining_periods >= ?
+		RETURNING id, prescription_id, remaining_periods;
+		""",
+		(quantity, user_id, med_id, quantity),
+	)
+	item_row = cursor.fetchone()
+	if not item_row:
+		# Re-run the validation query only on the failure path to report why.
+		_find_active_item(cursor, user_id, med_id, quantity)
+		raise ValueError("Not enough remaining periods to fulfill request")
 
-			item_id, remaining_periods = row
+	item_id, prescription_id, remaining_periods = item_row
 
-			if remaining_periods < requested_qty:
-				raise ValueError("Not enough remaining periods for requested quantity")
+	cursor.execute(
+		"""
+		UPDATE medications
+		SET stock_quantity = stock_quantity - ?
+		WHERE id = ? AND stock_quantity >= ?
+		RETURNING stock_quantity;
+		""",
+		(quantity, med_id, quantity),
+	)
+	stock_row = cursor.fetchone()
+	if not stock_row:
+		cursor.execute("SELECT 1 FROM medications WHERE id = ?;", (med_id,))
+		if not cursor.fetchone():
+			raise ValueError("Medication not found during fulfillment")
+		raise ValueError("Insufficient stock to fulfill prescription")
 
-			return item_id
+	deactivated = False
+	if remaining_periods == 0:
+		cursor.execute(
+			"""
+			UPDATE prescriptions
+			SET is_active = 0
+			WHERE id = ? AND NOT EXISTS (
+				SELECT 1 FROM prescription_items
+				WHERE prescription_id = ? AND remaining_periods > 0
+			);
+			""",
+			(prescription_id, prescription_id),
+		)
+		deactivated = cursor.rowcount > 0
+
+	change_feed.publish_on_commit("stock", {"med_id": med_id, "stock_quantity": stock_row[0]}, med_id=med_id)
+	change_feed.publish_on_commit(
+		"prescription",
+		{
+			"user_id": user_id,
+			"med_id": med_id,
+			"prescription_id": prescription_id,
+			"item_id": item_id,
+			"remaining_periods": remaining_periods,
+			"is_active": not deactivated,
+		},
+		user_id=user_id,
+		med_id=med_id,
+	)
+	return item_id
 
 
 def fulfill_prescription(user_id: str, med_id: str, quantity: int) -> None:
-	"""Decrement prescription periods and medication stock after validation."""
-
-	item_id = validate_fulfillment(user_id, med_id, quantity)
-
-	with closing(sqlite3.connect(DB_PATH)) as conn:
-		conn.execute("PRAGMA foreign_keys = ON;")
-		with conn:
-			cursor = conn.cursor()
-
-			cursor.execute(
-				"SELECT remaining_periods FROM prescription_items WHERE id = ?;",
-				(item_id,),
-			)
-			remaining_row = cursor.fetchone()
-			if not remaining_row or remaining_row[0] < quantity:
-				raise ValueError("Not enough remaining periods to fulfill request")
-
-			cursor.execute(
-				"SELECT stock_quantity FROM medications WHERE id = ?;",
-				(med_id,),
-			)
-			stock_row = cursor.fetchone()
-			if not stock_row:
-				raise ValueError("Medication not found during fulfillment")
-			if stock_row[0] < quantity:
-				raise ValueError("Insufficient stock to fulfill prescription")
-
-			cursor.execute(
-				"UPDATE prescription_items SET remaining_periods = remaining_periods - ? WHERE id = ?;",
-				(quantity, item_id),
-			)
-			cursor.execute(
-				"UPDATE medications SET stock_quantity = stock_quantity - ? WHERE id = ?;",
-				(quantity, med_id),
-			)
-
-			cursor.execute(
-				"SELECT prescription_id FROM prescription_items WHERE id = ?;",
-				(item_id,),
-			)
-			presc_row = cursor.fetchone()
-			if presc_row:
-				prescription_id = presc_row[0]
-
-				cursor.execute(
-					"""
-					SELECT COUNT(*)
-					FROM prescription_items
-					WHERE prescription_id = ? AND remaining_periods > 0;
-					""",
-					(prescription_id,),
-				)
-				remaining_count = cursor.fetchone()[0]
-
-				if remaining_count == 0:
-					cursor.execute(
-						"UPDATE prescriptions SET is_active = 0 WHERE id = ?;",
-						(prescription_id,),
-					)
+	"""Decrement prescription periods and medication stock in one write transaction.
+
+	The periods and stock updates are conditional, so validation and fulfillment
+	cannot be split by a concurrent writer; any failed check rolls back the whole
+	transaction.
+	"""
+
+	if quantity <= 0:
+		raise ValueError("Requested quantity must be positive")
+
+	db.write(lambda conn: _apply_fulfillment(conn.cursor(), user_id, med_id, quantity), name="fulfill_prescription")
+
+
+BATCH_POLICIES = ("atomic", "independent")
+MAX_BATCH_LINES = 500
+
+
+class _BatchAborted(Exception):
+	"""Internal signal used to roll back an atomic batch."""
+
+
+def _prevalidate_lines(cursor: sqlite3.Cursor, lines: list) -> list:
+	"""Validate every line with set-based queries; return an error message or None per line.
+
+	Periods are tallied per prescription item, each line drawing from the item
+	with the most periods left, as ``_apply_fulfillment`` will.
+	"""
+
+	pairs = sorted({(user_id, med_id) for user_id, med_id, _qty in lines})
+	values = ", ".join("(?, ?)" for _ in pairs)
+	cursor.execute(
+		f"""
+		WITH req(user_id, med_id) AS (VALUES {values})
+		SELECT req.user_id, req.med_id, pi.id, pi.remaining_periods
+		FROM req
+		JOIN prescriptions p ON p.user_id = req.user_id AND p.is_active = 1
+		JOIN prescription_items pi ON pi.prescription_id = p.id AND pi.med_id = req.med_id;
+		""",
+		[value for pair in pairs for value in pair],
+	)
+	periods_left: dict = {}
+	for user_id, med_id, item_id, remaining_periods in cursor.fetchall():
+		periods_left.setdefault((user_id, med_id), {})[item_id] = remaining_periods
+
+	med_ids = sorted({med_id for _user_id, med_id in pairs})
+	cursor.execute(
+		f"SELECT id, stock_quantity FROM medications WHERE id IN ({', '.join('?' for _ in med_ids)});",
+		med_ids,
+	)
+	stock_left = dict(cursor.fetchall())
+
+	errors = [None] * len(lines)
+	for index, (user_id, med_id, qty) in enumerate(lines):
+		items = periods_left.get((user_id, med_id))
+		item_id = max(items, key=items.get) if items else None
+		stock = stock_left.get(med_id)
+
+		if qty <= 0:
+			errors[index] = "Requested quantity must be positive"
+		elif item_id is None:
+			errors[index] = "No active prescription found for this medication"
+		elif items[item_id] < qty:
+			errors[index] = "Not enough remaining periods for requested quantity"
+		elif stock is None:
+			errors[index] = "Medication not found during fulfillment"
+		elif stock < qty:
+			errors[index] = "Insufficient stock to fulfill prescription"
+		else:
+			items[item_id] -= qty
+			stock_left[med_id] = stock - qty
+
+	return errors
+
+
+def fulfill_batch(lines: list, policy: str = "atomic") -> list:
+	"""Fulfill several ``(user_id, med_id, qty)`` lines in one write transaction.
+
+	With the ``atomic`` policy either every line is applied or none is. With
+	``independent`` each line runs under its own savepoint, so failing lines are
+	rejected while the rest are committed together. Returns one result dict per
+	line with a ``status`` of ``fulfilled``, ``rejected`` or ``not_applied``.
+	"""
+
+	if policy not in BATCH_POLICIES:
+		raise ValueError(f"Unknown batch policy: {policy}")
+	if not lines:
+		raise ValueError("At least one line is required")
+	if len(lines) > MAX_BATCH_LINES:
+		raise ValueError(f"A batch may contain at most {MAX_BATCH_LINES} lines")
+
+	results = [
+		{"user_id": user_id, "med_id": med_id, "quantity": qty, "status": "not_applied"}
+		for user_id, med_id, qty in lines
+	]
+
+	def reject(index: int, message: str) -> None:
+		results[index]["status"] = "rejected"
+		results[index]["error"] = message
+
+	def apply(conn: sqlite3.Connection) -> None:
+		cursor = conn.cursor()
+		errors = _prevalidate_lines(cursor, lines)
+
+		if policy == "atomic" and any(errors):
+			for index, message in enumerate(errors):
+				if message:
+					reject(index, message)
+			raise _BatchAborted
+
+		for index, (user_id, med_id, qty) in enumerate(lines):
+			if errors[index]:
+				reject(index, errors[index])
+				continue
+
+			if policy == "independent":
+				cursor.execute("SAVEPOINT batch_line;")
+			try:
+				item_id = _apply_fulfillment(cursor, user_id, med_id, qty)
+			except ValueError as err:
+				reject(index, str(err))
+				if policy == "atomic":
+					raise _BatchAborted from err
+				cursor.execute("ROLLBACK TO batch_line;")
+				cursor.execute("RELEASE batch_line;")
+				continue
+
+			if policy == "independent":
+				cursor.execute("RELEASE batch_line;")
+			results[index]["status"] = "fulfilled"
+			results[index]["item_id"] = item_id
+
+	try:
+		db.write(apply, name="fulfill_batch")
+	except _BatchAborted:
+		for result in results:
+			if result["status"] == "fulfilled":
+				result["status"] = "not_applied"
+				result.pop("item_id", None)
+
+	return results
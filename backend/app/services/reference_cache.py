@@ -0,0 +1,201 @@
+"""Versioned read-through cache for user and medication reference data."""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from .. import db, metrics
+
+
+REFERENCE_CACHE_SIZE = int(os.getenv("REFERENCE_CACHE_SIZE", "10000"))
+REFERENCE_CACHE_CHECK_INTERVAL = float(os.getenv("REFERENCE_CACHE_CHECK_INTERVAL", "1.0"))
+
+_USER_QUERY = "SELECT id, name, role FROM users WHERE id = ?;"
+_MEDICATION_QUERY = """
+	SELECT id, name, active_ingredient, category, requires_prescription, retail_price, wholesale_price
+	FROM medications
+	WHERE id = ?;
+"""
+
+
+def _user_record(row: tuple) -> dict:
+	user_id, name, role = row
+	return {"id": user_id, "name": name, "role": role}
+
+
+def _medication_record(row: tuple) -> dict:
+	med_id, name, ingredient, category, requires_rx, retail_price, wholesale_price = row
+	return {
+		"id": med_id,
+		"name": name,
+		"active_ingredient": ingredient,
+		"category": category,
+		"requires_prescription": bool(requires_rx),
+		"retail_price": retail_price,
+		"wholesale_price": wholesale_price,
+	}
+
+
+_KINDS = {
+	"user": (_USER_QUERY, _user_record),
+	"medication": (_MEDICATION_QUERY, _medication_record),
+}
+
+
+class ReferenceCache:
+	"""Bounded LRU of user roles and static medication attributes.
+
+	Stock and debt are deliberately not cached: they change on every write and
+	are read inside the write transaction that guards them. Entries are
+	invalidated in-process by ``invalidate`` and across processes from the
+	``catalog_changes`` log, checked at most once per ``check_interval``
+	seconds, so a cache hit never touches SQLite. Misses are not cached.
+	"""
+
+	def __init__(
+		self,
+		pool: Optional[db.ConnectionPool] = None,
+		max_entries: int = REFERENCE_CACHE_SIZE,
+		check_interval: float = REFERENCE_CACHE_CHECK_INTERVAL,
+	) -> None:
+		if max_entries <= 0:
+			raise ValueError("Cache size must be positive")
+
+		self._pool = pool
+		self.max_entries = max_entries
+		self.check_interval = check_interval
+		self._lock = threading.Lock()
+		self._entries: OrderedDict = OrderedDict()
+		self._identity = None
+		self._log_version: Optional[int] = None
+		self._generation = 0
+		self._checked_at = 0.0
+
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.invalidations = 0
+
+	@property
+	def pool(self) -> db.ConnectionPool:
+		return self._pool or db.get_pool()
+
+	def user(self, user_id: str) -> Optional[dict]:
+		"""``{"id", "name", "role"}`` for a user, or None if it does not exist."""
+
+		return self._get("user", user_id)
+
+	def medication(self, med_id: str) -> Optional[dict]:
+		"""Static attributes and prices of a medication, or None if it does not exist."""
+
+		return self._get("medication", med_id)
+
+	def _get(self, kind: str, entity_id: str) -> Optional[dict]:
+		self._validate()
+		key = (kind, entity_id)
+		with self._lock:
+			record = self._entries.get(key)
+			if record is not None:
+				self._entries.move_to_end(key)
+				self.hits += 1
+				return record
+			self.misses += 1
+			generation = self._generation
+
+		query, build = _KINDS[kind]
+		with self.pool.connection() as conn, metrics.time_query(f"reference_{kind}"):
+			row = conn.execute(query, (entity_id,)).fetchone()
+		if row is None:
+			return None
+
+		record = build(row)
+		with self._lock:
+			# Skip the store if an invalidation ran while we were reading.
+			if generation == self._generation:
+				self._entries[key] = record
+				self._entries.move_to_end(key)
+				while len(self._entries) > self.max_entries:
+					self._entries.popitem(last=False)
+					self.evictions += 1
+		return record
+
+	def invalidate(self, kind: str, entity_id: str) -> None:
+		"""Drop one entry; call after committing a write to the cached columns."""
+
+		with self._lock:
+			self._drop([(kind, entity_id)])
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+			self._generation += 1
+
+	def _drop(self, keys: list) -> None:
+		for key in keys:
+			if self._entries.pop(key, None) is not None:
+				self.invalidations += 1
+		self._generation += 1
+
+	def _validate(self) -> None:
+		now = time.monotonic()
+		if now - self._checked_at < self.check_interval:
+			return
+
+		pool = self.pool
+		identity = pool.file_identity()
+		with self._lock:
+			if now - self._checked_at < self.check_interval:
+				return
+			self._checked_at = now
+			known_version = self._log_version
+			if identity != self._identity:
+				self._identity = identity
+				known_version = None
+
+		with pool.connection() as conn:
+			latest = conn.execute("SELECT COALESCE(MAX(version), 0) FROM catalog_changes;").fetchone()[0]
+			changed = []
+			if known_version is not None and latest > known_version:
+				changed = conn.execute(
+					"SELECT entity, entity_id FROM catalog_changes WHERE version > ? AND entity IN ('user', 'medication');",
+					(known_version,),
+				).fetchall()
+
+		with self._lock:
+			if known_version is None or latest < known_version:
+				# First check, a replaced file or a rebuilt change log: start over.
+				self._entries.clear()
+				self._generation += 1
+			else:
+				self._drop(changed)
+			self._log_version = latest
+
+	def stats(self) -> dict:
+		with self._lock:
+			return {
+				"entries": len(self._entries),
+				"max_entries": self.max_entries,
+				"hits": self.hits,
+				"misses": self.misses,
+				"evictions": self.evictions,
+				"invalidations": self.invalidations,
+			}
+
+
+_caches: dict = {}
+_cache_lock = threading.Lock()
+
+
+def get_reference_cache() -> ReferenceCache:
+	"""Return the current branch's reference cache, created on first use."""
+
+	branch = db.current_branch()
+	cache = _caches.get(branch)
+	if cache is None:
+		with _cache_lock:
+			cache = _caches.get(branch)
+			if cache is None:
+				cache = _caches[branch] = ReferenceCache()
+	return cache
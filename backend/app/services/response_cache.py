@@ -0,0 +1,154 @@
+"""TTL/LRU cache of chat replies with an optional persistent SQLite tier."""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Optional
+
+from ..db import ConnectionPool
+
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def normalize_message(message: str) -> str:
+	"""Case- and whitespace-insensitive form of a question, ignoring trailing punctuation."""
+
+	return _WHITESPACE.sub(" ", message).strip().lower().rstrip("?!. ")
+
+
+def cache_key(message: str, system_prompt: str, model: str) -> str:
+	raw = json.dumps([normalize_message(message), system_prompt, model])
+	return hashlib.sha256(raw.encode()).hexdigest()
+
+
+class ResponseCache:
+	"""Bounded in-memory LRU of reply token lists, optionally backed by a SQLite file.
+
+	Entries expire ``ttl`` seconds after they were stored. Tokens are kept in the
+	order the model produced them so a hit can be replayed as the same SSE stream.
+	"""
+
+	def __init__(self, max_entries: int = 1024, ttl: float = 3600.0, path: Optional[Path] = None) -> None:
+		self.max_entries = max_entries
+		self.ttl = ttl
+		self._entries: OrderedDict = OrderedDict()
+		self._lock = threading.Lock()
+		self._pool: Optional[ConnectionPool] = None
+
+		self.hits = 0
+		self.disk_hits = 0
+		self.misses = 0
+		self.stores = 0
+		self.evictions = 0
+
+		if path:
+			self._pool = ConnectionPool(Path(path), max_size=2)
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute(
+						"""
+						CREATE TABLE IF NOT EXISTS chat_cache (
+							key TEXT PRIMARY KEY,
+							tokens TEXT NOT NULL,
+							stored_at REAL NOT NULL
+						);
+						"""
+					)
+
+	@property
+	def enabled(self) -> bool:
+		return self.max_entries > 0
+
+	def get(self, key: str) -> Optional[list]:
+		"""Return the cached token list for ``key`` or None on a miss."""
+
+		if not self.enabled:
+			return None
+
+		now = time.time()
+		with self._lock:
+			entry = self._entries.get(key)
+			if entry is not None:
+				stored_at, tokens = entry
+				if now - stored_at < self.ttl:
+					self._entries.move_to_end(key)
+					self.hits += 1
+					return tokens
+				del self._entries[key]
+
+		tokens = self._disk_get(key, now)
+		with self._lock:
+			if tokens is None:
+				self.misses += 1
+				return None
+			self.hits += 1
+			self.disk_hits += 1
+		return tokens
+
+	def put(self, key: str, tokens: list) -> None:
+		if not self.enabled or not tokens:
+			return
+
+		now = time.time()
+		with self._lock:
+			self._remember(key, now, list(tokens))
+			self.stores += 1
+
+		if self._pool is not None:
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute(
+						"INSERT OR REPLACE INTO chat_cache (key, tokens, stored_at) VALUES (?, ?, ?);",
+						(key, json.dumps(tokens), now),
+					)
+
+	def clear(self) -> None:
+		with self._lock:
+			self._entries.clear()
+		if self._pool is not None:
+			with self._pool.connection() as conn:
+				with conn:
+					conn.execute("DELETE FROM chat_cache;")
+
+	def stats(self) -> dict:
+		with self._lock:
+			lookups = self.hits + self.misses
+			return {
+				"entries": len(self._entries),
+				"max_entries": self.max_entries,
+				"hits": self.hits,
+				"disk_hits": self.disk_hits,
+				"misses": self.misses,
+				"hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+				"stores": self.stores,
+				"evictions": self.evictions,
+			}
+
+	def _remember(self, key: str, stored_at: float, tokens: list) -> None:
+		self._entries[key] = (stored_at, tokens)
+		self._entries.move_to_end(key)
+		while len(self._entries) > self.max_entries:
+			self._entries.popitem(last=False)
+			self.evictions += 1
+
+	def _disk_get(self, key: str, now: float) -> Optional[list]:
+		if self._pool is None:
+			return None
+
+		with self._pool.connection() as conn:
+			row = conn.execute(
+				"SELECT tokens, stored_at FROM chat_cache WHERE key = ? AND stored_at > ?;",
+				(key, now - self.ttl),
+			).fetchone()
+		if not row:
+			return None
+
+		tokens = json.loads(row[0])
+		with self._lock:
+			self._remember(key, row[1], tokens)
+		return tokens
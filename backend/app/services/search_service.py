@@ -0,0 +1,161 @@
+"""Full-text and fuzzy medication search over the ``medications_fts`` trigram index."""
+
+import os
+from typing import Optional
+
+from .. import db, metrics
+
+
+SEARCH_LIMIT = int(os.getenv("SEARCH_LIMIT", "10"))
+SEARCH_FUZZY_CANDIDATES = int(os.getenv("SEARCH_FUZZY_CANDIDATES", "25"))
+SEARCH_FUZZY_THRESHOLD = float(os.getenv("SEARCH_FUZZY_THRESHOLD", "0.6"))
+# Kept below the 0.05 gap between match tiers, so stock reorders near-equal matches only.
+SEARCH_STOCK_WEIGHT = float(os.getenv("SEARCH_STOCK_WEIGHT", "0.04"))
+SEARCH_STOCK_CAP = int(os.getenv("SEARCH_STOCK_CAP", "100"))
+
+MIN_TERM_CHARS = 3
+
+# Name, ingredient and category weights, used both by bm25 and the final score.
+_FIELD_WEIGHTS = (1.0, 0.9, 0.6)
+
+_COLUMNS = "m.id, m.name, m.active_ingredient, m.category, m.stock_quantity, m.requires_prescription, m.retail_price"
+_ID_QUERY = f"SELECT {_COLUMNS} FROM medications m WHERE m.id = ?;"
+# Rank on the index alone and join only the winners, so content rows are read for at most LIMIT matches.
+_MATCH_QUERY = f"""
+	SELECT {_COLUMNS}
+	FROM (
+		SELECT rowid FROM medications_fts
+		WHERE medications_fts MATCH ?
+		ORDER BY bm25(medications_fts, 10.0, 9.0, 6.0)
+		LIMIT ?
+	) f
+	JOIN medications m ON m.rowid = f.rowid;
+"""
+
+
+def _normalize(query: str) -> str:
+	return " ".join(query.lower().split())
+
+
+def _phrase(term: str) -> str:
+	return '"' + term.replace('"', '""') + '"'
+
+
+def _trigrams(term: str) -> list:
+	return [term[i:i + 3] for i in range(len(term) - 2)]
+
+
+def edit_distance(a: str, b: str) -> int:
+	"""Optimal string alignment distance: insertions, deletions, substitutions and adjacent swaps."""
+
+	if a == b:
+		return 0
+	previous2: Optional[list] = None
+	previous = list(range(len(b) + 1))
+	for i in range(1, len(a) + 1):
+		current = [i] + [0] * len(b)
+		for j in range(1, len(b) + 1):
+			cost = 0 if a[i - 1] == b[j - 1] else 1
+			current[j] = min(previous[j] + 1, current[j - 1] + 1, previous[j - 1] + cost)
+			if previous2 is not None and i > 1 and j > 1 and a[i - 1] == b[j - 2] and a[i - 2] == b[j - 1]:
+				current[j] = min(current[j], previous2[j - 2] + 1)
+		previous2, previous = previous, current
+	return previous[-1]
+
+
+def _word_similarity(term: str, word: str, fuzzy: bool) -> float:
+	if term == word:
+		return 1.0
+	if word.startswith(term):
+		return 0.9
+	if term in word:
+		return 0.8
+	if not fuzzy:
+		return 0.0
+	longest = max(len(term), len(word))
+	if abs(len(term) - len(word)) > longest // 2:
+		return 0.0
+	return 1.0 - edit_distance(term, word) / longest
+
+
+def similarity(query: str, text: str, fuzzy: bool = True) -> float:
+	"""0..1 closeness of a normalized query to one field value.
+
+	Without ``fuzzy`` only whole, prefix and substring matches score, which is
+	all an index hit can be and skips the edit-distance work.
+	"""
+
+	text = text.lower()
+	if text == query:
+		return 1.0
+	if text.startswith(query):
+		return 0.95
+	if query in text:
+		return 0.9
+	words = text.split()
+	terms = query.split()
+	return sum(max(_word_similarity(term, word, fuzzy) for word in words) for term in terms) / len(terms)
+
+
+def _result(row: tuple, query: str, match: str) -> dict:
+	med_id, name, ingredient, category, stock, requires_rx, retail_price = row
+	fuzzy = match == "fuzzy"
+	relevance = max(
+		weight * similarity(query, value, fuzzy)
+		for weight, value in zip(_FIELD_WEIGHTS, (name, ingredient, category))
+	)
+	if med_id.lower() == query:
+		relevance = 1.0
+	return {
+		"id": med_id,
+		"name": name,
+		"active_ingredient": ingredient,
+		"category": category,
+		"stock_quantity": stock,
+		"in_stock": stock > 0,
+		"requires_prescription": bool(requires_rx),
+		"retail_price": retail_price,
+		"relevance": round(relevance, 4),
+		"score": round(relevance + SEARCH_STOCK_WEIGHT * min(max(stock, 0), SEARCH_STOCK_CAP) / SEARCH_STOCK_CAP, 4),
+		"match": match,
+	}
+
+
+def search_medications(query: str, limit: int = SEARCH_LIMIT) -> list:
+	"""Medications matching ``query`` by id, name, active ingredient or category, best first.
+
+	Every term of at least three characters must appear as a substring of some
+	indexed field. Only if that finds nothing are medications sharing trigrams
+	with the query re-scored by edit distance, so misspellings still match.
+	Results are ordered by relevance with a small boost for stock on hand.
+	"""
+
+	normalized = _normalize(query)
+	terms = [term for term in normalized.split() if len(term) >= MIN_TERM_CHARS]
+	if not terms:
+		raise ValueError(f"Search query needs a word of at least {MIN_TERM_CHARS} characters")
+	if limit <= 0:
+		raise ValueError("Search limit must be positive")
+
+	results: dict = {}
+	with db.connection() as conn, metrics.time_query("medication_search"):
+		row = conn.execute(_ID_QUERY, (query.strip(),)).fetchone()
+		if row is not None:
+			results[row[0]] = _result(row, normalized, "exact")
+
+		expression = " AND ".join(_phrase(term) for term in terms)
+		for row in conn.execute(_MATCH_QUERY, (expression, limit)):
+			results.setdefault(row[0], _result(row, normalized, "exact"))
+
+		if not results:
+			grams = dict.fromkeys(gram for term in terms for gram in _trigrams(term))
+			expression = " OR ".join(_phrase(gram) for gram in grams)
+			for row in conn.execute(_MATCH_QUERY, (expression, SEARCH_FUZZY_CANDIDATES)):
+				if row[0] in results:
+					continue
+				result = _result(row, normalized, "fuzzy")
+				if result["relevance"] >= SEARCH_FUZZY_THRESHOLD:
+					results[row[0]] = result
+
+	ranked = sorted(results.values(), key=lambda result: (-result["score"], result["name"]))
+	return ranked[:limit]
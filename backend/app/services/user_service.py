@@ -1,36 +1,27 @@
 """User-related financial transactions."""
 
 import sqlite3
-from contextlib import closing
-from pathlib import Path
 
-
-DB_PATH = Path(__file__).resolve().parents[2] / "data" / "pharmacy.db"
+from .. import db
+from . import change_feed, ledger_service
 
 
 def process_transaction(user_id: str, amount: float) -> None:
 	"""Increase user debt and add revenue and budget for the pharmacy."""
 
-	with closing(sqlite3.connect(DB_PATH)) as conn:
-		conn.execute("PRAGMA foreign_keys = ON;")
-		with conn:
-			cursor = conn.cursor()
-
-			cursor.execute("SELECT debt FROM users WHERE id = ?;", (user_id,))
-			user_row = cursor.fetchone()
-			if not user_row:
-				raise ValueError("User not found")
-
-			cursor.execute(
-				"UPDATE users SET debt = debt + ? WHERE id = ?;",
-				(amount, user_id),
-			)
-			cursor.execute(
-				"""
-				UPDATE pharmacy_financials
-				SET total_revenue = total_revenue + ?,
-					total_budget = total_budget + ?
-				WHERE id = 1;
-				""",
-				(amount, amount),
-			)
+	db.write(_apply_transaction, user_id, amount, name="transaction")
+
+
+def _apply_transaction(conn: sqlite3.Connection, user_id: str, amount: float) -> None:
+	cursor = conn.cursor()
+
+	cursor.execute(
+		"UPDATE users SET debt = debt + ? WHERE id = ? RETURNING debt;",
+		(amount, user_id),
+	)
+	row = cursor.fetchone()
+	if not row:
+		raise ValueError("User not found")
+
+	change_feed.publish_on_commit("debt", {"user_id": user_id, "amount": amount, "debt": row[0]}, user_id=user_id)
+	ledger_service.record_entry(cursor, "sale", amount, amount, reference=user_id)
@@ -0,0 +1,9 @@
+"""ASGI entrypoint: async /chat streaming with the Flask API mounted behind it.
+
+    uvicorn asgi:app --host 0.0.0.0 --port 5000
+"""
+
+from app import create_app
+from app.async_chat import AsyncChatApp
+
+app = AsyncChatApp(create_app())
@@ -0,0 +1,67 @@
+"""Compare write throughput on one database file with the same load spread over branch shards.
+
+    python benchmarks/branches.py --branches 4 --writers 4 --ops 200
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+	sys.path.insert(0, str(BACKEND_DIR))
+
+
+def run(branches: list, writers: int, ops: int) -> float:
+	"""Run ``writers`` restocking threads per branch; return committed writes per second."""
+
+	from app import db
+	from app.services import pharmacy_service
+
+	barrier = threading.Barrier(len(branches) * writers + 1)
+
+	def worker(branch: str) -> None:
+		with db.use_branch(branch):
+			barrier.wait()
+			for _ in range(ops):
+				pharmacy_service.process_restock("User_Manager", "med_acamol", 1)
+
+	threads = [threading.Thread(target=worker, args=(branch,)) for branch in branches for _ in range(writers)]
+	for thread in threads:
+		thread.start()
+	barrier.wait()
+	started = time.perf_counter()
+	for thread in threads:
+		thread.join()
+	return len(threads) * ops / (time.perf_counter() - started)
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--branches", type=int, default=4)
+	parser.add_argument("--writers", type=int, default=4, help="writer threads per branch")
+	parser.add_argument("--ops", type=int, default=200, help="restocks per writer")
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		names = ["main", *(f"b{n}" for n in range(1, args.branches))]
+		# The app and init_db read these when first imported.
+		os.environ["PHARMACY_DB_PATH"] = str(Path(tmpdir) / "pharmacy.db")
+		os.environ["PHARMACY_BRANCHES"] = ",".join(names)
+		from data import init_db
+
+		for name in names:
+			init_db.initialize_database(init_db.branch_db_path(name))
+
+		single = run(["main"], args.writers * args.branches, args.ops)
+		sharded = run(names, args.writers, args.ops)
+		print(f"one file:  {single:,.0f} writes/s ({args.writers * args.branches} writers)")
+		print(f"{args.branches} shards: {sharded:,.0f} writes/s ({args.writers} writers each), {sharded / single:.2f}x")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,65 @@
+"""Micro-benchmark for the interaction pair index.
+
+    python benchmarks/interactions.py --rows 50000 --basket 10
+"""
+
+import argparse
+import random
+import statistics
+import sys
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+	sys.path.insert(0, str(BACKEND_DIR))
+
+from app.services.interaction_index import InteractionIndex  # noqa: E402
+
+
+SEVERITIES = ("minor", "moderate", "major", "contraindicated")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--meds", type=int, default=20_000)
+	parser.add_argument("--rows", type=int, default=50_000)
+	parser.add_argument("--basket", type=int, default=10)
+	parser.add_argument("--iterations", type=int, default=10_000)
+	parser.add_argument("--seed", type=int, default=7)
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	index = InteractionIndex()
+	started = time.perf_counter()
+	for n in range(args.rows):
+		first, second = rng.sample(range(args.meds), 2)
+		index.add(
+			{
+				"id": f"int_{n}",
+				"med_1_id": f"med_{first}",
+				"med_2_id": f"med_{second}",
+				"severity": rng.choice(SEVERITIES),
+				"description": "",
+			}
+		)
+	build_ms = (time.perf_counter() - started) * 1000
+
+	baskets = [[f"med_{m}" for m in rng.sample(range(args.meds), args.basket)] for _ in range(args.iterations)]
+	timings = []
+	hits = 0
+	for basket in baskets:
+		started = time.perf_counter()
+		hits += len(index.between(basket))
+		timings.append((time.perf_counter() - started) * 1_000_000)
+
+	timings.sort()
+	print(f"index of {len(index)} interactions built in {build_ms:.1f} ms")
+	print(
+		f"basket of {args.basket}: p50 {statistics.median(timings):.1f} us, "
+		f"p99 {timings[int(len(timings) * 0.99) - 1]:.1f} us, {hits} interactions found"
+	)
+
+
+if __name__ == "__main__":
+	main()
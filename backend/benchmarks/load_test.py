@@ -0,0 +1,295 @@
+"""Load-testing harness for the Flask API.
+
+Builds a synthetic database, serves the app in-process (or targets --url),
+drives a weighted mix of endpoints from concurrent clients and reports
+latency percentiles, throughput and SQLite lock errors. Chat runs against a
+local fake OpenAI-compatible server.
+
+    python benchmarks/load_test.py --clients 16 --duration 20 --output results/run.json
+    python benchmarks/load_test.py --compare results/run.json
+"""
+
+import argparse
+import json
+import logging
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+	sys.path.insert(0, str(BACKEND_DIR))
+
+from data import init_db  # noqa: E402
+from data.synthetic import MANAGER_ID, SyntheticDataset  # noqa: E402
+
+
+DEFAULT_MIX = "validate=40,fulfill=20,restock=10,transaction=20,chat=10"
+CHAT_QUESTIONS = (
+	"What is Acamol?",
+	"What is the dosage of Ritalin?",
+	"Which medications contain paracetamol?",
+	"Is Ritalin a stimulant?",
+)
+
+
+def percentile(sorted_values: list, pct: float) -> float:
+	"""Nearest-rank percentile of an already sorted list."""
+
+	if not sorted_values:
+		return 0.0
+	rank = max(1, int(round(pct / 100 * len(sorted_values))))
+	return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def parse_mix(raw: str) -> dict:
+	mix = {}
+	for part in raw.split(","):
+		name, _, weight = part.partition("=")
+		mix[name.strip()] = float(weight or 1)
+	unknown = set(mix) - set(OPERATIONS)
+	if unknown:
+		raise SystemExit(f"unknown operations in --mix: {', '.join(sorted(unknown))}")
+	return mix
+
+
+def build_database(path: Path, dataset: SyntheticDataset) -> None:
+	"""Bulk-load the synthetic dataset into a fresh, fully migrated database at ``path``."""
+
+	init_db.bulk_load(init_db.synthetic_source(dataset), db_path=path)
+
+
+class Workload:
+	"""Request factories that pick realistic ids from the synthetic dataset."""
+
+	def __init__(self, dataset: SyntheticDataset) -> None:
+		prescription_users = {row[0]: row[1] for row in dataset.prescription_rows()}
+		self.pairs = [(prescription_users[row[1]], row[2]) for row in dataset.prescription_item_rows()]
+		self.users = [row[0] for row in dataset.user_rows() if row[2] == "customer"]
+		self.meds = [row[0] for row in dataset.medication_rows()]
+
+	def validate(self, rng):
+		user_id, med_id = rng.choice(self.pairs)
+		return "GET", "/api/prescriptions/validate", {"params": {"user_id": user_id, "med_id": med_id, "qty": 1}}
+
+	def fulfill(self, rng):
+		user_id, med_id = rng.choice(self.pairs)
+		return "POST", "/api/prescriptions/fulfill", {"json": {"user_id": user_id, "med_id": med_id, "qty": 1}}
+
+	def checkout(self, rng):
+		user_id, med_id = rng.choice(self.pairs)
+		return "POST", "/api/checkout", {"json": {"user_id": user_id, "med_id": med_id, "qty": 1}}
+
+	def restock(self, rng):
+		return "POST", "/api/pharmacies/restock", {"json": {"manager_id": MANAGER_ID, "med_id": rng.choice(self.meds), "qty": 10}}
+
+	def transaction(self, rng):
+		return "POST", "/api/users/transaction", {"json": {"user_id": rng.choice(self.users), "amount": 10.0}}
+
+	def chat(self, rng):
+		return "POST", "/chat", {"json": {"message": rng.choice(CHAT_QUESTIONS)}}
+
+
+OPERATIONS = ("validate", "fulfill", "checkout", "restock", "transaction", "chat")
+
+
+class Recorder:
+	def __init__(self) -> None:
+		self._lock = threading.Lock()
+		self.samples = {name: [] for name in OPERATIONS}
+		self.ttft = {name: [] for name in OPERATIONS}
+		self.outcomes = {name: {"ok": 0, "rejected": 0, "errors": 0, "lock_errors": 0} for name in OPERATIONS}
+
+	def record(self, name: str, elapsed: float, outcome: str, locked: bool, ttft: float = None) -> None:
+		with self._lock:
+			self.samples[name].append(elapsed)
+			self.outcomes[name][outcome] += 1
+			if locked:
+				self.outcomes[name]["lock_errors"] += 1
+			if ttft is not None:
+				self.ttft[name].append(ttft)
+
+
+def _issue(client: httpx.Client, name: str, method: str, path: str, kwargs: dict):
+	"""Send one request; return (status, body_text, time_to_first_token)."""
+
+	if name != "chat":
+		response = client.request(method, path, **kwargs)
+		return response.status_code, response.text, None
+
+	started = time.perf_counter()
+	ttft = None
+	chunks = []
+	with client.stream(method, path, **kwargs) as response:
+		for line in response.iter_lines():
+			if ttft is None and line.startswith("data: {\"token\""):
+				ttft = time.perf_counter() - started
+			chunks.append(line)
+		return response.status_code, "\n".join(chunks), ttft
+
+
+def run_clients(base_url: str, workload: Workload, mix: dict, clients: int, duration: float, seed: int) -> tuple:
+	recorder = Recorder()
+	names = list(mix)
+	weights = [mix[name] for name in names]
+	deadline = time.perf_counter() + duration
+
+	def worker(worker_id: int) -> None:
+		rng = random.Random(f"{seed}:{worker_id}")
+		with httpx.Client(base_url=base_url, timeout=30.0) as client:
+			while time.perf_counter() < deadline:
+				name = rng.choices(names, weights)[0]
+				method, path, kwargs = getattr(workload, name)(rng)
+				started = time.perf_counter()
+				try:
+					status, body, ttft = _issue(client, name, method, path, kwargs)
+				except httpx.HTTPError:
+					recorder.record(name, time.perf_counter() - started, "errors", False)
+					continue
+				elapsed = time.perf_counter() - started
+				locked = "locked" in body or "busy" in body
+				if status < 400 and '"error"' not in body:
+					outcome = "ok"
+				elif status < 500 and not locked:
+					outcome = "rejected"
+				else:
+					outcome = "errors"
+				recorder.record(name, elapsed, outcome, locked, ttft)
+
+	started = time.perf_counter()
+	threads = [threading.Thread(target=worker, args=(n,)) for n in range(clients)]
+	for thread in threads:
+		thread.start()
+	for thread in threads:
+		thread.join()
+	return recorder, time.perf_counter() - started
+
+
+def summarize(recorder: Recorder, elapsed: float) -> dict:
+	endpoints = {}
+	for name in OPERATIONS:
+		samples = sorted(recorder.samples[name])
+		if not samples:
+			continue
+		ttft = sorted(recorder.ttft[name])
+		endpoints[name] = {
+			"requests": len(samples),
+			"rps": round(len(samples) / elapsed, 2),
+			"p50_ms": round(percentile(samples, 50) * 1000, 3),
+			"p95_ms": round(percentile(samples, 95) * 1000, 3),
+			"p99_ms": round(percentile(samples, 99) * 1000, 3),
+			**recorder.outcomes[name],
+		}
+		if ttft:
+			endpoints[name]["ttft_p50_ms"] = round(percentile(ttft, 50) * 1000, 3)
+			endpoints[name]["ttft_p95_ms"] = round(percentile(ttft, 95) * 1000, 3)
+
+	total = sum(endpoint["requests"] for endpoint in endpoints.values())
+	return {
+		"elapsed_seconds": round(elapsed, 3),
+		"total_requests": total,
+		"total_rps": round(total / elapsed, 2) if elapsed else 0.0,
+		"lock_errors": sum(endpoint["lock_errors"] for endpoint in endpoints.values()),
+		"endpoints": endpoints,
+	}
+
+
+def print_report(summary: dict, baseline: dict = None) -> None:
+	print(f"{summary['total_requests']} requests in {summary['elapsed_seconds']}s "
+		f"({summary['total_rps']} req/s, {summary['lock_errors']} lock errors)")
+	header = f"{'endpoint':<12}{'reqs':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'rej':>7}{'err':>7}{'lock':>7}"
+	print(header)
+	for name, row in summary["endpoints"].items():
+		line = (
+			f"{name:<12}{row['requests']:>8}{row['rps']:>10}{row['p50_ms']:>10}{row['p95_ms']:>10}"
+			f"{row['p99_ms']:>10}{row['rejected']:>7}{row['errors']:>7}{row['lock_errors']:>7}"
+		)
+		previous = (baseline or {}).get("endpoints", {}).get(name)
+		if previous and previous["p95_ms"]:
+			delta = (row["p95_ms"] - previous["p95_ms"]) / previous["p95_ms"] * 100
+			line += f"   p95 {delta:+.1f}% vs baseline"
+		print(line)
+
+
+def serve_in_process(tmpdir: Path, args) -> tuple:
+	"""Build the dataset, start a fake LLM and serve the Flask app on a free port."""
+
+	from tests.fake_openai import FakeOpenAIServer
+
+	db_path = tmpdir / "load.db"
+	dataset = SyntheticDataset(args.users, args.meds, args.prescriptions, 2, args.interactions, args.seed)
+	build_database(db_path, dataset)
+
+	fake = FakeOpenAIServer(tokens=("Synthetic", " answer", " tokens"), token_delay=args.chat_token_delay)
+	fake.__enter__()
+	os.environ.update(
+		{
+			"PHARMACY_DB_PATH": str(db_path),
+			"OPENAI_API_KEY": "load-test",
+			"OPENAI_MODEL": "fake-model",
+			"OPENAI_BASE_URL": fake.base_url,
+		}
+	)
+
+	from werkzeug.serving import make_server
+
+	from app import create_app
+
+	logging.getLogger("werkzeug").setLevel(logging.WARNING)
+	server = make_server("127.0.0.1", 0, create_app(), threaded=True)
+	threading.Thread(target=server.serve_forever, daemon=True).start()
+
+	def shutdown() -> None:
+		server.shutdown()
+		fake.__exit__(None, None, None)
+
+	return f"http://127.0.0.1:{server.server_port}", dataset, shutdown
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--url", help="target an already running server instead of serving in-process")
+	parser.add_argument("--users", type=int, default=5_000)
+	parser.add_argument("--meds", type=int, default=500)
+	parser.add_argument("--prescriptions", type=int, default=20_000)
+	parser.add_argument("--interactions", type=int, default=2_000)
+	parser.add_argument("--clients", type=int, default=8)
+	parser.add_argument("--duration", type=float, default=10.0)
+	parser.add_argument("--mix", default=DEFAULT_MIX, help=f"weighted operations (default {DEFAULT_MIX})")
+	parser.add_argument("--chat-token-delay", type=float, default=0.01, help="fake LLM delay per token, seconds")
+	parser.add_argument("--seed", type=int, default=7)
+	parser.add_argument("--output", type=Path, help="write machine-readable results to this JSON file")
+	parser.add_argument("--compare", type=Path, help="print p95 deltas against a previous results file")
+	args = parser.parse_args()
+
+	mix = parse_mix(args.mix)
+	baseline = json.loads(args.compare.read_text()) if args.compare else None
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		if args.url:
+			dataset = SyntheticDataset(args.users, args.meds, args.prescriptions, 2, args.interactions, args.seed)
+			base_url, shutdown = args.url, (lambda: None)
+		else:
+			base_url, dataset, shutdown = serve_in_process(Path(tmpdir), args)
+		try:
+			recorder, elapsed = run_clients(base_url, Workload(dataset), mix, args.clients, args.duration, args.seed)
+		finally:
+			shutdown()
+
+	summary = summarize(recorder, elapsed)
+	summary["config"] = {key: value for key, value in vars(args).items() if key not in ("output", "compare")}
+	print_report(summary, baseline)
+
+	if args.output:
+		args.output.parent.mkdir(parents=True, exist_ok=True)
+		args.output.write_text(json.dumps(summary, indent=2, default=str))
+
+
+if __name__ == "__main__":
+	main()
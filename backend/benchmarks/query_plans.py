@@ -0,0 +1,108 @@
+"""Query-plan and latency benchmark for the prescription lookup indexes.
+
+Builds a synthetic database without secondary indexes, times the hot
+prescription queries, applies the schema migrations and times them again.
+
+    python benchmarks/query_plans.py --prescriptions 200000
+"""
+
+import argparse
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import time
+from contextlib import closing
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+	sys.path.insert(0, str(BACKEND_DIR))
+
+from data import init_db  # noqa: E402
+from data.synthetic import SyntheticDataset  # noqa: E402
+
+
+QUERIES = {
+	"validate": (
+		"""
+		SELECT pi.id, pi.remaining_periods
+		FROM prescriptions p
+		JOIN prescription_items pi ON pi.prescription_id = p.id
+		WHERE p.user_id = ? AND pi.med_id = ? AND p.is_active = 1
+		ORDER BY pi.remaining_periods DESC
+		LIMIT 1;
+		""",
+		lambda rng, n: (f"user_{rng.randrange(n['users'])}", f"med_{rng.randrange(n['meds'])}"),
+	),
+	"deactivate_check": (
+		"""
+		SELECT EXISTS (
+			SELECT 1 FROM prescription_items
+			WHERE prescription_id = ? AND remaining_periods > 0
+		);
+		""",
+		lambda rng, n: (f"rx_{rng.randrange(n['prescriptions'])}",),
+	),
+}
+
+
+def _measure(conn: sqlite3.Connection, sizes: dict, iterations: int, seed: int) -> dict:
+	results = {}
+	for name, (sql, make_params) in QUERIES.items():
+		rng = random.Random(seed)
+		plan = [row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + sql, make_params(rng, sizes))]
+		timings = []
+		for _ in range(iterations):
+			params = make_params(rng, sizes)
+			started = time.perf_counter()
+			conn.execute(sql, params).fetchall()
+			timings.append((time.perf_counter() - started) * 1_000_000)
+		results[name] = {
+			"plan": plan,
+			"p50_us": statistics.median(timings),
+			"max_us": max(timings),
+		}
+	return results
+
+
+def _report(label: str, results: dict) -> None:
+	print(f"== {label}")
+	for name, result in results.items():
+		print(f"  {name}: p50 {result['p50_us']:.1f} us, max {result['max_us']:.1f} us")
+		for step in result["plan"]:
+			print(f"    {step}")
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--users", type=int, default=20_000)
+	parser.add_argument("--meds", type=int, default=2_000)
+	parser.add_argument("--prescriptions", type=int, default=100_000)
+	parser.add_argument("--iterations", type=int, default=200)
+	parser.add_argument("--seed", type=int, default=7)
+	args = parser.parse_args()
+
+	sizes = {"users": args.users, "meds": args.meds, "prescriptions": args.prescriptions}
+
+	dataset = SyntheticDataset(
+		users=args.users, medications=args.meds, prescriptions=args.prescriptions, interactions=0, seed=args.seed
+	)
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		db_path = Path(tmpdir) / "bench.db"
+		init_db.bulk_load(init_db.synthetic_source(dataset), db_path=db_path, migrate=False)
+		with closing(sqlite3.connect(db_path)) as conn:
+			before = _measure(conn, sizes, args.iterations, args.seed)
+
+			version = init_db.apply_migrations(conn)
+			conn.execute("ANALYZE;")
+			after = _measure(conn, sizes, args.iterations, args.seed)
+
+	_report("before migrations (schema version 0)", before)
+	_report(f"after migrations (schema version {version})", after)
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,79 @@
+"""Time restock planning and apply over a large synthetic catalog.
+
+    python benchmarks/restock_plan.py --medications 100000 --days 28
+"""
+
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import closing
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+	sys.path.insert(0, str(BACKEND_DIR))
+
+from data import init_db  # noqa: E402
+from data.synthetic import MANAGER_ID, SyntheticDataset  # noqa: E402
+
+
+def record_history(path: Path, medications: int, days: int, seed: int) -> int:
+	"""Randomize stock and write ``days`` of daily consumption per medication; return the row count."""
+
+	rng = random.Random(seed)
+	today = datetime.now(timezone.utc).date()
+	day_names = [(today - timedelta(days=n)).isoformat() for n in range(days)]
+	with closing(sqlite3.connect(path)) as conn:
+		with conn:
+			conn.execute("UPDATE medications SET stock_quantity = abs(random()) % 150;")
+			conn.execute("DELETE FROM medication_consumption;")
+			conn.executemany(
+				"INSERT INTO medication_consumption (med_id, day, quantity) VALUES (?, ?, ?);",
+				(
+					(f"med_{med}", day, rng.randint(1, 12))
+					for med in range(medications)
+					for day in day_names
+					if rng.random() < 0.6
+				),
+			)
+		return conn.execute("SELECT COUNT(*) FROM medication_consumption;").fetchone()[0]
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--medications", type=int, default=100_000)
+	parser.add_argument("--days", type=int, default=28)
+	parser.add_argument("--seed", type=int, default=7)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		path = Path(tmpdir) / "restock.db"
+		started = time.perf_counter()
+		dataset = SyntheticDataset(users=10, medications=args.medications, prescriptions=0, interactions=0)
+		init_db.bulk_load(init_db.synthetic_source(dataset), db_path=path)
+		rows = record_history(path, args.medications, args.days, args.seed)
+		print(f"built {args.medications} medications and {rows} consumption rows in {time.perf_counter() - started:.1f} s")
+
+		# The service modules read PHARMACY_DB_PATH when first imported.
+		os.environ["PHARMACY_DB_PATH"] = str(path)
+		from app.services import inventory_service
+
+		plan = inventory_service.plan_restock()
+		print(
+			f"plan: {plan['below_reorder_point']} below reorder point, {len(plan['lines'])} lines, "
+			f"cost {plan['cost']:.2f} of {plan['budget']:.2f}, {plan['unfunded']} unfunded, "
+			f"{plan['planning_seconds'] * 1000:.0f} ms"
+		)
+
+		started = time.perf_counter()
+		applied = inventory_service.apply_restock_plan(MANAGER_ID)
+		print(f"plan and apply of {len(applied['lines'])} lines: {(time.perf_counter() - started) * 1000:.0f} ms")
+
+
+if __name__ == "__main__":
+	main()
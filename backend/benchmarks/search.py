@@ -0,0 +1,99 @@
+"""Time exact and misspelled medication searches over a large synthetic formulary.
+
+    python benchmarks/search.py --medications 100000 --queries 2000
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+	sys.path.insert(0, str(BACKEND_DIR))
+
+from data import init_db  # noqa: E402
+from data.synthetic import SyntheticDataset  # noqa: E402
+
+CONSONANTS = "bcdfghklmnprstvxz"
+VOWELS = "aeiouy"
+
+
+def brand_names(count: int, seed: int) -> list:
+	"""Distinct pronounceable brand and ingredient-like names."""
+
+	rng = random.Random(seed)
+	names: dict = {}
+	while len(names) < count:
+		syllables = rng.randint(3, 4)
+		name = "".join(rng.choice(CONSONANTS) + rng.choice(VOWELS) for _ in range(syllables)) + rng.choice(CONSONANTS)
+		names[name.capitalize()] = None
+	return list(names)
+
+
+def misspell(word: str, rng: random.Random) -> str:
+	i = rng.randrange(1, len(word) - 2)
+	edit = rng.choice(("swap", "drop", "replace"))
+	if edit == "swap":
+		return word[:i] + word[i + 1] + word[i] + word[i + 2:]
+	if edit == "drop":
+		return word[:i] + word[i + 1:]
+	return word[:i] + rng.choice("aeiou") + word[i + 1:]
+
+
+def percentiles(samples: list) -> str:
+	samples = sorted(samples)
+	p95 = samples[int(len(samples) * 0.95) - 1]
+	return f"p50 {statistics.median(samples) * 1000:.3f} ms, p95 {p95 * 1000:.3f} ms"
+
+
+def main() -> None:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--medications", type=int, default=100_000)
+	parser.add_argument("--queries", type=int, default=2_000)
+	parser.add_argument("--seed", type=int, default=7)
+	args = parser.parse_args()
+
+	rng = random.Random(args.seed)
+	names = brand_names(args.medications + args.medications // 3, args.seed)
+	brands, ingredients = names[: args.medications], names[args.medications:]
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		path = Path(tmpdir) / "search.db"
+		dataset = SyntheticDataset(users=10, medications=args.medications, prescriptions=0, interactions=0)
+		sources = init_db.synthetic_source(dataset)
+		sources["medications"] = (
+			(row[0], brands[n], ingredients[n % len(ingredients)], *row[3:])
+			for n, row in enumerate(sources["medications"])
+		)
+		started = time.perf_counter()
+		init_db.bulk_load(sources, db_path=path)
+		print(f"built {args.medications} medications and the trigram index in {time.perf_counter() - started:.1f} s")
+
+		# The service modules read PHARMACY_DB_PATH when first imported.
+		os.environ["PHARMACY_DB_PATH"] = str(path)
+		from app.services import search_service
+
+		workloads = {
+			"exact name": [rng.choice(brands) for _ in range(args.queries)],
+			"name prefix": [rng.choice(brands)[:5] for _ in range(args.queries)],
+			"ingredient": [rng.choice(ingredients) for _ in range(args.queries)],
+			"misspelled": [misspell(rng.choice(brands).lower(), rng) for _ in range(args.queries)],
+		}
+		search_service.search_medications(brands[0])
+		for label, queries in workloads.items():
+			samples, hits = [], 0
+			for query in queries:
+				started = time.perf_counter()
+				results = search_service.search_medications(query)
+				samples.append(time.perf_counter() - started)
+				hits += bool(results)
+			print(f"{label:>12}: {percentiles(samples)}, {hits / len(queries):.0%} with results")
+
+
+if __name__ == "__main__":
+	main()
@@ -0,0 +1,66 @@
+"""Race the write paths from many threads or processes and check the invariants.
+
+    python benchmarks/stress.py --workers 16 --ops 200 --mode both
+    python benchmarks/stress.py --single-writer --output benchmarks/results/stress.json
+
+Exits non-zero if any invariant (no negative stock, periods, debt or budget;
+conserved money and stock) is broken.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+if str(BACKEND_DIR) not in sys.path:
+	sys.path.insert(0, str(BACKEND_DIR))
+
+
+def main() -> int:
+	parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+	parser.add_argument("--workers", type=int, default=16)
+	parser.add_argument("--ops", type=int, default=200, help="operations per worker")
+	parser.add_argument("--mode", choices=("threads", "processes", "both"), default="both")
+	parser.add_argument("--periods", type=int, default=500)
+	parser.add_argument("--budget", type=float, default=2000.0)
+	parser.add_argument("--single-writer", action="store_true", help="route writes through the group-commit writer")
+	parser.add_argument("--output", type=Path)
+	args = parser.parse_args()
+
+	with tempfile.TemporaryDirectory() as tmpdir:
+		# Set before the app is imported; spawned worker processes inherit it.
+		os.environ["PHARMACY_DB_PATH"] = str(Path(tmpdir) / "stress.db")
+		if args.single_writer:
+			os.environ["DB_SINGLE_WRITER"] = "1"
+		from tests import stress_harness
+
+		reports = []
+		modes = ("threads", "processes") if args.mode == "both" else (args.mode,)
+		for mode in modes:
+			initial = stress_harness.prepare_database(periods=args.periods, rx_stock=args.periods, budget=args.budget)
+			report = stress_harness.run(workers=args.workers, ops=args.ops, mode=mode)
+			report["violations"] = stress_harness.check_invariants(initial, report)
+			reports.append(report)
+
+			totals = report["totals"]
+			rejected = sum(count for key, count in totals.items() if key.endswith(":rejected"))
+			print(
+				f"{mode:>9}: {report['calls']} calls in {report['elapsed_seconds']:.2f} s "
+				f"({report['calls_per_second']:.0f}/s, mean {report['mean_latency_ms']:.2f} ms), "
+				f"{rejected} rejected, lock errors {totals.get('lock_errors', 0)} "
+				f"({report['lock_error_rate']:.2%})"
+			)
+			for violation in report["violations"]:
+				print(f"           VIOLATION {violation}")
+
+	if args.output:
+		args.output.parent.mkdir(parents=True, exist_ok=True)
+		args.output.write_text(json.dumps(reports, indent=2))
+	return 1 if any(report["violations"] for report in reports) else 0
+
+
+if __name__ == "__main__":
+	sys.exit(main())
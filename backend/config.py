@@ -1,4 +1,5 @@
 import os
+from pathlib import Path
 from dotenv import load_dotenv
 
 # Load environment variables from a .env file if present
@@ -7,3 +8,36 @@ load_dotenv()
 # Basic configuration object
 class Config:
     OPENAI_API_KEY = os.getenv("OPENAI_API_KEY", "")
+
+    # Async chat serving (asgi.py)
+    CHAT_MAX_STREAMS = int(os.getenv("CHAT_MAX_STREAMS", "64"))
+    CHAT_QUEUE_TIMEOUT = float(os.getenv("CHAT_QUEUE_TIMEOUT", "2.0"))
+    CHAT_UPSTREAM_TIMEOUT = float(os.getenv("CHAT_UPSTREAM_TIMEOUT", "60.0"))
+
+    # Opt-in request profiling (app/profiling.py)
+    PROFILE_ENABLED = os.getenv("PROFILE_ENABLED", "0") == "1"
+    PROFILE_HEADER = os.getenv("PROFILE_HEADER", "X-Profile")
+    PROFILE_SAMPLE_RATE = float(os.getenv("PROFILE_SAMPLE_RATE", "0.0"))
+    PROFILE_INTERVAL = float(os.getenv("PROFILE_INTERVAL", "0.001"))
+    PROFILE_FORMAT = os.getenv("PROFILE_FORMAT", "collapsed")
+    PROFILE_DIR = os.getenv("PROFILE_DIR") or str(Path(__file__).resolve().parent / "profiles")
+
+    # Admission control (app/admission.py). Rates are requests per second; 0 disables a limit.
+    ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "0") == "1"
+    ADMISSION_QUEUE_TIMEOUT = float(os.getenv("ADMISSION_QUEUE_TIMEOUT", "2.0"))
+    ADMISSION_MAX_RATE_KEYS = int(os.getenv("ADMISSION_MAX_RATE_KEYS", "10000"))
+    ADMISSION_CHAT_CONCURRENCY = int(os.getenv("ADMISSION_CHAT_CONCURRENCY", "16"))
+    ADMISSION_CHAT_QUEUE = int(os.getenv("ADMISSION_CHAT_QUEUE", "32"))
+    ADMISSION_CHAT_RATE = float(os.getenv("ADMISSION_CHAT_RATE", "0"))
+    ADMISSION_CHAT_USER_RATE = float(os.getenv("ADMISSION_CHAT_USER_RATE", "0"))
+    ADMISSION_CHAT_USER_BURST = int(os.getenv("ADMISSION_CHAT_USER_BURST", "5"))
+    ADMISSION_WRITE_CONCURRENCY = int(os.getenv("ADMISSION_WRITE_CONCURRENCY", "8"))
+    ADMISSION_WRITE_QUEUE = int(os.getenv("ADMISSION_WRITE_QUEUE", "64"))
+    ADMISSION_WRITE_RATE = float(os.getenv("ADMISSION_WRITE_RATE", "0"))
+    ADMISSION_WRITE_USER_RATE = float(os.getenv("ADMISSION_WRITE_USER_RATE", "0"))
+    ADMISSION_WRITE_USER_BURST = int(os.getenv("ADMISSION_WRITE_USER_BURST", "20"))
+    ADMISSION_READ_CONCURRENCY = int(os.getenv("ADMISSION_READ_CONCURRENCY", "32"))
+    ADMISSION_READ_QUEUE = int(os.getenv("ADMISSION_READ_QUEUE", "128"))
+    ADMISSION_READ_RATE = float(os.getenv("ADMISSION_READ_RATE", "0"))
+    ADMISSION_READ_USER_RATE = float(os.getenv("ADMISSION_READ_USER_RATE", "0"))
+    ADMISSION_READ_USER_BURST = int(os.getenv("ADMISSION_READ_USER_BURST", "50"))
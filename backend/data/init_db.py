@@ -1,24 +1,278 @@
 """SQLite schema and seed data initializer for the Pharmacy Agent."""
 
+import argparse
+import csv
+import itertools
+import json
 import os
 import sqlite3
+import sys
 import time
 from contextlib import closing
 from datetime import datetime, timezone
 from pathlib import Path
+from typing import Callable, Iterable, Iterator, Optional
 
 
-DB_PATH = Path(__file__).resolve().with_name("pharmacy.db")
+DB_PATH = Path(os.getenv("PHARMACY_DB_PATH") or Path(__file__).resolve().with_name("pharmacy.db"))
+DEFAULT_BRANCH = os.getenv("PHARMACY_BRANCH", "main")
+BRANCH_DB_DIR = Path(os.getenv("PHARMACY_BRANCH_DIR") or DB_PATH.parent)
 
 
-def initialize_database() -> None:
+def branch_db_path(branch: str) -> Path:
+	"""Database file for ``branch``; mirrors ``app.db.ShardRouter.path``."""
+
+	return DB_PATH if branch == DEFAULT_BRANCH else BRANCH_DB_DIR / f"pharmacy_{branch}.db"
+
+
+def _change_log_triggers(table: str, entity: str, columns: tuple = ()) -> tuple:
+	"""Triggers that record every insert/update/delete on ``table`` in catalog_changes.
+
+	With ``columns`` only updates touching those columns are recorded.
+	"""
+
+	statements = []
+	for event, ref in (("INSERT", "NEW"), ("UPDATE", "NEW"), ("DELETE", "OLD")):
+		if event == "UPDATE" and columns:
+			event_clause = f"UPDATE OF {', '.join(columns)}"
+		else:
+			event_clause = event
+		statements.append(
+			f"""
+			CREATE TRIGGER IF NOT EXISTS trg_{table}_{event.lower()}_changes
+			AFTER {event_clause} ON {table}
+			BEGIN
+				INSERT INTO catalog_changes (entity, entity_id, version)
+				VALUES ('{entity}', {ref}.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM catalog_changes))
+				ON CONFLICT (entity, entity_id) DO UPDATE SET version = excluded.version;
+			END;
+			"""
+		)
+	return tuple(statements)
+
+
+# Ordered, append-only schema migrations tracked through PRAGMA user_version.
+# Never edit a shipped entry; add a new version instead.
+MIGRATIONS = (
+	(
+		1,
+		"secondary indexes for prescription lookups",
+		(
+			"""
+			CREATE INDEX IF NOT EXISTS idx_prescriptions_user_active
+			ON prescriptions (user_id) WHERE is_active = 1;
+			""",
+			"""
+			CREATE INDEX IF NOT EXISTS idx_prescription_items_prescription_med
+			ON prescription_items (prescription_id, med_id, remaining_periods);
+			""",
+			"""
+			CREATE INDEX IF NOT EXISTS idx_prescription_items_med
+			ON prescription_items (med_id);
+			""",
+			"""
+			CREATE INDEX IF NOT EXISTS idx_interactions_med_1
+			ON interactions (med_1_id, med_2_id);
+			""",
+			"""
+			CREATE INDEX IF NOT EXISTS idx_interactions_med_2
+			ON interactions (med_2_id);
+			""",
+		),
+	),
+	(
+		2,
+		"change log for incremental catalog refresh",
+		(
+			"""
+			CREATE TABLE IF NOT EXISTS catalog_changes (
+				entity TEXT NOT NULL,
+				entity_id TEXT NOT NULL,
+				version INTEGER NOT NULL,
+				PRIMARY KEY (entity, entity_id)
+			);
+			""",
+			"CREATE INDEX IF NOT EXISTS idx_catalog_changes_version ON catalog_changes (version);",
+			*_change_log_triggers("medications", "medication"),
+			*_change_log_triggers("prescriptions", "prescription"),
+			*_change_log_triggers("prescription_items", "prescription_item"),
+			*_change_log_triggers("interactions", "interaction"),
+		),
+	),
+	(
+		3,
+		"append-only financial ledger with compacted snapshots",
+		(
+			"""
+			CREATE TABLE financial_snapshots (
+				id INTEGER PRIMARY KEY,
+				total_budget REAL NOT NULL,
+				total_revenue REAL NOT NULL,
+				ledger_position INTEGER NOT NULL DEFAULT 0,
+				compacted_at TEXT
+			);
+			""",
+			"""
+			INSERT INTO financial_snapshots (id, total_budget, total_revenue)
+			SELECT id, total_budget, total_revenue FROM pharmacy_financials;
+			""",
+			"""
+			CREATE TABLE financial_ledger (
+				id INTEGER PRIMARY KEY,
+				account_id INTEGER NOT NULL DEFAULT 1,
+				kind TEXT NOT NULL,
+				budget_delta REAL NOT NULL,
+				revenue_delta REAL NOT NULL,
+				reference TEXT,
+				created_at TEXT NOT NULL,
+				FOREIGN KEY (account_id) REFERENCES financial_snapshots(id)
+			);
+			""",
+			"CREATE INDEX idx_financial_ledger_account ON financial_ledger(account_id, id);",
+			"DROP TABLE pharmacy_financials;",
+			# Read-compatible replacement: snapshot plus every ledger entry not yet compacted.
+			"""
+			CREATE VIEW pharmacy_financials AS
+			SELECT
+				s.id AS id,
+				s.total_budget + COALESCE(d.budget_delta, 0) AS total_budget,
+				s.total_revenue + COALESCE(d.revenue_delta, 0) AS total_revenue
+			FROM financial_snapshots s
+			LEFT JOIN (
+				SELECT l.account_id, SUM(l.budget_delta) AS budget_delta, SUM(l.revenue_delta) AS revenue_delta
+				FROM financial_ledger l
+				JOIN financial_snapshots s2 ON s2.id = l.account_id
+				WHERE l.id > s2.ledger_position
+				GROUP BY l.account_id
+			) d ON d.account_id = s.id;
+			""",
+		),
+	),
+	(
+		4,
+		"change log for user identity and role updates",
+		_change_log_triggers("users", "user", ("name", "role")),
+	),
+	(
+		5,
+		"daily medication consumption for restock planning",
+		(
+			"""
+			CREATE TABLE IF NOT EXISTS medication_consumption (
+				med_id TEXT NOT NULL,
+				day TEXT NOT NULL,
+				quantity INTEGER NOT NULL,
+				PRIMARY KEY (med_id, day)
+			) WITHOUT ROWID;
+			""",
+			# Every stock decrease (fulfillment, batch or checkout) counts as consumption.
+			"""
+			CREATE TRIGGER IF NOT EXISTS trg_medications_consumption
+			AFTER UPDATE OF stock_quantity ON medications
+			WHEN NEW.stock_quantity < OLD.stock_quantity
+			BEGIN
+				INSERT INTO medication_consumption (med_id, day, quantity)
+				VALUES (NEW.id, date('now'), OLD.stock_quantity - NEW.stock_quantity)
+				ON CONFLICT (med_id, day) DO UPDATE SET quantity = quantity + excluded.quantity;
+			END;
+			""",
+		),
+	),
+	(
+		6,
+		"trigram full-text index over medication names, ingredients and categories",
+		(
+			# External content: the index stores only trigrams and reads rows back from medications.
+			"""
+			CREATE VIRTUAL TABLE IF NOT EXISTS medications_fts USING fts5(
+				name, active_ingredient, category,
+				content = 'medications', content_rowid = 'rowid', tokenize = 'trigram'
+			);
+			""",
+			"INSERT INTO medications_fts (medications_fts) VALUES ('rebuild');",
+			"""
+			CREATE TRIGGER IF NOT EXISTS trg_medications_fts_insert
+			AFTER INSERT ON medications
+			BEGIN
+				INSERT INTO medications_fts (rowid, name, active_ingredient, category)
+				VALUES (NEW.rowid, NEW.name, NEW.active_ingredient, NEW.category);
+			END;
+			""",
+			"""
+			CREATE TRIGGER IF NOT EXISTS trg_medications_fts_delete
+			AFTER DELETE ON medications
+			BEGIN
+				INSERT INTO medications_fts (medications_fts, rowid, name, active_ingredient, category)
+				VALUES ('delete', OLD.rowid, OLD.name, OLD.active_ingredient, OLD.category);
+			END;
+			""",
+			"""
+			CREATE TRIGGER IF NOT EXISTS trg_medications_fts_update
+			AFTER UPDATE OF name, active_ingredient, category ON medications
+			BEGIN
+				INSERT INTO medications_fts (medications_fts, rowid, name, active_ingredient, category)
+				VALUES ('delete', OLD.rowid, OLD.name, OLD.active_ingredient, OLD.category);
+				INSERT INTO medications_fts (rowid, name, active_ingredient, category)
+				VALUES (NEW.rowid, NEW.name, NEW.active_ingredient, NEW.category);
+			END;
+			""",
+		),
+	),
+	(
+		7,
+		"separate medication stock changes from price and attribute changes",
+		(
+			# Stock moves on every fulfillment and restock; logging it as a medication
+			# change evicted cached prices that had not changed.
+			"DROP TRIGGER IF EXISTS trg_medications_update_changes;",
+			*_change_log_triggers(
+				"medications",
+				"medication",
+				(
+					"id", "name", "active_ingredient", "category", "dosage_instructions",
+					"requires_prescription", "retail_price", "wholesale_price",
+				),
+			),
+			"""
+			CREATE TRIGGER IF NOT EXISTS trg_medications_stock_changes
+			AFTER UPDATE OF stock_quantity ON medications
+			BEGIN
+				INSERT INTO catalog_changes (entity, entity_id, version)
+				VALUES ('medication_stock', NEW.id, (SELECT COALESCE(MAX(version), 0) + 1 FROM catalog_changes))
+				ON CONFLICT (entity, entity_id) DO UPDATE SET version = excluded.version;
+			END;
+			""",
+		),
+	),
+)
+
+SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+
+def initialize_database(db_path: Path = DB_PATH) -> None:
 	"""Create a fresh database with schema and seed data."""
 
-	if DB_PATH.exists():
+	db_path = Path(db_path)
+	_remove_database_files(db_path)
+	db_path.parent.mkdir(parents=True, exist_ok=True)
+
+	with closing(sqlite3.connect(db_path)) as conn:
+		conn.execute("PRAGMA foreign_keys = ON;")
+		with conn:
+			_create_tables(conn)
+			_seed_data(conn)
+		apply_migrations(conn)
+
+
+def _remove_database_files(db_path: Path) -> None:
+	# Remove WAL sidecar files too so a stale log is never replayed onto the new file.
+	for path in (db_path, db_path.with_name(db_path.name + "-wal"), db_path.with_name(db_path.name + "-shm")):
+		if not path.exists():
+			continue
 		last_error = None
 		for _ in range(3):
 			try:
-				DB_PATH.unlink()
+				path.unlink()
 				last_error = None
 				break
 			except PermissionError as exc:
@@ -27,13 +281,47 @@ def initialize_database() -> None:
 		if last_error:
 			raise last_error
 
-	DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-	with closing(sqlite3.connect(DB_PATH)) as conn:
+def migrate_database(db_path: Path = DB_PATH) -> int:
+	"""Upgrade an existing database in place; create a fresh one if it is missing.
+
+	Returns the schema version the database ends up at.
+	"""
+
+	if not Path(db_path).exists():
+		initialize_database(db_path)
+		return SCHEMA_VERSION
+
+	with closing(sqlite3.connect(db_path)) as conn:
 		conn.execute("PRAGMA foreign_keys = ON;")
-		with conn:
-			_create_tables(conn)
-			_seed_data(conn)
+		return apply_migrations(conn)
+
+
+def apply_migrations(conn: sqlite3.Connection) -> int:
+	"""Apply every migration newer than the database's user_version, one transaction each."""
+
+	version = conn.execute("PRAGMA user_version;").fetchone()[0]
+	for target, _description, statements in MIGRATIONS:
+		if target <= version:
+			continue
+
+		conn.execute("BEGIN IMMEDIATE;")
+		try:
+			# Another process may have migrated while we waited for the write lock.
+			version = conn.execute("PRAGMA user_version;").fetchone()[0]
+			if target <= version:
+				conn.rollback()
+				continue
+			for statement in statements:
+				conn.execute(statement)
+			conn.execute(f"PRAGMA user_version = {target};")
+		except BaseException:
+			conn.rollback()
+			raise
+		conn.commit()
+		version = target
+
+	return version
 
 
 def _create_tables(conn: sqlite3.Connection) -> None:
@@ -198,5 +486,188 @@ def _seed_data(conn: sqlite3.Connection) -> None:
 	conn.commit()
 
 
+# Column order for bulk import, in foreign-key dependency order. Values in a
+# column's default slot are used when a CSV/JSONL record omits that column.
+IMPORT_TABLES = (
+	("users", ("id", "name", "role", "debt", "created_at"), {"debt": 0.0}),
+	(
+		"medications",
+		(
+			"id", "name", "active_ingredient", "category", "dosage_instructions",
+			"stock_quantity", "requires_prescription", "retail_price", "wholesale_price",
+		),
+		{"stock_quantity": 0},
+	),
+	("pharmacy_financials", ("id", "total_budget", "total_revenue"), {}),
+	("prescriptions", ("id", "user_id", "doctor_id", "issued_date", "is_active"), {"is_active": 1}),
+	(
+		"prescription_items",
+		("id", "prescription_id", "med_id", "initial_periods", "remaining_periods"),
+		{},
+	),
+	("interactions", ("id", "med_1_id", "med_2_id", "severity", "description"), {"description": ""}),
+)
+
+BULK_BATCH_SIZE = 100_000
+
+ProgressCallback = Callable[[str, int], None]
+
+
+def _read_records(path: Path, columns: tuple, defaults: dict) -> Iterator[tuple]:
+	now = datetime.now(timezone.utc).isoformat()
+	defaults = {"created_at": now, "issued_date": now, **defaults}
+
+	with open(path, newline="", encoding="utf-8") as handle:
+		if path.suffix == ".csv":
+			records = csv.DictReader(handle)
+		else:
+			records = (json.loads(line) for line in handle if line.strip())
+		for line_number, record in enumerate(records, start=1):
+			try:
+				yield tuple(record[column] if column in record else defaults[column] for column in columns)
+			except KeyError as err:
+				raise ValueError(f"{path.name} record {line_number} is missing column {err.args[0]}") from None
+
+
+def file_source(directory: Path) -> dict:
+	"""Map each table to a row iterator read from ``<table>.csv`` or ``<table>.jsonl``."""
+
+	directory = Path(directory)
+	sources = {}
+	for table, columns, defaults in IMPORT_TABLES:
+		for suffix in (".csv", ".jsonl"):
+			path = directory / f"{table}{suffix}"
+			if path.exists():
+				sources[table] = _read_records(path, columns, defaults)
+				break
+	if not sources:
+		raise FileNotFoundError(f"No <table>.csv or <table>.jsonl files found in {directory}")
+	sources.setdefault("pharmacy_financials", iter([(1, 10000.0, 0.0)]))
+	return sources
+
+
+def synthetic_source(dataset) -> dict:
+	"""Map each table to the matching generator of a ``data.synthetic.SyntheticDataset``."""
+
+	return {
+		"users": dataset.user_rows(),
+		"medications": dataset.medication_rows(),
+		"pharmacy_financials": dataset.financials_rows(),
+		"prescriptions": dataset.prescription_rows(),
+		"prescription_items": dataset.prescription_item_rows(),
+		"interactions": dataset.interaction_rows(),
+	}
+
+
+def bulk_load(
+	sources: dict,
+	db_path: Path = DB_PATH,
+	batch_size: int = BULK_BATCH_SIZE,
+	progress: Optional[ProgressCallback] = None,
+	migrate: bool = True,
+) -> dict:
+	"""Create a fresh database at ``db_path`` and stream ``sources`` into it.
+
+	Durability is switched off for the load (no journal, no fsync) and foreign
+	keys are verified once at the end instead of per row. Secondary indexes and
+	triggers come from the migrations, which run only after the data is in, so
+	every index is built in one sorted pass. A failed load deletes the partial
+	file. Returns the row count per table.
+	"""
+
+	db_path = Path(db_path)
+	_remove_database_files(db_path)
+	db_path.parent.mkdir(parents=True, exist_ok=True)
+
+	counts = {}
+	try:
+		with closing(sqlite3.connect(db_path, isolation_level=None)) as conn:
+			conn.execute("PRAGMA journal_mode = OFF;")
+			conn.execute("PRAGMA synchronous = OFF;")
+			conn.execute("PRAGMA foreign_keys = OFF;")
+			conn.execute("PRAGMA temp_store = MEMORY;")
+			conn.execute("PRAGMA cache_size = -262144;")
+
+			conn.execute("BEGIN;")
+			_create_tables(conn)
+			conn.execute("COMMIT;")
+
+			for table, columns, _defaults in IMPORT_TABLES:
+				rows = sources.get(table)
+				if rows is not None:
+					counts[table] = _load_table(conn, table, columns, rows, batch_size, progress)
+
+			violations = conn.execute("PRAGMA foreign_key_check;").fetchmany(5)
+			if violations:
+				raise ValueError(f"Imported data violates foreign keys: {violations}")
+
+			conn.execute("PRAGMA journal_mode = WAL;")
+			conn.execute("PRAGMA synchronous = NORMAL;")
+			if migrate:
+				conn.execute("PRAGMA foreign_keys = ON;")
+				apply_migrations(conn)
+			conn.execute("ANALYZE;")
+	except BaseException:
+		_remove_database_files(db_path)
+		raise
+
+	return counts
+
+
+def _load_table(
+	conn: sqlite3.Connection,
+	table: str,
+	columns: tuple,
+	rows: Iterable[tuple],
+	batch_size: int,
+	progress: Optional[ProgressCallback],
+) -> int:
+	sql = f"INSERT INTO {table} ({', '.join(columns)}) VALUES ({', '.join('?' for _ in columns)});"
+	rows = iter(rows)
+	total = 0
+	while True:
+		batch = list(itertools.islice(rows, batch_size))
+		if not batch:
+			break
+		conn.execute("BEGIN;")
+		conn.executemany(sql, batch)
+		conn.execute("COMMIT;")
+		total += len(batch)
+		if progress:
+			progress(table, total)
+	return total
+
+
+def _print_progress(table: str, rows: int) -> None:
+	print(f"  {table}: {rows:,} rows", file=sys.stderr)
+
+
 if __name__ == "__main__":
-	initialize_database()
+	parser = argparse.ArgumentParser(description="Create or upgrade the pharmacy database.")
+	parser.add_argument("--reset", action="store_true", help="delete the database and reseed it")
+	parser.add_argument("--import-dir", type=Path, help="bulk-load <table>.csv/.jsonl files into a fresh database")
+	parser.add_argument(
+		"--synthetic",
+		metavar="SPEC",
+		help="bulk-load a synthetic dataset, e.g. users=100000,medications=5000,prescriptions=1000000,interactions=20000",
+	)
+	parser.add_argument("--batch-size", type=int, default=BULK_BATCH_SIZE)
+	parser.add_argument("--branch", default=DEFAULT_BRANCH, help="branch whose database to create or upgrade")
+	args = parser.parse_args()
+	db_path = branch_db_path(args.branch)
+
+	if args.import_dir or args.synthetic:
+		if args.import_dir:
+			sources = file_source(args.import_dir)
+		else:
+			from synthetic import SyntheticDataset
+
+			spec = dict(part.split("=", 1) for part in args.synthetic.split(",") if part)
+			sources = synthetic_source(SyntheticDataset(**{key: int(value) for key, value in spec.items()}))
+		started = time.perf_counter()
+		counts = bulk_load(sources, db_path=db_path, batch_size=args.batch_size, progress=_print_progress)
+		print(f"loaded {sum(counts.values()):,} rows in {time.perf_counter() - started:.1f}s")
+	elif args.reset:
+		initialize_database(db_path)
+	else:
+		print(f"schema version {migrate_database(db_path)}")
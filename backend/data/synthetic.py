@@ -0,0 +1,100 @@
+"""Deterministic synthetic dataset matching the init_db schema."""
+
+import random
+from typing import Iterator
+
+
+CATEGORIES = ("Analgesic", "Antibiotic", "Antihistamine", "CNS Stimulant", "Statin", "Antacid")
+SEVERITIES = ("minor", "moderate", "major", "contraindicated")
+CREATED_AT = "2024-01-01T00:00:00+00:00"
+
+MANAGER_ID = "manager_0"
+DOCTOR_ID = "doctor_0"
+
+
+class SyntheticDataset:
+	"""Row generators for every table, reproducible from ``seed``.
+
+	Each ``*_rows`` method returns a fresh iterator of tuples in the column order
+	used by the init_db INSERT statements, so rows can be streamed straight into
+	``executemany`` without materializing the whole dataset.
+	"""
+
+	def __init__(
+		self,
+		users: int = 1_000,
+		medications: int = 200,
+		prescriptions: int = 2_000,
+		items_per_prescription: int = 2,
+		interactions: int = 500,
+		seed: int = 7,
+	) -> None:
+		if medications < 2 and interactions:
+			raise ValueError("Interactions need at least two medications")
+
+		self.users = users
+		self.medications = medications
+		self.prescriptions = prescriptions
+		self.items_per_prescription = items_per_prescription
+		self.interactions = min(interactions, medications * (medications - 1) // 2)
+		self.seed = seed
+
+	def user_rows(self) -> Iterator[tuple]:
+		yield (MANAGER_ID, "Synthetic Manager", "manager", 0.0, CREATED_AT)
+		yield (DOCTOR_ID, "Synthetic Doctor", "doctor", 0.0, CREATED_AT)
+		for n in range(self.users):
+			yield (f"user_{n}", f"User {n}", "customer", 0.0, CREATED_AT)
+
+	def medication_rows(self) -> Iterator[tuple]:
+		rng = random.Random(f"{self.seed}:medications")
+		for n in range(self.medications):
+			wholesale = round(rng.uniform(1, 80), 2)
+			yield (
+				f"med_{n}",
+				f"Medication {n}",
+				f"Ingredient {n % max(1, self.medications // 3)}",
+				CATEGORIES[n % len(CATEGORIES)],
+				"Take as directed",
+				rng.randrange(50, 5_000),
+				int(rng.random() < 0.6),
+				round(wholesale * rng.uniform(1.2, 2.5), 2),
+				wholesale,
+			)
+
+	def prescription_rows(self) -> Iterator[tuple]:
+		rng = random.Random(f"{self.seed}:prescriptions")
+		random_ = rng.random
+		for n in range(self.prescriptions):
+			yield (f"rx_{n}", f"user_{int(random_() * self.users)}", DOCTOR_ID, CREATED_AT, int(random_() < 0.7))
+
+	def prescription_item_rows(self) -> Iterator[tuple]:
+		rng = random.Random(f"{self.seed}:items")
+		random_ = rng.random
+		per_rx = min(self.items_per_prescription, self.medications)
+		for n in range(self.prescriptions):
+			# rng.sample is several times slower than this for the tiny k used here.
+			meds = set()
+			while len(meds) < per_rx:
+				meds.add(int(random_() * self.medications))
+			for med in sorted(meds):
+				periods = 1 + int(random_() * 12)
+				yield (f"rx_item_{n}_{med}", f"rx_{n}", f"med_{med}", periods, int(random_() * (periods + 1)))
+
+	def interaction_rows(self) -> Iterator[tuple]:
+		rng = random.Random(f"{self.seed}:interactions")
+		seen = set()
+		while len(seen) < self.interactions:
+			first, second = sorted(rng.sample(range(self.medications), 2))
+			if (first, second) in seen:
+				continue
+			seen.add((first, second))
+			yield (
+				f"int_{len(seen) - 1}",
+				f"med_{first}",
+				f"med_{second}",
+				rng.choice(SEVERITIES),
+				f"Synthetic interaction between med_{first} and med_{second}",
+			)
+
+	def financials_rows(self) -> Iterator[tuple]:
+		yield (1, 10_000_000.0, 0.0)
@@ -0,0 +1,137 @@
+"""Local OpenAI-compatible streaming server for chat tests and benchmarks."""
+
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+
+class FakeOpenAIServer:
+    """Serve ``POST /v1/chat/completions`` as an SSE stream of fixed tokens.
+
+    ``script`` optionally lists tool-call turns to answer with first, each a list
+    of ``(name, arguments_dict)``; once exhausted the server streams ``tokens``.
+    Use as a context manager; ``base_url`` points an OpenAI client at it.
+    """
+
+    def __init__(self, tokens=("Hello", " from", " fake"), token_delay: float = 0.0, script=()):
+        self.tokens = tuple(tokens)
+        self.token_delay = token_delay
+        self.script = list(script)
+        self.requests = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer(("127.0.0.1", 0), self._make_handler())
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+
+    @property
+    def base_url(self) -> str:
+        host, port = self._server.server_address
+        return f"http://{host}:{port}/v1"
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _make_handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                with fake._lock:
+                    fake.requests.append(payload)
+                    fake.active += 1
+                    fake.max_active = max(fake.max_active, fake.active)
+                try:
+                    if payload.get("stream"):
+                        self._stream(payload)
+                    else:
+                        self._complete(payload)
+                finally:
+                    with fake._lock:
+                        fake.active -= 1
+
+            def _complete(self, payload):
+                body = json.dumps(
+                    {
+                        "id": "chatcmpl-fake",
+                        "object": "chat.completion",
+                        "created": 0,
+                        "model": payload.get("model", "fake"),
+                        "choices": [
+                            {
+                                "index": 0,
+                                "message": {"role": "assistant", "content": "".join(fake.tokens)},
+                                "finish_reason": "stop",
+                            }
+                        ],
+                    }
+                ).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def _chunk(self, payload, delta, finish_reason=None):
+                chunk = {
+                    "id": "chatcmpl-fake",
+                    "object": "chat.completion.chunk",
+                    "created": 0,
+                    "model": payload.get("model", "fake"),
+                    "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}],
+                }
+                self.wfile.write(f"data: {json.dumps(chunk)}\n\n".encode())
+                self.wfile.flush()
+
+            def _stream(self, payload):
+                self.send_response(200)
+                self.send_header("Content-Type", "text/event-stream")
+                self.send_header("Connection", "close")
+                self.end_headers()
+
+                with fake._lock:
+                    turn = fake.script.pop(0) if fake.script and payload.get("tools") else None
+                if turn is not None:
+                    for index, (name, arguments) in enumerate(turn):
+                        self._chunk(
+                            payload,
+                            {
+                                "tool_calls": [
+                                    {
+                                        "index": index,
+                                        "id": f"call_{index}",
+                                        "type": "function",
+                                        "function": {"name": name, "arguments": json.dumps(arguments)},
+                                    }
+                                ]
+                            },
+                        )
+                    self._chunk(payload, {}, "tool_calls")
+                    self.wfile.write(b"data: [DONE]\n\n")
+                    self.wfile.flush()
+                    self.close_connection = True
+                    return
+
+                for token in fake.tokens:
+                    if fake.token_delay:
+                        time.sleep(fake.token_delay)
+                    self._chunk(payload, {"content": token})
+                self.wfile.write(b"data: [DONE]\n\n")
+                self.wfile.flush()
+                self.close_connection = True
+
+        return Handler
@@ -0,0 +1,199 @@
+"""Concurrent stress harness for the write paths, shared by tests and benchmarks/stress.py.
+
+Many workers (threads or processes) hammer one prescription item, one
+over-the-counter medication and the single pharmacy budget with a weighted mix
+of operations. Each worker tallies what it committed; afterwards
+``check_invariants`` compares those tallies with the database, so a lost update,
+a double dispense or an overspend shows up as a violation.
+"""
+
+import multiprocessing
+import random
+import sqlite3
+import threading
+import time
+from collections import Counter
+
+from app import db
+from app.services import checkout_service, pharmacy_service, prescription_service, user_service
+from data import init_db
+
+
+USER_ID = "User_Gal"
+MANAGER_ID = "User_Manager"
+RX_MED = "med_ritalin"
+RX_ITEM = "rx_item_user_gal_ritalin"
+OTC_MED = "med_acamol"
+
+DEFAULT_MIX = {"fulfill": 3, "validate_fulfill": 2, "checkout": 3, "restock": 2, "transaction": 1}
+RESTOCK_QTY = 20
+TRANSACTION_AMOUNT = 7.5
+
+
+def prepare_database(periods: int = 60, rx_stock: int = 40, otc_stock: int = 30, budget: float = 400.0) -> dict:
+	"""Reset the database to a contended starting point and return its initial state."""
+
+	init_db.initialize_database(db.DB_PATH)
+	with db.transaction(immediate=True) as conn:
+		conn.execute(
+			"UPDATE prescription_items SET initial_periods = ?, remaining_periods = ? WHERE id = ?;",
+			(periods, periods, RX_ITEM),
+		)
+		conn.execute("UPDATE medications SET stock_quantity = ? WHERE id = ?;", (rx_stock, RX_MED))
+		conn.execute("UPDATE medications SET stock_quantity = ? WHERE id = ?;", (otc_stock, OTC_MED))
+		conn.execute("UPDATE financial_snapshots SET total_budget = ? WHERE id = 1;", (budget,))
+	return snapshot()
+
+
+def snapshot() -> dict:
+	with db.connection() as conn:
+		prices = {
+			med_id: (retail, wholesale)
+			for med_id, retail, wholesale in conn.execute("SELECT id, retail_price, wholesale_price FROM medications;")
+		}
+		return {
+			"stock": dict(conn.execute("SELECT id, stock_quantity FROM medications;").fetchall()),
+			"periods": conn.execute(
+				"SELECT remaining_periods FROM prescription_items WHERE id = ?;", (RX_ITEM,)
+			).fetchone()[0],
+			"budget": conn.execute("SELECT total_budget FROM pharmacy_financials WHERE id = 1;").fetchone()[0],
+			"debt": conn.execute("SELECT debt FROM users WHERE id = ?;", (USER_ID,)).fetchone()[0],
+			"min_stock": conn.execute("SELECT MIN(stock_quantity) FROM medications;").fetchone()[0],
+			"min_periods": conn.execute("SELECT MIN(remaining_periods) FROM prescription_items;").fetchone()[0],
+			"min_debt": conn.execute("SELECT MIN(debt) FROM users;").fetchone()[0],
+			"ledger_budget": conn.execute("SELECT COALESCE(SUM(budget_delta), 0) FROM financial_ledger;").fetchone()[0],
+			"ledger_revenue": conn.execute("SELECT COALESCE(SUM(revenue_delta), 0) FROM financial_ledger;").fetchone()[0],
+			"prices": prices,
+		}
+
+
+def _is_lock_error(err: sqlite3.Error) -> bool:
+	return isinstance(err, sqlite3.OperationalError) and any(
+		word in str(err).lower() for word in ("locked", "busy", "timed out")
+	)
+
+
+def _run_op(name: str, tally: Counter, prices: dict) -> None:
+	if name == "fulfill":
+		prescription_service.fulfill_prescription(USER_ID, RX_MED, 1)
+		tally["rx_dispensed"] += 1
+	elif name == "validate_fulfill":
+		# The check-then-act pattern the UI uses: validation is advisory only.
+		prescription_service.validate_fulfillment(USER_ID, RX_MED, 1)
+		prescription_service.fulfill_prescription(USER_ID, RX_MED, 1)
+		tally["rx_dispensed"] += 1
+	elif name == "checkout":
+		sale = checkout_service.checkout(USER_ID, OTC_MED, 1)
+		tally["otc_sold"] += 1
+		tally["sales"] += sale["amount"]
+	elif name == "restock":
+		pharmacy_service.process_restock(MANAGER_ID, OTC_MED, RESTOCK_QTY)
+		tally["otc_restocked"] += RESTOCK_QTY
+		tally["restock_cost"] += prices[OTC_MED][1] * RESTOCK_QTY
+	elif name == "transaction":
+		user_service.process_transaction(USER_ID, TRANSACTION_AMOUNT)
+		tally["sales"] += TRANSACTION_AMOUNT
+	else:
+		raise ValueError(f"Unknown operation: {name}")
+
+
+def worker(ops: int, mix: dict, seed: int) -> dict:
+	"""Run ``ops`` operations drawn from ``mix`` and return what was committed and how calls ended."""
+
+	rng = random.Random(seed)
+	names, weights = zip(*sorted(mix.items()))
+	prices = snapshot()["prices"]
+	tally: Counter = Counter()
+	latencies = []
+	started_at = time.time()
+	for name in rng.choices(names, weights, k=ops):
+		started = time.perf_counter()
+		try:
+			_run_op(name, tally, prices)
+			tally[f"{name}:ok"] += 1
+		except (ValueError, PermissionError):
+			tally[f"{name}:rejected"] += 1
+		except sqlite3.Error as err:
+			tally["lock_errors" if _is_lock_error(err) else "db_errors"] += 1
+		latencies.append(time.perf_counter() - started)
+	tally["latency_total"] += sum(latencies)
+	return {**tally, "started_at": started_at, "finished_at": time.time()}
+
+
+def run(workers: int = 8, ops: int = 50, mode: str = "threads", mix: dict = DEFAULT_MIX, seed: int = 7) -> dict:
+	"""Run the workers concurrently and return the merged tallies plus throughput."""
+
+	if mode not in ("threads", "processes"):
+		raise ValueError("mode must be 'threads' or 'processes'")
+
+	args = [(ops, mix, seed + n) for n in range(workers)]
+	if mode == "threads":
+		results = [None] * workers
+		barrier = threading.Barrier(workers)
+
+		def target(index: int) -> None:
+			barrier.wait()
+			results[index] = worker(*args[index])
+
+		threads = [threading.Thread(target=target, args=(n,)) for n in range(workers)]
+		for thread in threads:
+			thread.start()
+		for thread in threads:
+			thread.join()
+	else:
+		# spawn: every process opens its own pool against the inherited PHARMACY_DB_PATH.
+		with multiprocessing.get_context("spawn").Pool(workers) as pool:
+			results = pool.starmap(worker, args)
+
+	# Measured from the first worker starting to the last finishing, so process start-up is excluded.
+	elapsed = max(result.pop("finished_at") for result in results) - min(result.pop("started_at") for result in results)
+	totals: Counter = Counter()
+	for result in results:
+		totals.update(result)
+	calls = workers * ops
+	return {
+		"mode": mode,
+		"workers": workers,
+		"calls": calls,
+		"elapsed_seconds": round(elapsed, 3),
+		"calls_per_second": round(calls / elapsed, 1) if elapsed else 0.0,
+		"mean_latency_ms": round(totals.pop("latency_total", 0.0) / calls * 1000, 3) if calls else 0.0,
+		"lock_error_rate": round(totals.get("lock_errors", 0) / calls, 4) if calls else 0.0,
+		"totals": dict(totals),
+	}
+
+
+def check_invariants(initial: dict, report: dict) -> list:
+	"""Return a description of every invariant the final database state breaks."""
+
+	final = snapshot()
+	totals = Counter(report["totals"])
+	violations = []
+
+	def expect(label: str, actual, expected) -> None:
+		if isinstance(expected, float) or isinstance(actual, float):
+			if abs(actual - expected) > 1e-6:
+				violations.append(f"{label}: expected {expected}, found {actual}")
+		elif actual != expected:
+			violations.append(f"{label}: expected {expected}, found {actual}")
+
+	for label, value in (("stock", final["min_stock"]), ("periods", final["min_periods"]), ("debt", final["min_debt"])):
+		if value < 0:
+			violations.append(f"negative {label}: {value}")
+	if final["budget"] < 0:
+		violations.append(f"negative budget: {final['budget']}")
+
+	expect("prescription periods", final["periods"], initial["periods"] - totals["rx_dispensed"])
+	expect("prescription stock", final["stock"][RX_MED], initial["stock"][RX_MED] - totals["rx_dispensed"])
+	expect(
+		"otc stock",
+		final["stock"][OTC_MED],
+		initial["stock"][OTC_MED] - totals["otc_sold"] + totals["otc_restocked"],
+	)
+	expect("user debt", final["debt"], initial["debt"] + float(totals["sales"]))
+	expect("budget", final["budget"], initial["budget"] + float(totals["sales"]) - float(totals["restock_cost"]))
+	expect("ledger budget", final["ledger_budget"], final["budget"] - initial["budget"])
+	expect("ledger revenue", final["ledger_revenue"], final["debt"] - initial["debt"])
+	if totals.get("db_errors"):
+		violations.append(f"unexpected database errors: {totals['db_errors']}")
+	return violations
@@ -0,0 +1,142 @@
+"""Tests for admission control: per-class concurrency pools, queue deadlines and token buckets."""
+
+import threading
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import patch
+
+from app import create_app
+from app.admission import ConcurrencyLimiter, Rejected, TokenBucket
+from config import Config
+
+
+def _blocking_stream(release):
+    def stream(*_args, **_kwargs):
+        yield "data: {}\n\n"
+        release.wait(5)
+
+    return stream
+
+
+class AdmissionTestCase(unittest.TestCase):
+    def make_app(self, **overrides):
+        settings = {
+            "ADMISSION_ENABLED": True,
+            "ADMISSION_QUEUE_TIMEOUT": 0.2,
+            "ADMISSION_CHAT_CONCURRENCY": 2,
+            "ADMISSION_CHAT_QUEUE": 0,
+            "ADMISSION_WRITE_CONCURRENCY": 2,
+            "ADMISSION_WRITE_QUEUE": 2,
+            **overrides,
+        }
+        with patch.multiple(Config, **settings):
+            return create_app()
+
+    @patch("app.routes.prescription_service.validate_fulfillment", return_value="item1")
+    @patch("app.routes.prescription_service.fulfill_prescription")
+    def test_write_overload_sheds_with_retry_after(self, mock_fulfill, _mock_validate):
+        mock_fulfill.side_effect = lambda *_args: time.sleep(0.3)
+        app = self.make_app()
+
+        def fulfill(i):
+            return app.test_client().post(
+                "/api/prescriptions/fulfill", json={"user_id": f"U{i}", "med_id": "M1", "qty": 1}
+            )
+
+        with ThreadPoolExecutor(max_workers=12) as pool:
+            futures = [pool.submit(fulfill, i) for i in range(12)]
+            time.sleep(0.05)
+            client = app.test_client()
+            started = time.perf_counter()
+            health = client.get("/api/health")
+            validate = client.get("/api/prescriptions/validate", query_string={"user_id": "U1", "med_id": "M1", "qty": 1})
+            elapsed = time.perf_counter() - started
+            responses = [future.result() for future in futures]
+
+        self.assertEqual(health.status_code, 200)
+        self.assertEqual(validate.status_code, 200)
+        self.assertLess(elapsed, 0.2)
+
+        statuses = [resp.status_code for resp in responses]
+        self.assertIn(200, statuses)
+        self.assertIn(503, statuses)
+        self.assertEqual(set(statuses), {200, 503})
+        shed = next(resp for resp in responses if resp.status_code == 503)
+        self.assertEqual(shed.headers["Retry-After"], "1")
+        self.assertIn("capacity", shed.get_json()["error"])
+
+        stats = app.extensions["admission"].stats()["write"]
+        self.assertEqual(stats["active"], 0)
+        self.assertEqual(stats["admitted"], statuses.count(200))
+        self.assertEqual(stats["queue_full"] + stats["timed_out"], statuses.count(503))
+
+    @patch("app.routes.prescription_service.validate_fulfillment", return_value="item1")
+    @patch("app.routes.chat_service.is_configured", return_value=True)
+    def test_open_chat_streams_do_not_starve_prescriptions(self, _mock_configured, _mock_validate):
+        release = threading.Event()
+        app = self.make_app()
+        client = app.test_client()
+        with patch("app.routes.chat_service.stream_reply", _blocking_stream(release)):
+            streams = [client.post("/chat", json={"message": "hi"}) for _ in range(2)]
+            self.assertEqual([resp.status_code for resp in streams], [200, 200])
+
+            rejected = client.post("/chat", json={"message": "hi"})
+            self.assertEqual(rejected.status_code, 503)
+            self.assertIn("Retry-After", rejected.headers)
+
+            validate = client.get("/api/prescriptions/validate", query_string={"user_id": "U1", "med_id": "M1", "qty": 1})
+            self.assertEqual(validate.status_code, 200)
+
+            release.set()
+            streams[0].close()
+            self.assertEqual(app.extensions["admission"].stats()["chat"]["active"], 1)
+            admitted = client.post("/chat", json={"message": "hi"})
+            self.assertEqual(admitted.status_code, 200)
+            admitted.close()
+            streams[1].close()
+
+        self.assertEqual(app.extensions["admission"].stats()["chat"]["active"], 0)
+
+    @patch("app.routes.prescription_service.fulfill_prescription")
+    def test_user_token_bucket_returns_429(self, _mock_fulfill):
+        app = self.make_app(ADMISSION_WRITE_USER_RATE=0.5, ADMISSION_WRITE_USER_BURST=2)
+        client = app.test_client()
+
+        def fulfill(user_id):
+            return client.post("/api/prescriptions/fulfill", json={"user_id": user_id, "med_id": "M1", "qty": 1})
+
+        self.assertEqual([fulfill("U1").status_code for _ in range(2)], [200, 200])
+        limited = fulfill("U1")
+        self.assertEqual(limited.status_code, 429)
+        self.assertEqual(limited.headers["Retry-After"], "2")
+        self.assertEqual(fulfill("U2").status_code, 200)
+        self.assertEqual(client.get("/api/health").status_code, 200)
+
+    def test_disabled_admission_registers_nothing(self):
+        app = self.make_app(ADMISSION_ENABLED=False)
+        self.assertNotIn("admission", app.extensions)
+
+
+class LimiterTestCase(unittest.TestCase):
+    def test_token_bucket_refills_at_rate(self):
+        bucket = TokenBucket(rate=10, burst=2, now=0.0)
+        self.assertEqual(bucket.take(0.0), 0)
+        self.assertEqual(bucket.take(0.0), 0)
+        self.assertAlmostEqual(bucket.take(0.0), 0.1)
+        self.assertEqual(bucket.take(0.1), 0)
+
+    def test_queued_request_gets_slot_when_released(self):
+        limiter = ConcurrencyLimiter("test", max_active=1, max_queue=1, max_wait=1.0)
+        limiter.acquire()
+        threading.Timer(0.05, limiter.release).start()
+        self.assertGreater(limiter.acquire(), 0)
+        with self.assertRaises(Rejected) as caught:
+            limiter.acquire(timeout=0.01)
+        self.assertEqual((caught.exception.status, caught.exception.reason), (503, "deadline"))
+        limiter.release()
+        self.assertEqual(limiter.stats()["active"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
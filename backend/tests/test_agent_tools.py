@@ -0,0 +1,178 @@
+"""Tests for the catalog index, agent tools and the tool-calling chat loop."""
+
+import asyncio
+import json
+import sqlite3
+import sys
+import threading
+import time
+import unittest
+from unittest import mock
+
+from app import create_app, db
+from app.async_chat import AsyncChatApp
+from app.services import agent_tools, catalog, chat_service, prescription_service
+from app.services.catalog import get_catalog
+from data import init_db
+from tests.fake_openai import FakeOpenAIServer
+from tests.test_async_chat import _call
+
+
+def _add_interaction() -> None:
+    with db.connection() as conn:
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO interactions (id, med_1_id, med_2_id, severity, description)
+                VALUES ('int_1', 'med_ritalin', 'med_acamol', 'moderate', 'Test interaction');
+                """
+            )
+
+
+class CatalogToolsTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        self.catalog = get_catalog()
+        self.catalog.refresh_interval = 0
+        self.catalog.reload()
+
+    def test_find_medication_by_ingredient(self):
+        result = agent_tools.find_medication("paracetamol")
+        self.assertEqual(result["medications"][0]["id"], "med_acamol")
+
+    def test_stock_follows_writes_incrementally(self):
+        before = self.catalog.stats()
+        prescription_service.fulfill_prescription("User_Gal", "med_ritalin", 2)
+
+        result = agent_tools.check_stock("Ritalin")
+        after = self.catalog.stats()
+
+        self.assertEqual(result["stock_quantity"], 18)
+        self.assertEqual(after["full_loads"], before["full_loads"])
+        self.assertEqual(after["incremental_refreshes"], before["incremental_refreshes"] + 1)
+
+    def test_prescription_status_scoped_to_user(self):
+        raw = agent_tools.run_tool("prescription_status", json.dumps({"user_id": "User_Manager"}), "User_Gal")
+        result = json.loads(raw)
+        self.assertEqual(result["user_id"], "User_Gal")
+        self.assertEqual(result["prescriptions"][0]["items"][0]["remaining_periods"], 3)
+
+    def test_check_interactions(self):
+        _add_interaction()
+        result = agent_tools.check_interactions(["Acamol", "Ritalin", "Unknownium"])
+        self.assertEqual(result["interactions"][0]["severity"], "moderate")
+        self.assertEqual(result["unknown"], ["Unknownium"])
+
+    def test_parallel_calls_keep_order(self):
+        results = agent_tools.run_tool_calls(
+            [("check_stock", '{"medication": "Acamol"}'), ("check_stock", '{"medication": "Ritalin"}')]
+        )
+        self.assertEqual([json.loads(r)["id"] for r in results], ["med_acamol", "med_ritalin"])
+
+    def test_unknown_tool_returns_error(self):
+        self.assertIn("error", json.loads(agent_tools.run_tool("drop_tables", "{}")))
+
+    def test_anonymous_callers_cannot_read_prescriptions(self):
+        names = [spec["function"]["name"] for spec in agent_tools.tool_specs(None)]
+        self.assertNotIn("prescription_status", names)
+        self.assertIn("prescription_status", [spec["function"]["name"] for spec in agent_tools.tool_specs("User_Gal")])
+
+        result = json.loads(agent_tools.run_tool("prescription_status", json.dumps({"user_id": "User_Gal"})))
+        self.assertNotIn("prescriptions", result)
+        self.assertIn("error", result)
+
+    def test_tool_failures_are_returned_to_the_model(self):
+        with mock.patch.dict(agent_tools.TOOLS, {"check_stock": mock.Mock(side_effect=RuntimeError("boom"))}):
+            result = json.loads(agent_tools.run_tool("check_stock", '{"medication": "Acamol"}'))
+        self.assertIn("boom", result["error"])
+
+    def test_reads_during_refreshes_see_consistent_maps(self):
+        _add_interaction()
+        with db.connection() as conn:
+            with conn:
+                conn.executemany(
+                    "INSERT INTO prescriptions (id, user_id, doctor_id, issued_date, is_active) SELECT ?, 'User_Gal', doctor_id, '2024-01-01', 1 FROM prescriptions LIMIT 1;",
+                    [(f"rx_load_{i}",) for i in range(300)],
+                )
+                conn.executemany(
+                    """
+                    INSERT INTO prescription_items (id, prescription_id, med_id, initial_periods, remaining_periods)
+                    VALUES (?, ?, 'med_acamol', 2, 2);
+                    """,
+                    [(f"item_load_{i}", f"rx_load_{i}") for i in range(300)],
+                )
+        self.catalog.reload()
+        stop = threading.Event()
+        errors = []
+
+        def refresh_loop():
+            # Every prescription changes, so each refresh removes and re-adds them in the shared sets.
+            while not stop.is_set():
+                with db.connection() as conn:
+                    with conn:
+                        conn.execute("UPDATE prescriptions SET is_active = is_active WHERE user_id = 'User_Gal';")
+                self.catalog.ensure_fresh()
+                self.catalog.reload()
+
+        def read_loop():
+            try:
+                while not stop.is_set():
+                    self.catalog.user_prescriptions("User_Gal")
+                    self.catalog.active_med_ids("User_Gal")
+                    self.catalog.interactions_between(["med_ritalin", "med_acamol"])
+                    self.catalog.find_medications("paracetamol")
+            except Exception as err:  # noqa: BLE001 - surfaced by the assertion below
+                errors.append(err)
+
+        # Switch threads often so readers get interrupted mid-iteration.
+        self.addCleanup(sys.setswitchinterval, sys.getswitchinterval())
+        sys.setswitchinterval(1e-6)
+        threads = [threading.Thread(target=refresh_loop)] + [threading.Thread(target=read_loop) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        time.sleep(0.5)
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(self.catalog.interactions_between(["med_ritalin", "med_acamol"])), 1)
+
+    def test_failed_reload_keeps_previous_maps(self):
+        loads = self.catalog.full_loads
+        broken = {**catalog._QUERIES, "interaction": "SELECT id FROM no_such_table"}
+        with mock.patch.dict(catalog._QUERIES, broken):
+            with self.assertRaises(sqlite3.OperationalError):
+                self.catalog.reload()
+
+        self.assertFalse(self.catalog._loaded)
+        self.assertEqual(self.catalog.full_loads, loads)
+        self.assertEqual(self.catalog.medications["med_acamol"]["name"], "Acamol")
+        self.catalog.ensure_fresh()
+        self.assertEqual(self.catalog.full_loads, loads + 1)
+
+    def test_chat_answers_with_tool_results(self):
+        chat_service.response_cache.clear()
+        script = [[("check_stock", {"medication": "Ritalin"}), ("find_medication", {"query": "Acamol"})]]
+        with FakeOpenAIServer(tokens=("20", " units"), script=script) as server:
+            chat_app = AsyncChatApp(create_app(), api_key="test", base_url=server.base_url, model="fake-model")
+
+            async def scenario():
+                try:
+                    return await _call(chat_app, payload={"message": "Is Ritalin in stock?"})
+                finally:
+                    await chat_app.aclose()
+
+            status, _headers, body = asyncio.run(scenario())
+
+        self.assertEqual(status, 200)
+        self.assertIn('{"token": "20"}', body)
+        self.assertEqual(len(server.requests), 2)
+        tool_messages = [m for m in server.requests[1]["messages"] if m["role"] == "tool"]
+        self.assertEqual([m["tool_call_id"] for m in tool_messages], ["call_0", "call_1"])
+        self.assertEqual(json.loads(tool_messages[0]["content"])["stock_quantity"], 20)
+        self.assertIsNone(chat_service.lookup_cached("Is Ritalin in stock?", "fake-model"))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,174 @@
+"""Tests for the ASGI chat app against a local fake OpenAI-compatible server."""
+
+import asyncio
+import json
+import threading
+import unittest
+from unittest import mock
+
+from app import create_app
+from app.async_chat import AsyncChatApp
+from app.services import chat_service
+from tests.fake_openai import FakeOpenAIServer
+
+
+async def _call(asgi_app, path="/chat", method="POST", payload=None):
+    """Drive one ASGI request and return (status, headers, body)."""
+
+    body = json.dumps(payload or {}).encode()
+    received = {"sent": False}
+    messages = []
+
+    async def receive():
+        if not received["sent"]:
+            received["sent"] = True
+            return {"type": "http.request", "body": body, "more_body": False}
+        await asyncio.sleep(3600)
+
+    async def send(message):
+        messages.append(message)
+
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": method,
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": b"",
+        "root_path": "",
+        "headers": [(b"content-type", b"application/json")],
+        "server": ("testserver", 80),
+        "client": ("127.0.0.1", 1234),
+    }
+    await asgi_app(scope, receive, send)
+
+    start = next(m for m in messages if m["type"] == "http.response.start")
+    chunks = b"".join(m.get("body", b"") for m in messages if m["type"] == "http.response.body")
+    return start["status"], dict(start["headers"]), chunks.decode()
+
+
+class AsyncChatTestCase(unittest.TestCase):
+    def setUp(self):
+        chat_service.response_cache.clear()
+
+    def _make_app(self, server, **config):
+        flask_app = create_app()
+        flask_app.config.update(config)
+        return AsyncChatApp(flask_app, api_key="test", base_url=server.base_url, model="fake-model")
+
+    def test_streams_tokens_as_sse(self):
+        with FakeOpenAIServer(tokens=("Acamol", " is", " paracetamol")) as server:
+            chat_app = self._make_app(server)
+
+            async def scenario():
+                try:
+                    return await _call(chat_app, payload={"message": "what is Acamol"})
+                finally:
+                    await chat_app.aclose()
+
+            status, headers, body = asyncio.run(scenario())
+
+        self.assertEqual(status, 200)
+        self.assertEqual(headers[b"content-type"], b"text/event-stream")
+        self.assertIn('data: {"token": "Acamol"}', body)
+        self.assertTrue(body.endswith("data: [DONE]\n\n"))
+        self.assertEqual(server.requests[0]["model"], "fake-model")
+        self.assertEqual(chat_app.stats()["completed_streams"], 1)
+
+    def test_repeated_question_served_from_cache(self):
+        with FakeOpenAIServer(tokens=("Acamol", " is", " paracetamol")) as server:
+            chat_app = self._make_app(server, CHAT_MAX_STREAMS=1)
+
+            async def scenario():
+                try:
+                    first = await _call(chat_app, payload={"message": "What is Acamol?"})
+                    second = await _call(chat_app, payload={"message": "what is  acamol"})
+                    return first, second
+                finally:
+                    await chat_app.aclose()
+
+            first, second = asyncio.run(scenario())
+
+        self.assertEqual(first[2], second[2])
+        self.assertEqual(len(server.requests), 1)
+        self.assertEqual(chat_app.stats()["cached_streams"], 1)
+
+    def test_session_and_cache_io_runs_off_the_event_loop(self):
+        threads = {}
+
+        def tracked(name, fn):
+            def call(*args):
+                threads.setdefault(name, set()).add(threading.get_ident())
+                return fn(*args)
+
+            return call
+
+        with FakeOpenAIServer(tokens=("Acamol", " is", " paracetamol")) as server:
+            chat_app = self._make_app(server)
+
+            async def scenario():
+                try:
+                    await _call(chat_app, payload={"message": "What is Acamol?", "session_id": ""})
+                    await _call(chat_app, payload={"message": "What is Acamol?"})
+                    return threading.get_ident()
+                finally:
+                    await chat_app.aclose()
+
+            with mock.patch.multiple(
+                chat_service,
+                open_session=tracked("open_session", chat_service.open_session),
+                lookup_cached=tracked("lookup_cached", chat_service.lookup_cached),
+                _record_turn=tracked("record", chat_service._record_turn),
+            ), mock.patch.object(
+                chat_service.response_cache, "get", tracked("cache_get", chat_service.response_cache.get)
+            ), mock.patch.object(
+                chat_service.response_cache, "put", tracked("cache_put", chat_service.response_cache.put)
+            ):
+                loop_thread = asyncio.run(scenario())
+
+        self.assertLessEqual({"open_session", "lookup_cached", "record", "cache_put"}, set(threads))
+        for name, idents in threads.items():
+            self.assertNotIn(loop_thread, idents, name)
+
+    def test_empty_message_rejected(self):
+        with FakeOpenAIServer() as server:
+            chat_app = self._make_app(server)
+            status, _headers, _body = asyncio.run(_call(chat_app, payload={"message": "  "}))
+
+        self.assertEqual(status, 400)
+        self.assertEqual(server.requests, [])
+
+    def test_concurrency_cap_rejects_overflow(self):
+        with FakeOpenAIServer(tokens=("a", "b", "c"), token_delay=0.1) as server:
+            chat_app = self._make_app(server, CHAT_MAX_STREAMS=1, CHAT_QUEUE_TIMEOUT=0.05)
+
+            async def scenario():
+                try:
+                    return await asyncio.gather(
+                        _call(chat_app, payload={"message": "one"}),
+                        _call(chat_app, payload={"message": "two"}),
+                    )
+                finally:
+                    await chat_app.aclose()
+
+            results = asyncio.run(scenario())
+
+        statuses = sorted(status for status, _headers, _body in results)
+        self.assertEqual(statuses, [200, 503])
+        rejected = next(headers for status, headers, _body in results if status == 503)
+        self.assertIn(b"retry-after", rejected)
+        self.assertEqual(server.max_active, 1)
+
+    def test_other_routes_served_by_flask(self):
+        with FakeOpenAIServer() as server:
+            chat_app = self._make_app(server)
+            status, _headers, body = asyncio.run(_call(chat_app, path="/api/health", method="GET"))
+
+        self.assertEqual(status, 200)
+        self.assertEqual(json.loads(body), {"status": "ok"})
+
+
+if __name__ == "__main__":
+    unittest.main()
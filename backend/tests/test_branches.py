@@ -0,0 +1,102 @@
+"""Tests for per-branch database sharding."""
+
+import json
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from app import create_app, db
+from app.services import inventory_service, pharmacy_service
+from data import init_db
+
+
+def _stock(med_id: str) -> int:
+    with db.connection() as conn:
+        return conn.execute("SELECT stock_quantity FROM medications WHERE id = ?;", (med_id,)).fetchone()[0]
+
+
+def _budget() -> float:
+    with db.connection() as conn:
+        return conn.execute("SELECT total_budget FROM pharmacy_financials WHERE id = 1;").fetchone()[0]
+
+
+class BranchShardingTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmpdir.cleanup)
+        init_db.initialize_database()
+        self.router = db.ShardRouter(branches=("north", "south"), default="main", directory=Path(self.tmpdir.name))
+        init_db.initialize_database(self.router.path("north"))
+        patch = mock.patch.object(db, "_router", self.router)
+        patch.start()
+        self.addCleanup(patch.stop)
+        self.addCleanup(self.router.close)
+        self.client = create_app().test_client()
+
+    def test_each_branch_writes_to_its_own_file(self):
+        with db.use_branch("north"):
+            pharmacy_service.process_restock("User_Manager", "med_acamol", 10)
+            north = (_stock("med_acamol"), _budget())
+
+        main = (_stock("med_acamol"), _budget())
+        self.assertEqual(north[0], main[0] + 10)
+        self.assertLess(north[1], main[1])
+        self.assertEqual(self.router.path("main"), db.DB_PATH)
+        self.assertNotEqual(self.router.pool("north").db_path, self.router.pool("main").db_path)
+
+    def test_routes_follow_the_branch_header(self):
+        resp = self.client.post(
+            "/api/pharmacies/restock",
+            json={"manager_id": "User_Manager", "med_id": "med_acamol", "qty": 5},
+            headers={"X-Branch": "north"},
+        )
+        self.assertEqual(resp.status_code, 200)
+
+        resp = self.client.get("/api/exports/ledger", query_string={"manager_id": "User_Manager", "branch": "north"})
+        self.assertEqual([json.loads(line)["kind"] for line in resp.get_data(as_text=True).splitlines()], ["restock"])
+        resp = self.client.get("/api/exports/ledger", query_string={"manager_id": "User_Manager"})
+        self.assertEqual(resp.get_data(as_text=True), "")
+
+        resp = self.client.get("/api/health", headers={"X-Branch": "west"})
+        self.assertEqual(resp.status_code, 400)
+
+    def test_chain_stock_fans_out_and_merges(self):
+        with db.use_branch("north"):
+            pharmacy_service.process_restock("User_Manager", "med_acamol", 7)
+
+        resp = self.client.get(
+            "/api/inventory/stock", query_string={"med_id": ["med_acamol", "med_ritalin"], "branch": "north"}
+        )
+        self.assertEqual(resp.status_code, 500)
+        self.assertIn("branch south does not exist", resp.get_json()["error"])
+
+        init_db.initialize_database(self.router.path("south"))
+        body = self.client.get("/api/inventory/stock", query_string={"med_id": "med_acamol"}).get_json()
+        acamol = body["stock"]["med_acamol"]
+        base = acamol["branches"]["main"]
+        self.assertEqual(body["branches"], ["main", "north", "south"])
+        self.assertEqual(acamol["branches"], {"main": base, "north": base + 7, "south": base})
+        self.assertEqual(acamol["total"], 3 * base + 7)
+
+    def test_fan_out_runs_each_branch_on_its_own_thread(self):
+        init_db.initialize_database(self.router.path("south"))
+        barrier = threading.Barrier(3, timeout=5)
+
+        def probe():
+            barrier.wait()
+            return db.current_branch(), threading.current_thread().name
+
+        results = db.fan_out(probe)
+        self.assertEqual({branch: seen for branch, (seen, _thread) in results.items()}, {
+            "main": "main", "north": "north", "south": "south"
+        })
+        self.assertEqual(len({thread for _branch, thread in results.values()}), 3)
+        with self.assertRaises(ValueError):
+            inventory_service.chain_stock([])
+        with self.assertRaises(ValueError):
+            db.fan_out(probe, branches=("west",))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,76 @@
+"""Tests for bulk import into a fresh database."""
+
+import json
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from pathlib import Path
+
+from data import init_db
+from data.synthetic import SyntheticDataset
+
+
+class BulkImportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.root = Path(self.tmpdir.name)
+        self.db_path = self.root / "bulk.db"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_synthetic_load_is_complete_and_migrated(self):
+        dataset = SyntheticDataset(users=50, medications=20, prescriptions=100, interactions=30)
+        progress = []
+
+        counts = init_db.bulk_load(
+            init_db.synthetic_source(dataset), db_path=self.db_path, batch_size=64, progress=lambda t, n: progress.append((t, n))
+        )
+
+        self.assertEqual(counts["prescription_items"], 200)
+        self.assertEqual(counts["interactions"], 30)
+        self.assertIn(("prescription_items", 128), progress)
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version;").fetchone()[0], init_db.SCHEMA_VERSION)
+            self.assertEqual(conn.execute("PRAGMA journal_mode;").fetchone()[0], "wal")
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM users;").fetchone()[0], 52)
+
+    def test_synthetic_dataset_is_deterministic(self):
+        first = list(SyntheticDataset(seed=3).prescription_item_rows())
+        second = list(SyntheticDataset(seed=3).prescription_item_rows())
+        self.assertEqual(first, second)
+
+    def test_csv_and_jsonl_files(self):
+        (self.root / "users.csv").write_text(
+            "id,name,role,created_at\nu1,Ann,customer,2024-01-01\nd1,Doc,doctor,2024-01-01\n"
+        )
+        (self.root / "medications.jsonl").write_text(
+            json.dumps(
+                {
+                    "id": "m1", "name": "Acamol", "active_ingredient": "Paracetamol", "category": "Analgesic",
+                    "dosage_instructions": "as needed", "stock_quantity": 5, "requires_prescription": 0,
+                    "retail_price": 10.0, "wholesale_price": 5.0,
+                }
+            )
+            + "\n"
+        )
+        (self.root / "prescriptions.csv").write_text("id,user_id,doctor_id,issued_date,is_active\nrx1,u1,d1,2024-01-01,1\n")
+
+        counts = init_db.bulk_load(init_db.file_source(self.root), db_path=self.db_path)
+
+        self.assertEqual(counts, {"users": 2, "medications": 1, "pharmacy_financials": 1, "prescriptions": 1})
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            self.assertEqual(conn.execute("SELECT debt FROM users WHERE id = 'u1';").fetchone()[0], 0.0)
+            self.assertEqual(conn.execute("SELECT stock_quantity FROM medications;").fetchone()[0], 5)
+
+    def test_foreign_key_violation_discards_partial_file(self):
+        (self.root / "prescriptions.csv").write_text("id,user_id,doctor_id,issued_date,is_active\nrx1,ghost,ghost,2024,1\n")
+
+        with self.assertRaises(ValueError):
+            init_db.bulk_load(init_db.file_source(self.root), db_path=self.db_path)
+        self.assertFalse(self.db_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
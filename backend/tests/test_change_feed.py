@@ -0,0 +1,228 @@
+"""Tests for the change feed: broker fan-out, publish-after-commit from services, and the SSE endpoints."""
+
+import asyncio
+import json
+import unittest
+from unittest import mock
+
+from werkzeug.test import EnvironBuilder
+
+from app import create_app, db
+from app.async_chat import AsyncChatApp
+from app.services import change_feed, pharmacy_service, prescription_service, user_service
+from data import init_db
+
+
+def _parse(chunk: str) -> list:
+    """``(event, data)`` pairs from SSE text, skipping comments."""
+
+    events = []
+    for block in chunk.split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines() if line and not line.startswith(":"))
+        if fields:
+            events.append((fields.get("event"), json.loads(fields["data"])))
+    return events
+
+
+def _drain(subscription) -> list:
+    events, dropped = subscription.drain()
+    return _parse(change_feed.render(events, dropped))
+
+
+class BrokerTestCase(unittest.TestCase):
+    def test_publish_reaches_only_matching_topics(self):
+        broker = change_feed.ChangeBroker()
+        med = broker.subscribe(frozenset({"med:M1"}))
+        user = broker.subscribe(frozenset({"user:U1", "med:M1"}))
+        other = broker.subscribe(frozenset({"user:U2"}))
+
+        broker.publish("stock", ("branch:main", "med:M1"), {"stock_quantity": 4})
+        broker.publish("debt", ("branch:main", "user:U1"), {"debt": 10})
+
+        self.assertEqual([event.type for event in med.drain()[0]], ["stock"])
+        self.assertEqual([event.type for event in user.drain()[0]], ["stock", "debt"])
+        self.assertEqual(other.drain(), ([], 0))
+
+        user.close()
+        self.assertEqual(broker.stats()["subscribers"], 2)
+        broker.publish("debt", ("user:U1",), {})
+        self.assertEqual(broker.stats()["delivered"], 3)
+
+    def test_slow_subscriber_drops_oldest_and_resyncs(self):
+        broker = change_feed.ChangeBroker(max_buffer=2)
+        subscription = broker.subscribe(frozenset({"med:M1"}))
+        for quantity in range(5):
+            broker.publish("stock", ("med:M1",), {"stock_quantity": quantity})
+
+        events = _drain(subscription)
+        self.assertEqual(events[0], ("resync", {"dropped": 3}))
+        self.assertEqual([data["stock_quantity"] for _type, data in events[1:]], [3, 4])
+
+    def test_last_event_id_replays_missed_events(self):
+        broker = change_feed.ChangeBroker(history=3)
+        for quantity in range(5):
+            broker.publish("stock", ("med:M1",), {"stock_quantity": quantity})
+
+        resumed = broker.subscribe(frozenset({"med:M1"}), last_event_id="3")
+        self.assertEqual([event.id for event in resumed.drain()[0]], [4, 5])
+
+        too_old = broker.subscribe(frozenset({"med:M1"}), last_event_id="1")
+        events, dropped = too_old.drain()
+        self.assertEqual(([event.id for event in events], dropped), ([3, 4, 5], 1))
+
+        with self.assertRaises(ValueError):
+            broker.subscribe(frozenset({"med:M1"}), last_event_id="latest")
+
+    def test_subscriber_limit_and_topic_validation(self):
+        broker = change_feed.ChangeBroker(max_subscribers=1)
+        broker.subscribe(frozenset({"med:M1"}))
+        with self.assertRaises(change_feed.FeedFull):
+            broker.subscribe(frozenset({"med:M1"}))
+
+        self.assertEqual(change_feed.parse_topics(["med:M1,user:U1", "branch:main"]), {"med:M1", "user:U1", "branch:main"})
+        for bad in ([], ["stock:M1"], ["med:"], ["branch:nowhere"]):
+            with self.assertRaises(ValueError):
+                change_feed.parse_topics(bad)
+
+
+class PublishOnCommitTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        db.reset_pool()
+        self.addCleanup(db.reset_pool)
+
+    def subscribe(self, *topics):
+        subscription = change_feed.broker.subscribe(frozenset(topics))
+        self.addCleanup(subscription.close)
+        return subscription
+
+    def assert_fulfillment_events(self, write_mode):
+        subscription = self.subscribe("user:User_Gal", "med:med_ritalin")
+        with mock.patch.object(db, "SINGLE_WRITER", write_mode):
+            prescription_service.fulfill_prescription("User_Gal", "med_ritalin", 2)
+            with self.assertRaises(ValueError):
+                prescription_service.fulfill_prescription("User_Gal", "med_ritalin", 5)
+
+        events = _drain(subscription)
+        self.assertEqual([event_type for event_type, _data in events], ["stock", "prescription"])
+        stock, prescription = (data for _type, data in events)
+        self.assertEqual(stock["branch"], "main")
+        with db.connection() as conn:
+            current = conn.execute("SELECT stock_quantity FROM medications WHERE id = 'med_ritalin';").fetchone()[0]
+        self.assertEqual(stock["stock_quantity"], current)
+        self.assertEqual((prescription["remaining_periods"], prescription["is_active"]), (1, True))
+
+    def test_fulfillment_publishes_after_commit_only(self):
+        self.assert_fulfillment_events(False)
+
+    def test_fulfillment_publishes_through_write_queue(self):
+        self.assert_fulfillment_events(True)
+
+    def test_transaction_and_restock_publish_debt_budget_and_stock(self):
+        budget = self.subscribe("branch:main")
+        user = self.subscribe("user:User_Gal")
+
+        user_service.process_transaction("User_Gal", 25.0)
+        pharmacy_service.process_restock("User_Manager", "med_acamol", 3)
+        with self.assertRaises(ValueError):
+            user_service.process_transaction("nobody", 1.0)
+
+        self.assertEqual([event_type for event_type, _data in _drain(user)], ["debt"])
+        events = _drain(budget)
+        self.assertEqual([event_type for event_type, _data in events], ["debt", "budget", "stock", "budget"])
+        self.assertEqual(events[1][1]["budget_delta"], 25.0)
+        self.assertEqual((events[3][1]["kind"], events[2][1]["med_id"]), ("restock", "med_acamol"))
+
+
+class EventsEndpointTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        self.app = create_app()
+
+    def test_sse_stream_delivers_committed_changes(self):
+        client = self.app.test_client()
+        resp = client.get("/api/events", query_string={"topic": "med:med_ritalin"})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.mimetype, "text/event-stream")
+
+        chunks = resp.response
+        self.assertEqual(next(chunks), change_feed.HEARTBEAT.encode())
+        prescription_service.fulfill_prescription("User_Gal", "med_ritalin", 1)
+        events = _parse(next(chunks).decode())
+        self.assertEqual([event_type for event_type, _data in events], ["stock", "prescription"])
+
+        subscribers = change_feed.broker.stats()["subscribers"]
+        resp.close()
+        self.assertEqual(change_feed.broker.stats()["subscribers"], subscribers - 1)
+
+    def test_closing_unstarted_stream_unsubscribes(self):
+        # Called as a bare WSGI app: the test client would start the body to read the status line.
+        environ = EnvironBuilder(path="/api/events", query_string={"topic": "branch:main", "user_id": "User_Manager"}).get_environ()
+        body = self.app(environ, lambda status, headers, exc_info=None: None)
+        self.assertEqual(change_feed.broker.stats()["subscribers"], 1)
+        body.close()
+        self.assertEqual(change_feed.broker.stats()["subscribers"], 0)
+
+    def test_invalid_topics_are_rejected(self):
+        client = self.app.test_client()
+        self.assertEqual(client.get("/api/events").status_code, 400)
+        self.assertEqual(client.get("/api/events", query_string={"topic": "branch:nowhere"}).status_code, 400)
+
+    def test_user_and_branch_topics_need_their_user_or_a_manager(self):
+        client = self.app.test_client()
+
+        def status(topic, user_id=None):
+            query = {"topic": topic} if user_id is None else {"topic": topic, "user_id": user_id}
+            with client.get("/api/events", query_string=query) as resp:
+                return resp.status_code
+
+        self.assertEqual(status("user:User_Gal"), 400)
+        self.assertEqual(status("branch:main", "User_Gal"), 400)
+        self.assertEqual(status("user:User_Manager", "User_Gal"), 400)
+        self.assertEqual(status("user:User_Gal", "nobody"), 400)
+        self.assertEqual(status("user:User_Gal,med:med_acamol", "User_Gal"), 200)
+        self.assertEqual(status("branch:main", "User_Manager"), 200)
+        self.assertEqual(status("user:User_Gal", "User_Manager"), 200)
+        self.assertEqual(change_feed.broker.stats()["subscribers"], 0)
+
+    def test_asgi_stream_wakes_on_publish(self):
+        asgi = AsyncChatApp(self.app, api_key="test", model="test")
+        messages = []
+        disconnect = asyncio.Event()
+
+        async def receive():
+            await disconnect.wait()
+            return {"type": "http.disconnect"}
+
+        async def send(message):
+            messages.append(message)
+            if b"event: debt" in message.get("body", b""):
+                disconnect.set()
+
+        scope = {
+            "type": "http",
+            "method": "GET",
+            "path": "/api/events",
+            "query_string": b"topic=user:User_Gal&user_id=User_Gal",
+            "headers": [],
+        }
+
+        async def run():
+            task = asyncio.ensure_future(asgi(scope, receive, send))
+            await asyncio.sleep(0.05)
+            await asyncio.to_thread(user_service.process_transaction, "User_Gal", 5.0)
+            await asyncio.wait_for(task, 2)
+
+        asyncio.run(run())
+        self.assertEqual(messages[0]["status"], 200)
+        body = b"".join(message.get("body", b"") for message in messages[1:]).decode()
+        self.assertEqual([event_type for event_type, _data in _parse(body)], ["debt"])
+
+        messages.clear()
+        asyncio.run(asgi({**scope, "query_string": b"topic=branch:main&user_id=User_Gal"}, receive, send))
+        self.assertEqual(messages[0]["status"], 400)
+        self.assertEqual(change_feed.broker.stats()["subscribers"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
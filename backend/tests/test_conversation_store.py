@@ -0,0 +1,122 @@
+"""Tests for token-budgeted chat sessions."""
+
+import asyncio
+import json
+import tempfile
+import unittest
+from pathlib import Path
+
+from app import create_app
+from app.async_chat import AsyncChatApp
+from app.services import chat_service
+from app.services.conversation_store import ConversationStore
+from tests.fake_openai import FakeOpenAIServer
+from tests.test_async_chat import _call
+
+
+def _session_id(body: str) -> str:
+    first = body.split("\n\n", 1)[0]
+    return json.loads(first[len("data: "):])["session_id"]
+
+
+class ConversationStoreTestCase(unittest.TestCase):
+    def test_history_stays_within_budget(self):
+        store = ConversationStore(history_tokens=200, summary_tokens=60)
+        conversation = store.create()
+        for turn in range(50):
+            store.record(conversation.id, f"question {turn} " + "x" * 80, f"answer {turn} " + "y" * 120)
+            history = store.get(conversation.id)
+            self.assertLessEqual(history.history_tokens, 200)
+
+        self.assertEqual(history.turns[-1][0], "assistant")
+        self.assertIn("answer 49", history.turns[-1][1])
+        self.assertTrue(history.summary)
+        self.assertNotIn("question 0 ", " ".join(history.summary))
+        self.assertGreater(store.stats()["compactions"], 0)
+
+    def test_compaction_keeps_prefix_stable_between_compactions(self):
+        store = ConversationStore(history_tokens=200, summary_tokens=200)
+        conversation = store.create()
+        prefixes = []
+        for turn in range(12):
+            store.record(conversation.id, f"q{turn} " + "x" * 120, f"a{turn} " + "y" * 120)
+            prefixes.append(tuple(store.get(conversation.id).summary))
+
+        # Compacting to half the budget means most turns leave the summary untouched.
+        changes = sum(1 for before, after in zip(prefixes, prefixes[1:]) if before != after)
+        self.assertLess(changes, len(prefixes) // 2)
+
+    def test_long_messages_are_truncated(self):
+        store = ConversationStore(history_tokens=100)
+        conversation = store.create()
+        store.record(conversation.id, "z" * 10_000, "ok")
+        user_turn = store.get(conversation.id).turns[0]
+        self.assertLess(len(user_turn[1]), 200)
+        self.assertTrue(user_turn[1].endswith("[...]"))
+
+    def test_lru_eviction_and_unknown_ids(self):
+        store = ConversationStore(max_sessions=2)
+        first, second, third = store.create(), store.create(), store.create()
+        self.assertIsNone(store.get(first.id))
+        self.assertIsNotNone(store.get(third.id))
+        self.assertNotEqual(store.open("missing").id, "missing")
+        self.assertIsNone(store.get(second.id))
+        self.assertEqual(store.stats()["evictions"], 2)
+
+    def test_sessions_survive_restart_with_sqlite_path(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "sessions.db"
+            store = ConversationStore(path=path)
+            conversation = store.create()
+            store.record(conversation.id, "What is Acamol?", "Paracetamol.")
+
+            reopened = ConversationStore(path=path).get(conversation.id)
+            self.assertEqual([turn[1] for turn in reopened.turns], ["What is Acamol?", "Paracetamol."])
+
+
+class ChatSessionTestCase(unittest.TestCase):
+    def setUp(self):
+        chat_service.response_cache.clear()
+        chat_service.conversations.clear()
+
+    def test_follow_up_sends_history_after_system_prompt(self):
+        with FakeOpenAIServer(tokens=("Paracetamol",)) as server:
+            chat_app = AsyncChatApp(create_app(), api_key="test", base_url=server.base_url, model="fake-model")
+
+            async def scenario():
+                try:
+                    first = await _call(chat_app, payload={"message": "What is Acamol?", "session_id": ""})
+                    session_id = _session_id(first[2])
+                    second = await _call(chat_app, payload={"message": "Dose?", "session_id": session_id})
+                    return session_id, second
+                finally:
+                    await chat_app.aclose()
+
+            session_id, second = asyncio.run(scenario())
+
+        self.assertEqual(_session_id(second[2]), session_id)
+        first_messages, second_messages = (request["messages"] for request in server.requests)
+        self.assertEqual(second_messages[0], first_messages[0])
+        self.assertEqual(
+            [message["content"] for message in second_messages[1:]],
+            ["What is Acamol?", "Paracetamol", "Dose?"],
+        )
+
+    def test_requests_without_session_stay_stateless(self):
+        with FakeOpenAIServer(tokens=("Hi",)) as server:
+            chat_app = AsyncChatApp(create_app(), api_key="test", base_url=server.base_url, model="fake-model")
+
+            async def scenario():
+                try:
+                    return await _call(chat_app, payload={"message": "hello"})
+                finally:
+                    await chat_app.aclose()
+
+            _status, _headers, body = asyncio.run(scenario())
+
+        self.assertNotIn("session_id", body)
+        self.assertEqual(chat_service.conversations.stats()["sessions"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
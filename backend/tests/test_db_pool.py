@@ -0,0 +1,92 @@
+"""Tests for the shared SQLite connection pool."""
+
+import sqlite3
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from app.db import ConnectionPool, PoolTimeout
+
+
+class ConnectionPoolTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "pool.db"
+        self.pool = ConnectionPool(self.db_path, max_size=2, timeout=0.2)
+
+    def tearDown(self):
+        self.pool.close()
+        self.tmpdir.cleanup()
+
+    def test_pragmas_applied_once_per_connection(self):
+        opened = []
+        self.pool.add_connect_hook(opened.append)
+
+        for _ in range(5):
+            with self.pool.connection() as conn:
+                self.assertEqual(conn.execute("PRAGMA journal_mode;").fetchone()[0], "wal")
+                self.assertEqual(conn.execute("PRAGMA foreign_keys;").fetchone()[0], 1)
+
+        self.assertEqual(len(opened), 1)
+        stats = self.pool.stats()
+        self.assertEqual(stats["checkouts"], 5)
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["size"], 1)
+
+    def test_exhausted_pool_times_out(self):
+        first = self.pool.acquire()
+        second = self.pool.acquire()
+        with self.assertRaises(PoolTimeout):
+            self.pool.acquire()
+        self.assertEqual(self.pool.stats()["waits"], 1)
+        self.pool.release(first)
+        self.pool.release(second)
+
+    def test_waiter_receives_released_connection(self):
+        held = [self.pool.acquire(), self.pool.acquire()]
+        got = []
+
+        def worker():
+            with self.pool.connection() as conn:
+                got.append(conn)
+
+        thread = threading.Thread(target=worker)
+        thread.start()
+        self.pool.release(held.pop())
+        thread.join(1)
+
+        self.assertEqual(len(got), 1)
+        self.pool.release(held.pop())
+
+    def test_uncommitted_work_rolled_back_on_release(self):
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("CREATE TABLE t (v INTEGER);")
+            conn.execute("INSERT INTO t VALUES (1);")
+
+        with self.pool.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM t;").fetchone()[0], 0)
+
+    def test_replaced_database_file_discards_idle_connection(self):
+        with self.pool.connection() as conn:
+            with conn:
+                conn.execute("CREATE TABLE old_schema (v INTEGER);")
+
+        for suffix in ("", "-wal", "-shm"):
+            path = Path(str(self.db_path) + suffix)
+            if path.exists():
+                path.unlink()
+        fresh = sqlite3.connect(self.db_path)
+        fresh.execute("CREATE TABLE new_schema (v INTEGER);")
+        fresh.commit()
+        fresh.close()
+
+        with self.pool.connection() as conn:
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master;")}
+        self.assertEqual(tables, {"new_schema"})
+        self.assertEqual(self.pool.stats()["discarded"], 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
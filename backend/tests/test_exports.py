@@ -0,0 +1,71 @@
+"""Tests for the streaming NDJSON/CSV exports."""
+
+import csv
+import io
+import json
+import unittest
+
+from app import create_app, db
+from app.services import export_service, user_service
+from data import init_db
+
+
+class ExportTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        self.client = create_app().test_client()
+
+    def test_ndjson_export_streams_every_row(self):
+        resp = self.client.get("/api/exports/prescription_items", query_string={"manager_id": "User_Manager"})
+
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.is_streamed)
+        self.assertEqual(resp.mimetype, "application/x-ndjson")
+        rows = [json.loads(line) for line in resp.get_data(as_text=True).splitlines()]
+        self.assertEqual(rows, [
+            {
+                "id": "rx_item_user_gal_ritalin",
+                "prescription_id": "rx_user_gal_001",
+                "med_id": "med_ritalin",
+                "initial_periods": 3,
+                "remaining_periods": 3,
+            }
+        ])
+
+    def test_csv_export_has_header_and_ledger_rows(self):
+        for amount in (10.0, 20.0, 30.0):
+            user_service.process_transaction("User_Gal", amount)
+
+        resp = self.client.get("/api/exports/ledger", query_string={"manager_id": "User_Manager", "format": "csv"})
+
+        self.assertEqual(resp.mimetype, "text/csv")
+        self.assertIn('filename="ledger.csv"', resp.headers["Content-Disposition"])
+        rows = list(csv.DictReader(io.StringIO(resp.get_data(as_text=True))))
+        self.assertEqual([float(row["revenue_delta"]) for row in rows], [10.0, 20.0, 30.0])
+
+    def test_export_reads_one_snapshot_in_chunks(self):
+        for _ in range(5):
+            user_service.process_transaction("User_Gal", 1.0)
+
+        chunks = export_service.stream_export("ledger", "ndjson", chunk_rows=2)
+        first = next(chunks)
+        for _ in range(5):
+            user_service.process_transaction("User_Gal", 1.0)
+        rest = list(chunks)
+
+        self.assertEqual(first.count("\n"), 2)
+        self.assertEqual([chunk.count("\n") for chunk in rest], [2, 1])
+        with db.connection() as conn:
+            self.assertEqual(conn.execute("SELECT COUNT(*) FROM financial_ledger;").fetchone()[0], 10)
+
+    def test_rejects_unknown_exports_and_non_managers(self):
+        resp = self.client.get("/api/exports/users", query_string={"manager_id": "User_Manager"})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get("/api/exports/debts", query_string={"manager_id": "User_Gal"})
+        self.assertEqual(resp.status_code, 400)
+        resp = self.client.get("/api/exports/debts", query_string={"manager_id": "User_Manager", "format": "xml"})
+        self.assertEqual(resp.status_code, 400)
+
+
+if __name__ == "__main__":
+    unittest.main()
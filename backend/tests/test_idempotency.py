@@ -0,0 +1,141 @@
+"""Tests for idempotency keys on mutating endpoints."""
+
+import sqlite3
+import tempfile
+import threading
+import time
+import unittest
+from contextlib import closing
+from pathlib import Path
+
+from app import create_app, db
+from app.services.idempotency_store import IdempotencyConflict, IdempotencyInProgress, IdempotencyStore
+from app.services.idempotency_store import store as shared_store
+from data import init_db
+
+
+class IdempotencyStoreTestCase(unittest.TestCase):
+    def setUp(self):
+        self.calls = 0
+
+    def _ok(self):
+        self.calls += 1
+        return 200, f'{{"call": {self.calls}}}'
+
+    def test_runs_once_and_replays(self):
+        store = IdempotencyStore()
+        self.assertEqual(store.execute("k", "body", self._ok), (200, '{"call": 1}', False))
+        self.assertEqual(store.execute("k", "body", self._ok), (200, '{"call": 1}', True))
+        self.assertEqual(self.calls, 1)
+        with self.assertRaises(IdempotencyConflict):
+            store.execute("k", "other body", self._ok)
+
+    def test_server_errors_and_exceptions_are_not_recorded(self):
+        store = IdempotencyStore()
+        store.execute("k", "body", lambda: (500, "{}"))
+
+        def boom():
+            raise sqlite3.OperationalError("database is locked")
+
+        with self.assertRaises(sqlite3.OperationalError):
+            store.execute("k", "body", boom)
+        self.assertEqual(store.execute("k", "body", self._ok)[2], False)
+        self.assertEqual(self.calls, 1)
+
+    def test_expiry_and_eviction(self):
+        store = IdempotencyStore(max_entries=2, ttl=0.05)
+        for key in ("a", "b", "c"):
+            store.execute(key, "body", self._ok)
+        self.assertEqual(store.stats()["evictions"], 1)
+        self.assertFalse(store.execute("a", "body", self._ok)[2])
+        time.sleep(0.06)
+        self.assertFalse(store.execute("c", "body", self._ok)[2])
+        self.assertEqual(self.calls, 5)
+
+    def test_concurrent_retries_wait_for_the_original(self):
+        store = IdempotencyStore()
+        started, release = threading.Event(), threading.Event()
+
+        def slow():
+            started.set()
+            release.wait(5)
+            return self._ok()
+
+        results = []
+        first = threading.Thread(target=lambda: results.append(store.execute("k", "body", slow)))
+        first.start()
+        started.wait(5)
+        retries = [threading.Thread(target=lambda: results.append(store.execute("k", "body", slow))) for _ in range(3)]
+        for thread in retries:
+            thread.start()
+        while store.stats()["coalesced"] < 3:
+            time.sleep(0.001)
+        release.set()
+        for thread in (first, *retries):
+            thread.join(5)
+
+        self.assertEqual(self.calls, 1)
+        self.assertEqual(sorted(replayed for _status, _body, replayed in results), [False, True, True, True])
+        self.assertEqual({body for _status, body, _replayed in results}, {'{"call": 1}'})
+
+    def test_sqlite_tier_is_shared_between_stores(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "idempotency.db"
+            first, second = IdempotencyStore(path=path), IdempotencyStore(path=path, wait_timeout=0.05)
+
+            first.execute("k", "body", self._ok)
+            self.assertEqual(second.execute("k", "body", self._ok), (200, '{"call": 1}', True))
+            self.assertEqual(second.stats()["disk_replays"], 1)
+
+            # A claim held by another process makes this one wait, then give up.
+            with closing(sqlite3.connect(path)) as conn:
+                with conn:
+                    conn.execute(
+                        "INSERT INTO idempotency_keys (key, fingerprint, stored_at) VALUES ('busy', 'body', ?);",
+                        (time.time(),),
+                    )
+            with self.assertRaises(IdempotencyInProgress):
+                second.execute("busy", "body", self._ok)
+            self.assertEqual(self.calls, 1)
+
+
+class IdempotentRoutesTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        shared_store.clear()
+        self.client = create_app().test_client()
+
+    def _debt(self) -> float:
+        with db.connection() as conn:
+            return conn.execute("SELECT debt FROM users WHERE id = 'User_Gal';").fetchone()[0]
+
+    def test_retried_transaction_charges_once(self):
+        before = self._debt()
+        headers = {"Idempotency-Key": "txn-1"}
+        body = {"user_id": "User_Gal", "amount": 25}
+
+        first = self.client.post("/api/users/transaction", json=body, headers=headers)
+        retry = self.client.post("/api/users/transaction", json=body, headers=headers)
+
+        self.assertEqual(first.get_json(), retry.get_json())
+        self.assertNotIn("Idempotent-Replayed", first.headers)
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+        self.assertEqual(self._debt(), before + 25)
+
+        conflict = self.client.post("/api/users/transaction", json={**body, "amount": 30}, headers=headers)
+        self.assertEqual(conflict.status_code, 422)
+        self.client.post("/api/users/transaction", json=body)
+        self.assertEqual(self._debt(), before + 50)
+
+    def test_rejections_are_replayed_too(self):
+        headers = {"Idempotency-Key": "restock-1"}
+        body = {"manager_id": "User_Gal", "med_id": "med_acamol", "qty": 5}
+
+        first = self.client.post("/api/pharmacies/restock", json=body, headers=headers)
+        retry = self.client.post("/api/pharmacies/restock", json=body, headers=headers)
+        self.assertEqual((first.status_code, retry.status_code), (400, 400))
+        self.assertEqual(retry.headers["Idempotent-Replayed"], "true")
+
+
+if __name__ == "__main__":
+    unittest.main()
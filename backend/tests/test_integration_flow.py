@@ -3,6 +3,7 @@
 import contextlib
 import sqlite3
 import sys
+import threading
 import unittest
 from pathlib import Path
 
@@ -11,7 +12,7 @@ if str(ROOT_DIR) not in sys.path:
     sys.path.insert(0, str(ROOT_DIR))
 
 from backend.data import init_db
-from backend.app.services import pharmacy_service, prescription_service, user_service
+from backend.app.services import checkout_service, pharmacy_service, prescription_service, user_service
 
 DB_PATH = ROOT_DIR / "backend" / "data" / "pharmacy.db"
 
@@ -147,6 +148,134 @@ class IntegrationTestCase(unittest.TestCase):
         with self.assertRaises(ValueError):
             prescription_service.fulfill_prescription(user_id, med_id, 1)
 
+    def test_failed_fulfillment_rolls_back_periods(self):
+        user_id = "User_Gal"
+        med_id = "med_ritalin"
+
+        _exec("UPDATE medications SET stock_quantity = 1 WHERE id = ?;", (med_id,))
+
+        with self.assertRaises(ValueError):
+            prescription_service.fulfill_prescription(user_id, med_id, 2)
+
+        remaining = _query_single_value(
+            "SELECT remaining_periods FROM prescription_items WHERE id = ?;",
+            ("rx_item_user_gal_ritalin",),
+        )
+        self.assertEqual(remaining, 3)
+
+    def test_concurrent_fulfillment_never_over_dispenses(self):
+        user_id = "User_Gal"
+        med_id = "med_ritalin"
+        outcomes = []
+
+        def worker():
+            try:
+                prescription_service.fulfill_prescription(user_id, med_id, 1)
+                outcomes.append("ok")
+            except ValueError:
+                outcomes.append("rejected")
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        remaining = _query_single_value(
+            "SELECT remaining_periods FROM prescription_items WHERE id = ?;",
+            ("rx_item_user_gal_ritalin",),
+        )
+        self.assertEqual(outcomes.count("ok"), 3)
+        self.assertEqual(remaining, 0)
+
+    def test_atomic_batch_rejects_whole_basket(self):
+        lines = [("User_Gal", "med_ritalin", 2), ("User_Gal", "med_acamol", 1)]
+
+        results = prescription_service.fulfill_batch(lines, "atomic")
+
+        self.assertEqual([r["status"] for r in results], ["not_applied", "rejected"])
+        remaining = _query_single_value(
+            "SELECT remaining_periods FROM prescription_items WHERE id = ?;",
+            ("rx_item_user_gal_ritalin",),
+        )
+        self.assertEqual(remaining, 3)
+
+    def test_independent_batch_applies_valid_lines(self):
+        lines = [
+            ("User_Gal", "med_ritalin", 2),
+            ("User_Gal", "med_acamol", 1),
+            ("User_Gal", "med_ritalin", 2),
+        ]
+
+        results = prescription_service.fulfill_batch(lines, "independent")
+
+        self.assertEqual([r["status"] for r in results], ["fulfilled", "rejected", "rejected"])
+        remaining = _query_single_value(
+            "SELECT remaining_periods FROM prescription_items WHERE id = ?;",
+            ("rx_item_user_gal_ritalin",),
+        )
+        stock = _query_single_value(
+            "SELECT stock_quantity FROM medications WHERE id = ?;", ("med_ritalin",)
+        )
+        self.assertEqual(remaining, 1)
+        self.assertEqual(stock, 18)
+
+    def test_batch_draws_from_each_prescription_for_a_medication(self):
+        _exec(
+            "INSERT INTO prescriptions (id, user_id, doctor_id, issued_date, is_active) VALUES (?, ?, ?, ?, 1);",
+            ("rx_user_gal_002", "User_Gal", "Dr_Smith", "2024-01-01"),
+        )
+        _exec(
+            """
+            INSERT INTO prescription_items (id, prescription_id, med_id, initial_periods, remaining_periods)
+            VALUES (?, ?, ?, 2, 2);
+            """,
+            ("rx_item_user_gal_ritalin_2", "rx_user_gal_002", "med_ritalin"),
+        )
+        lines = [("User_Gal", "med_ritalin", 3), ("User_Gal", "med_ritalin", 2)]
+
+        results = prescription_service.fulfill_batch(lines, "atomic")
+
+        self.assertEqual([r["status"] for r in results], ["fulfilled", "fulfilled"])
+        self.assertEqual(
+            [r["item_id"] for r in results], ["rx_item_user_gal_ritalin", "rx_item_user_gal_ritalin_2"]
+        )
+        self.assertEqual(
+            prescription_service.fulfill_batch([("User_Gal", "med_ritalin", 1)], "atomic")[0]["error"],
+            "No active prescription found for this medication",
+        )
+
+    def test_checkout_prices_and_charges_in_one_step(self):
+        budget_initial = _query_single_value("SELECT total_budget FROM pharmacy_financials WHERE id = 1;", ())
+
+        sale = checkout_service.checkout("User_Gal", "med_ritalin", 2)
+        otc_sale = checkout_service.checkout("User_Gal", "med_acamol", 3)
+
+        self.assertEqual(sale["item_id"], "rx_item_user_gal_ritalin")
+        self.assertEqual(sale["amount"], 100.0)
+        self.assertIsNone(otc_sale["item_id"])
+        self.assertEqual(otc_sale["amount"], 30.0)
+        self.assertEqual(_query_single_value("SELECT debt FROM users WHERE id = ?;", ("User_Gal",)), 130.0)
+        self.assertEqual(
+            _query_single_value("SELECT remaining_periods FROM prescription_items WHERE id = ?;", ("rx_item_user_gal_ritalin",)),
+            1,
+        )
+        self.assertEqual(_query_single_value("SELECT stock_quantity FROM medications WHERE id = ?;", ("med_acamol",)), 7)
+        self.assertEqual(
+            _query_single_value("SELECT total_budget FROM pharmacy_financials WHERE id = 1;", ()),
+            budget_initial + 130.0,
+        )
+
+    def test_failed_checkout_charges_nothing(self):
+        with self.assertRaises(ValueError):
+            checkout_service.checkout("User_Gal", "med_acamol", 11)
+        with self.assertRaises(ValueError):
+            checkout_service.checkout("User_Gal", "med_ritalin", 4)
+
+        self.assertEqual(_query_single_value("SELECT debt FROM users WHERE id = ?;", ("User_Gal",)), 0.0)
+        self.assertEqual(_query_single_value("SELECT stock_quantity FROM medications WHERE id = ?;", ("med_acamol",)), 10)
+        self.assertEqual(_query_single_value("SELECT COUNT(*) FROM financial_ledger;", ()), 0)
+
     def test_unauthorized_restock(self):
         # Use non-manager user
         with self.assertRaises(PermissionError):
@@ -0,0 +1,94 @@
+"""Tests for the interaction pair index and interaction service."""
+
+import unittest
+
+from app import create_app, db
+from app.services import interaction_service
+from app.services.catalog import get_catalog
+from app.services.interaction_index import InteractionIndex
+from data import init_db
+
+
+def _row(interaction_id, first, second, severity):
+    return {
+        "id": interaction_id,
+        "med_1_id": first,
+        "med_2_id": second,
+        "severity": severity,
+        "description": f"{first} + {second}",
+    }
+
+
+class InteractionIndexTestCase(unittest.TestCase):
+    def setUp(self):
+        self.index = InteractionIndex()
+        self.index.add(_row("i1", "a", "b", "minor"))
+        self.index.add(_row("i2", "c", "a", "Contraindicated"))
+        self.index.add(_row("i3", "b", "c", "moderate"))
+        self.index.add(_row("i4", "d", "e", "major"))
+
+    def test_pairs_are_symmetric_and_sorted_by_severity(self):
+        found = self.index.between(["c", "b", "a"])
+        self.assertEqual([entry["id"] for entry in found], ["i2", "i3", "i1"])
+
+    def test_candidate_against_current_meds(self):
+        found = self.index.with_candidate(["b", "d"], "a")
+        self.assertEqual([entry["id"] for entry in found], ["i1"])
+        self.assertEqual(self.index.with_candidate(["a"], "zzz"), [])
+
+    def test_remove(self):
+        self.index.remove("i2")
+        self.assertEqual([entry["id"] for entry in self.index.between(["a", "c"])], [])
+        self.assertEqual(len(self.index), 3)
+
+    def test_large_catalog(self):
+        index = InteractionIndex()
+        for n in range(20_000):
+            index.add(_row(f"x{n}", f"m{n % 5000}", f"m{(n * 7 + 1) % 5000}", "moderate"))
+        found = index.between([f"m{n}" for n in range(0, 50)])
+        self.assertTrue(all(entry["severity_rank"] == 2 for entry in found))
+
+
+class InteractionServiceTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        with db.connection() as conn:
+            with conn:
+                conn.execute(
+                    """
+                    INSERT INTO interactions (id, med_1_id, med_2_id, severity, description)
+                    VALUES ('int_1', 'med_acamol', 'med_ritalin', 'major', 'Test interaction');
+                    """
+                )
+        catalog = get_catalog()
+        catalog.refresh_interval = 0
+        catalog.reload()
+
+    def test_check_basket(self):
+        found = interaction_service.check_basket(["med_ritalin", "med_acamol"])
+        self.assertEqual([entry["id"] for entry in found], ["int_1"])
+
+    def test_check_basket_unknown_med(self):
+        with self.assertRaises(ValueError):
+            interaction_service.check_basket(["med_acamol", "med_ghost"])
+
+    def test_non_string_ids_are_rejected(self):
+        for med_ids in (["med_acamol", 7], [["med_acamol"]], [{"id": "med_acamol"}]):
+            with self.assertRaises(ValueError):
+                interaction_service.check_basket(med_ids)
+        with self.assertRaises(ValueError):
+            interaction_service.check_patient(["User_Gal"], "med_acamol")
+
+        client = create_app().test_client()
+        resp = client.post("/api/interactions/check", json={"med_ids": ["med_acamol", {"id": 1}]})
+        self.assertEqual(resp.status_code, 400)
+        self.assertIn("strings", resp.get_json()["error"])
+
+    def test_check_patient_against_active_prescriptions(self):
+        found = interaction_service.check_patient("User_Gal", "med_acamol")
+        self.assertEqual(found[0]["severity"], "major")
+        self.assertEqual(interaction_service.check_patient("User_Manager", "med_acamol"), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,167 @@
+"""Tests for consumption tracking and the budget-constrained restock planner."""
+
+import time
+import unittest
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+
+from app import db
+from app.services import change_feed, inventory_service, ledger_service, prescription_service
+from data import init_db
+
+
+def _exec(query: str, params: tuple = ()) -> None:
+    with db.connection() as conn:
+        with conn:
+            conn.execute(query, params)
+
+
+def _today():
+    # SQLite's date('now') is UTC.
+    return datetime.now(timezone.utc).date()
+
+
+def _stock(med_id: str) -> int:
+    with db.connection() as conn:
+        return conn.execute("SELECT stock_quantity FROM medications WHERE id = ?;", (med_id,)).fetchone()[0]
+
+
+def _empty_shelves() -> None:
+    _exec("UPDATE medications SET stock_quantity = 0;")
+    _exec("DELETE FROM medication_consumption;")
+
+
+def _record_daily_demand(med_id: str, per_day: int, days: int = 28) -> None:
+    with db.connection() as conn:
+        with conn:
+            conn.executemany(
+                "INSERT INTO medication_consumption (med_id, day, quantity) VALUES (?, ?, ?);",
+                [(med_id, (_today() - timedelta(days=n)).isoformat(), per_day) for n in range(days)],
+            )
+
+
+class InventoryTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+
+    def test_fulfillments_are_recorded_as_consumption(self):
+        prescription_service.fulfill_prescription("User_Gal", "med_ritalin", 2)
+        prescription_service.fulfill_prescription("User_Gal", "med_ritalin", 1)
+        _exec("UPDATE medications SET stock_quantity = stock_quantity + 5 WHERE id = 'med_ritalin';")
+
+        with db.connection() as conn:
+            rows = conn.execute("SELECT med_id, day, quantity FROM medication_consumption;").fetchall()
+        self.assertEqual(rows, [("med_ritalin", _today().isoformat(), 3)])
+
+    def test_reorder_levels_follow_demand(self):
+        mean, reorder_point, target = inventory_service.reorder_levels(280, 2800)
+        self.assertEqual(mean, 10)
+        self.assertEqual(reorder_point, 30)
+        self.assertEqual(target, 100)
+        self.assertEqual(inventory_service.reorder_levels(0, 0)[1:], (10, 10))
+
+    def test_plan_funds_reorder_points_before_top_ups(self):
+        _empty_shelves()
+        _record_daily_demand("med_acamol", 10)
+        _record_daily_demand("med_ritalin", 10)
+
+        full = inventory_service.plan_restock()
+        quantities = {line["med_id"]: line["quantity"] for line in full["lines"]}
+        self.assertEqual(quantities, {"med_acamol": 100, "med_ritalin": 100})
+        self.assertEqual(full["cost"], 3500.0)
+
+        tight = inventory_service.plan_restock(budget=1000.0)
+        quantities = {line["med_id"]: line["quantity"] for line in tight["lines"]}
+        self.assertEqual(quantities, {"med_acamol": 32, "med_ritalin": 28})
+        self.assertLessEqual(tight["cost"], 1000.0)
+        self.assertEqual(tight["unfunded"], 1)
+
+    def test_apply_restocks_catalog_in_one_ledger_entry(self):
+        _empty_shelves()
+        _record_daily_demand("med_acamol", 10)
+
+        plan = inventory_service.apply_restock_plan("User_Manager")
+
+        self.assertEqual(_stock("med_acamol"), 100)
+        self.assertEqual(_stock("med_ritalin"), 10)
+        entries = ledger_service.history()
+        self.assertEqual(len(entries), 1)
+        self.assertEqual(entries[0]["budget_delta"], -plan["cost"])
+        self.assertEqual(entries[0]["reference"], "plan:2")
+
+    def test_apply_fails_whole_plan_when_budget_is_gone(self):
+        _empty_shelves()
+        _exec("UPDATE financial_snapshots SET total_budget = 0;")
+
+        plan = inventory_service.apply_restock_plan("User_Manager")
+        self.assertEqual(plan["lines"], [])
+
+        lines = [{"med_id": "med_acamol", "quantity": 5, "unit_cost": 5.0}]
+        with self.assertRaises(ValueError):
+            db.write(inventory_service._apply_plan, lines)
+        self.assertEqual(_stock("med_acamol"), 0)
+
+    def test_apply_publishes_stock_for_plans_longer_than_a_chunk(self):
+        med_ids = [f"med_bulk_{i}" for i in range(inventory_service._CHUNK + 100)]
+        with db.connection() as conn:
+            with conn:
+                conn.executemany(
+                    """
+                    INSERT INTO medications (id, name, active_ingredient, category, dosage_instructions,
+                        stock_quantity, requires_prescription, retail_price, wholesale_price)
+                    VALUES (?, ?, 'bulk', 'bulk', 'as needed', 0, 0, 1.0, 0.01);
+                    """,
+                    [(med_id, med_id) for med_id in med_ids],
+                )
+        lines = [{"med_id": med_id, "quantity": 2, "unit_cost": 0.01} for med_id in med_ids]
+
+        with mock.patch.object(change_feed.broker, "max_buffer", len(lines) * 2):
+            subscription = change_feed.broker.subscribe(frozenset({"branch:main"}))
+        with subscription:
+            db.write(inventory_service._apply_plan, lines)
+            events, _dropped = subscription.drain()
+
+        stock = {event.payload["med_id"]: event.payload["stock_quantity"] for event in events if event.type == "stock"}
+        self.assertEqual(stock, dict.fromkeys(med_ids, 2))
+
+    def test_only_managers_can_plan(self):
+        with self.assertRaises(PermissionError):
+            inventory_service.preview_restock_plan("User_Gal")
+        with self.assertRaises(ValueError):
+            inventory_service.apply_restock_plan("missing")
+
+    def test_planner_survives_unexpected_errors(self):
+        planner = inventory_service.RestockPlanner(interval=0.01)
+        outcomes = [RuntimeError("boom"), {"lines": [], "cost": 0.0}]
+
+        def apply(_user_id=None):
+            outcome = outcomes.pop(0) if len(outcomes) > 1 else outcomes[0]
+            if isinstance(outcome, Exception):
+                raise outcome
+            return outcome
+
+        with mock.patch.object(inventory_service, "apply_restock_plan", apply):
+            planner.start()
+            deadline = time.monotonic() + 2
+            while planner.runs < 3 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            planner.stop(timeout=1)
+
+        self.assertGreaterEqual(planner.runs, 3)
+        self.assertEqual(planner.failures, 1)
+        self.assertEqual(planner.last_error, None)
+
+        planner = inventory_service.RestockPlanner(interval=0.01)
+        with mock.patch.object(inventory_service, "apply_restock_plan", side_effect=KeyError("plan")):
+            planner.start()
+            deadline = time.monotonic() + 2
+            while planner.runs < 2 and time.monotonic() < deadline:
+                time.sleep(0.01)
+            planner.stop(timeout=1)
+
+        self.assertGreaterEqual(planner.failures, 2)
+        self.assertIn("KeyError", planner.last_error)
+
+
+if __name__ == "__main__":
+    unittest.main()
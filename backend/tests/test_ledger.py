@@ -0,0 +1,78 @@
+"""Tests for the append-only financial ledger and snapshot compaction."""
+
+import unittest
+from unittest import mock
+
+from app import db
+from app.services import ledger_service, pharmacy_service, user_service
+from data import init_db
+
+
+def _financials() -> tuple:
+    with db.connection() as conn:
+        return conn.execute("SELECT total_budget, total_revenue FROM pharmacy_financials WHERE id = 1;").fetchone()
+
+
+def _snapshot() -> tuple:
+    with db.connection() as conn:
+        return conn.execute(
+            "SELECT total_budget, total_revenue, ledger_position FROM financial_snapshots WHERE id = 1;"
+        ).fetchone()
+
+
+class LedgerTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+
+    def test_money_movements_append_entries_without_touching_snapshot(self):
+        user_service.process_transaction("User_Gal", 100.0)
+        pharmacy_service.process_restock("User_Manager", "med_acamol", 10)
+
+        self.assertEqual(_snapshot(), (10000.0, 0.0, 0))
+        self.assertEqual(_financials(), (10050.0, 100.0))
+
+        entries = ledger_service.history()
+        self.assertEqual([entry["kind"] for entry in entries], ["restock", "sale"])
+        self.assertEqual(entries[0]["budget_delta"], -50.0)
+        self.assertEqual(entries[1]["reference"], "User_Gal")
+
+    def test_compaction_folds_entries_and_keeps_audit_trail(self):
+        user_service.process_transaction("User_Gal", 100.0)
+        user_service.process_transaction("User_Gal", 25.0)
+
+        self.assertEqual(ledger_service.compact(), 2)
+        self.assertEqual(ledger_service.compact(), 0)
+        self.assertEqual(_snapshot(), (10125.0, 125.0, 2))
+        self.assertEqual(_financials(), (10125.0, 125.0))
+        self.assertEqual(len(ledger_service.history()), 2)
+
+        pharmacy_service.process_restock("User_Manager", "med_acamol", 1)
+        self.assertEqual(_financials(), (10120.0, 125.0))
+
+    def test_budget_check_includes_uncompacted_entries(self):
+        # Ritalin wholesale is 30.0: 330 units cost 9900, leaving 100 of the budget.
+        pharmacy_service.process_restock("User_Manager", "med_ritalin", 330)
+
+        with self.assertRaisesRegex(ValueError, "Insufficient budget"):
+            pharmacy_service.process_restock("User_Manager", "med_ritalin", 4)
+
+        user_service.process_transaction("User_Gal", 20.0)
+        pharmacy_service.process_restock("User_Manager", "med_ritalin", 4)
+        self.assertEqual(_financials()[0], 0.0)
+
+    def test_periodic_compaction_runs_inside_the_write(self):
+        with mock.patch.object(ledger_service, "LEDGER_COMPACT_EVERY", 2):
+            user_service.process_transaction("User_Gal", 1.0)
+            self.assertEqual(_snapshot()[2], 0)
+            user_service.process_transaction("User_Gal", 2.0)
+
+        self.assertEqual(_snapshot(), (10003.0, 3.0, 2))
+
+    def test_unknown_user_writes_nothing(self):
+        with self.assertRaisesRegex(ValueError, "User not found"):
+            user_service.process_transaction("nobody", 10.0)
+        self.assertEqual(ledger_service.history(), [])
+
+
+if __name__ == "__main__":
+    unittest.main()
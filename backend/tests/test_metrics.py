@@ -0,0 +1,83 @@
+"""Tests for the /metrics registry and its request, database and chat instrumentation."""
+
+import sqlite3
+import unittest
+from unittest.mock import patch
+
+from app import create_app, metrics
+
+
+def _sample(text: str, prefix: str) -> float:
+    for line in text.splitlines():
+        if line.startswith(prefix + " "):
+            return float(line.rsplit(" ", 1)[1])
+    return 0.0
+
+
+class MetricsTestCase(unittest.TestCase):
+    def setUp(self):
+        self.app = create_app()
+        self.client = self.app.test_client()
+
+    def scrape(self) -> str:
+        resp = self.client.get("/metrics")
+        self.assertEqual(resp.status_code, 200)
+        self.assertTrue(resp.content_type.startswith("text/plain"))
+        return resp.get_data(as_text=True)
+
+    def test_route_latency_is_labelled_by_rule(self):
+        key = 'pharmacy_http_request_duration_seconds_count{method="GET",route="/api/health",status="200"}'
+        before = _sample(self.scrape(), key)
+        self.client.get("/api/health")
+        self.client.get("/api/health")
+        self.assertEqual(_sample(self.scrape(), key), before + 2)
+
+    @patch("app.routes.prescription_service.validate_fulfillment")
+    def test_errors_are_counted_by_exception_type(self, mock_validate):
+        route = "/api/prescriptions/validate"
+        value_key = f'pharmacy_http_errors_total{{route="{route}",type="ValueError"}}'
+        db_key = f'pharmacy_http_errors_total{{route="{route}",type="sqlite3.Error"}}'
+        lock_key = f'pharmacy_db_lock_errors_total{{route="{route}"}}'
+        text = self.scrape()
+        before = [_sample(text, key) for key in (value_key, db_key, lock_key)]
+
+        mock_validate.side_effect = ValueError("invalid")
+        self.client.get(route, query_string={"user_id": "U1", "med_id": "M1"})
+        mock_validate.side_effect = sqlite3.OperationalError("database is locked")
+        self.client.get(route, query_string={"user_id": "U1", "med_id": "M1"})
+
+        text = self.scrape()
+        after = [_sample(text, key) for key in (value_key, db_key, lock_key)]
+        self.assertEqual(after, [value + 1 for value in before])
+
+    def test_histogram_buckets_are_cumulative(self):
+        registry = metrics.Registry()
+        histogram = metrics.Histogram("t_seconds", "test", ("query",), buckets=(0.1, 1.0), registry=registry)
+        for value in (0.05, 0.5, 5.0):
+            histogram.labels("q").observe(value)
+
+        text = registry.render()
+        self.assertIn('t_seconds_bucket{query="q",le="0.1"} 1', text)
+        self.assertIn('t_seconds_bucket{query="q",le="1.0"} 2', text)
+        self.assertIn('t_seconds_bucket{query="q",le="+Inf"} 3', text)
+        self.assertIn('t_seconds_count{query="q"} 3', text)
+        with self.assertRaises(ValueError):
+            metrics.Counter("t_seconds", "duplicate", registry=registry)
+
+    def test_stream_metrics_track_first_token_and_active_streams(self):
+        key = 'pharmacy_chat_time_to_first_token_seconds_count{source="test"}'
+        before = _sample(self.scrape(), key)
+        active = metrics.CHAT_ACTIVE_STREAMS.labels().value
+
+        stream = metrics.StreamMetrics("test")
+        self.assertEqual(metrics.CHAT_ACTIVE_STREAMS.labels().value, active + 1)
+        for _ in range(3):
+            stream.token()
+        stream.finish()
+
+        self.assertEqual(metrics.CHAT_ACTIVE_STREAMS.labels().value, active)
+        self.assertEqual(_sample(self.scrape(), key), before + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+"""Tests for the in-place schema migration runner."""
+
+import sqlite3
+import tempfile
+import unittest
+from contextlib import closing
+from pathlib import Path
+
+from data import init_db
+
+
+def _index_names(conn: sqlite3.Connection) -> set:
+    rows = conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%';")
+    return {row[0] for row in rows}
+
+
+class MigrationTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.db_path = Path(self.tmpdir.name) / "pharmacy.db"
+
+    def tearDown(self):
+        self.tmpdir.cleanup()
+
+    def test_fresh_database_is_at_latest_version(self):
+        init_db.initialize_database(self.db_path)
+
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            self.assertEqual(conn.execute("PRAGMA user_version;").fetchone()[0], init_db.SCHEMA_VERSION)
+            self.assertIn("idx_prescriptions_user_active", _index_names(conn))
+
+    def test_legacy_database_upgraded_in_place(self):
+        # A database built before migrations existed: tables and data, user_version 0.
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            with conn:
+                init_db._create_tables(conn)
+                init_db._seed_data(conn)
+            conn.execute("UPDATE users SET debt = 42 WHERE id = 'User_Gal';")
+            conn.commit()
+
+        version = init_db.migrate_database(self.db_path)
+        self.assertEqual(version, init_db.SCHEMA_VERSION)
+        self.assertEqual(init_db.migrate_database(self.db_path), init_db.SCHEMA_VERSION)
+
+        with closing(sqlite3.connect(self.db_path)) as conn:
+            self.assertEqual(conn.execute("SELECT debt FROM users WHERE id = 'User_Gal';").fetchone()[0], 42)
+            self.assertIn("idx_prescription_items_prescription_med", _index_names(conn))
+
+    def test_missing_database_is_created(self):
+        self.assertEqual(init_db.migrate_database(self.db_path), init_db.SCHEMA_VERSION)
+        self.assertTrue(self.db_path.exists())
+
+
+if __name__ == "__main__":
+    unittest.main()
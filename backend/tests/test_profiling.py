@@ -0,0 +1,69 @@
+"""Tests for the opt-in request profiler."""
+
+import json
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from app import create_app, db
+from app.profiling import StatementTimer
+from config import Config
+from data import init_db
+
+
+class ProfilingTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.dir = Path(self.tmp.name)
+
+    def make_client(self, **overrides):
+        settings = {"PROFILE_ENABLED": True, "PROFILE_DIR": self.tmp.name, **overrides}
+        with patch.multiple(Config, **settings):
+            return create_app().test_client()
+
+    def test_header_profiles_one_request(self):
+        client = self.make_client()
+        resp = client.get("/api/health")
+        self.assertNotIn("X-Profile-Summary", resp.headers)
+        self.assertEqual(list(self.dir.iterdir()), [])
+
+        resp = client.get(
+            "/api/prescriptions/validate",
+            query_string={"user_id": "User_Gal", "med_id": "med_ritalin", "qty": 1},
+            headers={"X-Profile": "1"},
+        )
+        summary = dict(part.split("=", 1) for part in resp.headers["X-Profile-Summary"].split("; "))
+        self.assertGreater(int(summary["queries"]), 0)
+        self.assertTrue((self.dir / summary["file"]).exists())
+
+        sidecar = json.loads(next(self.dir.glob("*.sql.json")).read_text())
+        self.assertTrue(any("prescription" in entry["sql"] for entry in sidecar["statements"]))
+
+    def test_sample_rate_and_speedscope_output(self):
+        client = self.make_client(PROFILE_SAMPLE_RATE=1.0, PROFILE_FORMAT="speedscope")
+        resp = client.get("/api/health")
+        self.assertIn("X-Profile-Summary", resp.headers)
+
+        profile = json.loads(next(self.dir.glob("*.speedscope.json")).read_text())
+        self.assertEqual(profile["profiles"][0]["type"], "sampled")
+
+    def test_invalid_format_is_rejected(self):
+        with self.assertRaises(ValueError):
+            self.make_client(PROFILE_FORMAT="pprof")
+
+    def test_trace_is_scoped_to_the_calling_thread(self):
+        timer = StatementTimer()
+        with db.trace_statements(timer):
+            with db.connection() as conn:
+                conn.execute("SELECT 1;").fetchone()
+        with db.connection() as conn:
+            conn.execute("SELECT 2;").fetchone()
+
+        self.assertEqual([sql for sql, _seconds in timer.statements], ["SELECT 1;"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,94 @@
+"""Tests for the read-through user and medication reference cache."""
+
+import unittest
+from unittest import mock
+
+from app import db
+from app.services import pharmacy_service, prescription_service
+from app.services.reference_cache import ReferenceCache, get_reference_cache
+from data import init_db
+
+
+def _exec(query: str, params: tuple = ()) -> None:
+    with db.connection() as conn:
+        with conn:
+            conn.execute(query, params)
+
+
+class ReferenceCacheTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+
+    def test_hits_do_not_touch_the_database(self):
+        cache = ReferenceCache(check_interval=60)
+        self.assertEqual(cache.user("User_Manager")["role"], "manager")
+        self.assertEqual(cache.medication("med_acamol")["wholesale_price"], 5.0)
+
+        with mock.patch.object(db.ConnectionPool, "connection", side_effect=AssertionError("disk read")):
+            self.assertEqual(cache.user("User_Manager")["role"], "manager")
+            self.assertEqual(cache.medication("med_acamol")["retail_price"], 10.0)
+
+        stats = cache.stats()
+        self.assertEqual((stats["hits"], stats["misses"], stats["entries"]), (2, 2, 2))
+
+    def test_writes_elsewhere_invalidate_only_changed_entries(self):
+        cache = ReferenceCache(check_interval=0)
+        cache.user("User_Gal")
+        cache.user("User_Manager")
+        cache.medication("med_acamol")
+
+        _exec("UPDATE users SET role = 'manager' WHERE id = 'User_Gal';")
+        _exec("UPDATE users SET debt = 5 WHERE id = 'User_Manager';")
+        _exec("UPDATE medications SET wholesale_price = 6.5 WHERE id = 'med_acamol';")
+
+        self.assertEqual(cache.user("User_Gal")["role"], "manager")
+        self.assertEqual(cache.medication("med_acamol")["wholesale_price"], 6.5)
+        self.assertEqual(cache.stats()["invalidations"], 2)
+        self.assertEqual(cache.stats()["hits"], 0)
+        cache.user("User_Manager")
+        self.assertEqual(cache.stats()["hits"], 1)
+
+    def test_stock_movements_keep_cached_prices(self):
+        cache = ReferenceCache(check_interval=0)
+        cache.medication("med_ritalin")
+
+        prescription_service.fulfill_prescription("User_Gal", "med_ritalin", 1)
+        pharmacy_service.process_restock("User_Manager", "med_ritalin", 2)
+
+        self.assertEqual(cache.medication("med_ritalin")["name"], "Ritalin")
+        self.assertEqual((cache.stats()["invalidations"], cache.stats()["hits"]), (0, 1))
+
+    def test_explicit_invalidation_and_missing_rows(self):
+        cache = ReferenceCache(check_interval=60)
+        cache.medication("med_acamol")
+        cache.invalidate("medication", "med_acamol")
+
+        self.assertEqual(cache.stats()["entries"], 0)
+        self.assertIsNone(cache.user("nobody"))
+        self.assertEqual(cache.stats()["entries"], 0)
+
+    def test_memory_is_bounded_by_lru_eviction(self):
+        cache = ReferenceCache(max_entries=2, check_interval=60)
+        cache.user("User_Gal")
+        cache.user("User_Manager")
+        cache.user("User_Gal")
+        cache.user("Dr_Smith")
+
+        with mock.patch.object(db.ConnectionPool, "connection", side_effect=AssertionError("disk read")):
+            self.assertEqual(cache.user("User_Gal")["role"], "customer")
+        stats = cache.stats()
+        self.assertEqual((stats["entries"], stats["evictions"]), (2, 1))
+
+    def test_restock_permission_check_is_served_from_cache(self):
+        cache = get_reference_cache()
+        pharmacy_service.process_restock("User_Manager", "med_acamol", 1)
+        hits = cache.stats()["hits"]
+
+        pharmacy_service.process_restock("User_Manager", "med_acamol", 1)
+        with self.assertRaises(PermissionError):
+            pharmacy_service.process_restock("User_Gal", "med_acamol", 1)
+        self.assertGreaterEqual(cache.stats()["hits"] - hits, 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
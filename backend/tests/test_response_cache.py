@@ -0,0 +1,57 @@
+"""Tests for the chat response cache."""
+
+import tempfile
+import unittest
+from pathlib import Path
+from unittest.mock import patch
+
+from app.services.response_cache import ResponseCache, cache_key
+
+
+class ResponseCacheTestCase(unittest.TestCase):
+    def test_key_ignores_case_whitespace_and_trailing_punctuation(self):
+        self.assertEqual(
+            cache_key("What is  Acamol?", "prompt", "model"),
+            cache_key("what is acamol", "prompt", "model"),
+        )
+        self.assertNotEqual(
+            cache_key("what is acamol", "prompt", "model"),
+            cache_key("what is acamol", "prompt", "other-model"),
+        )
+
+    def test_lru_eviction(self):
+        cache = ResponseCache(max_entries=2)
+        cache.put("a", ["1"])
+        cache.put("b", ["2"])
+        cache.get("a")
+        cache.put("c", ["3"])
+
+        self.assertEqual(cache.get("a"), ["1"])
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.stats()["evictions"], 1)
+
+    def test_ttl_expiry(self):
+        cache = ResponseCache(ttl=10)
+        with patch("app.services.response_cache.time.time", return_value=1000.0):
+            cache.put("a", ["1"])
+        with patch("app.services.response_cache.time.time", return_value=1011.0):
+            self.assertIsNone(cache.get("a"))
+        self.assertEqual(cache.stats()["misses"], 1)
+
+    def test_disk_tier_survives_restart(self):
+        with tempfile.TemporaryDirectory() as tmpdir:
+            path = Path(tmpdir) / "chat_cache.db"
+            ResponseCache(path=path).put("a", ["Hello", " there"])
+
+            restarted = ResponseCache(path=path)
+            self.assertEqual(restarted.get("a"), ["Hello", " there"])
+            self.assertEqual(restarted.stats()["disk_hits"], 1)
+
+    def test_disabled_cache_never_stores(self):
+        cache = ResponseCache(max_entries=0)
+        cache.put("a", ["1"])
+        self.assertIsNone(cache.get("a"))
+
+
+if __name__ == "__main__":
+    unittest.main()
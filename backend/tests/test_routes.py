@@ -102,6 +102,64 @@ class RoutesTestCase(unittest.TestCase):
         self.assertEqual(resp.status_code, 400)
         mock_fulfill.assert_not_called()
 
+    @patch("app.routes.prescription_service.fulfill_batch")
+    def test_fulfill_batch_post(self, mock_batch):
+        mock_batch.return_value = [
+            {"user_id": "User_Gal", "med_id": "med_ritalin", "quantity": 2, "status": "fulfilled", "item_id": "i1"},
+        ]
+        payload = {"user_id": "User_Gal", "lines": [{"med_id": "med_ritalin", "qty": 2}]}
+        resp = self.client.post("/api/prescriptions/fulfill/batch", json=payload)
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["status"], "fulfilled")
+        mock_batch.assert_called_once_with([("User_Gal", "med_ritalin", 2)], "atomic")
+
+    @patch("app.routes.prescription_service.fulfill_batch")
+    def test_fulfill_batch_rejected(self, mock_batch):
+        mock_batch.return_value = [
+            {"user_id": "User_Gal", "med_id": "med_acamol", "quantity": 1, "status": "rejected", "error": "no rx"},
+        ]
+        payload = {"lines": [{"user_id": "User_Gal", "med_id": "med_acamol"}], "policy": "independent"}
+        resp = self.client.post("/api/prescriptions/fulfill/batch", json=payload)
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(resp.get_json()["status"], "rejected")
+
+    @patch("app.routes.prescription_service.fulfill_batch")
+    def test_fulfill_batch_invalid_lines(self, mock_batch):
+        resp = self.client.post("/api/prescriptions/fulfill/batch", json={"lines": [{"qty": "abc"}]})
+        self.assertEqual(resp.status_code, 400)
+        mock_batch.assert_not_called()
+
+    @patch("app.routes.checkout_service.checkout")
+    def test_checkout_post(self, mock_checkout):
+        mock_checkout.return_value = {"med_id": "med_acamol", "quantity": 2, "unit_price": 10.0, "amount": 20.0}
+        resp = self.client.post("/api/checkout", json={"user_id": "User_Gal", "med_id": "med_acamol", "qty": 2})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["status"], "completed")
+        self.assertEqual(resp.get_json()["amount"], 20.0)
+        mock_checkout.assert_called_once_with("User_Gal", "med_acamol", 2)
+
+    @patch("app.routes.checkout_service.checkout")
+    def test_checkout_value_error(self, mock_checkout):
+        mock_checkout.side_effect = ValueError("Insufficient stock")
+        resp = self.client.post("/api/checkout", json={"user_id": "User_Gal", "med_id": "med_acamol"})
+        self.assertEqual(resp.status_code, 400)
+        mock_checkout.assert_called_once_with("User_Gal", "med_acamol", 1)
+
+    @patch("app.routes.interaction_service.check_basket")
+    def test_interactions_basket(self, mock_check):
+        mock_check.return_value = [{"id": "int_1", "severity": "major"}]
+        resp = self.client.post("/api/interactions/check", json={"med_ids": ["med_acamol", "med_ritalin"]})
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.get_json()["count"], 1)
+        mock_check.assert_called_once_with(["med_acamol", "med_ritalin"])
+
+    @patch("app.routes.interaction_service.check_patient")
+    def test_interactions_patient_value_error(self, mock_check):
+        mock_check.side_effect = ValueError("Medication not found: med_x")
+        resp = self.client.post("/api/interactions/check", json={"user_id": "User_Gal", "med_id": "med_x"})
+        self.assertEqual(resp.status_code, 400)
+        mock_check.assert_called_once_with("User_Gal", "med_x")
+
     @patch("app.routes.user_service.process_transaction")
     def test_user_transaction_success(self, mock_txn):
         payload = {"user_id": "User_Gal", "amount": 12.5}
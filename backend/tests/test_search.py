@@ -0,0 +1,82 @@
+"""Tests for the FTS5 medication search."""
+
+import unittest
+
+from app import create_app, db
+from app.services import agent_tools, search_service
+from data import init_db
+
+
+def _add_medication(med_id: str, name: str, stock: int, ingredient: str = "Paracetamol") -> None:
+    with db.connection() as conn:
+        with conn:
+            conn.execute(
+                """
+                INSERT INTO medications (
+                    id, name, active_ingredient, category, dosage_instructions,
+                    stock_quantity, requires_prescription, retail_price, wholesale_price
+                ) VALUES (?, ?, ?, 'Analgesic', 'Take as directed', ?, 0, 12.0, 6.0);
+                """,
+                (med_id, name, ingredient, stock),
+            )
+
+
+def _ids(query: str) -> list:
+    return [result["id"] for result in search_service.search_medications(query)]
+
+
+class SearchTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+
+    def test_matches_name_id_ingredient_and_category(self):
+        self.assertEqual(_ids("RITALIN"), ["med_ritalin"])
+        self.assertEqual(_ids("med_acamol"), ["med_acamol"])
+        self.assertEqual(_ids("methylphen"), ["med_ritalin"])
+        self.assertEqual(_ids("analgesic"), ["med_acamol"])
+        self.assertEqual(search_service.search_medications("ritalin")[0]["match"], "exact")
+
+    def test_misspellings_fall_back_to_fuzzy_matches(self):
+        results = search_service.search_medications("Ritlain")
+        self.assertEqual([result["id"] for result in results], ["med_ritalin"])
+        self.assertEqual(results[0]["match"], "fuzzy")
+        self.assertEqual(_ids("paracetmol"), ["med_acamol"])
+        self.assertEqual(_ids("zzzqqq"), [])
+        self.assertEqual(search_service.edit_distance("ritlain", "ritalin"), 1)
+        self.assertEqual(search_service.edit_distance("kitten", "sitting"), 3)
+
+    def test_ranks_by_relevance_then_stock(self):
+        _add_medication("med_acamol_forte", "Acamol Forte", 0)
+        _add_medication("med_acamol_plus", "Acamol Plus", 80)
+
+        self.assertEqual(_ids("acamol"), ["med_acamol", "med_acamol_plus", "med_acamol_forte"])
+        self.assertEqual(_ids("acamol forte")[0], "med_acamol_forte")
+
+    def test_triggers_keep_index_in_sync(self):
+        _add_medication("med_nurofen", "Nurofen", 10, ingredient="Ibuprofen")
+        self.assertEqual(_ids("nurofen"), ["med_nurofen"])
+
+        with db.connection() as conn:
+            with conn:
+                conn.execute("UPDATE medications SET name = 'Advil' WHERE id = 'med_nurofen';")
+        self.assertEqual(_ids("advil"), ["med_nurofen"])
+        self.assertEqual(_ids("ibuprofen"), ["med_nurofen"])
+        # Only the ingredient still resembles the old name.
+        self.assertEqual({result["match"] for result in search_service.search_medications("nurofen")}, {"fuzzy"})
+
+        with db.connection() as conn:
+            with conn:
+                conn.execute("DELETE FROM medications WHERE id = 'med_nurofen';")
+        self.assertEqual(_ids("advil"), [])
+
+    def test_route_and_chat_tool(self):
+        client = create_app().test_client()
+        body = client.get("/api/medications/search", query_string={"q": "ritlin"}).get_json()
+        self.assertEqual([result["id"] for result in body["results"]], ["med_ritalin"])
+        self.assertEqual(client.get("/api/medications/search", query_string={"q": "ri"}).status_code, 400)
+
+        self.assertEqual(agent_tools.find_medication("Acamoll")["medications"][0]["id"], "med_acamol")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,43 @@
+"""Concurrency stress tests: many workers on one prescription and one budget."""
+
+import unittest
+from unittest import mock
+
+from app import db
+from tests import stress_harness
+
+
+class StressTestCase(unittest.TestCase):
+    def _assert_safe(self, initial: dict, report: dict) -> None:
+        self.assertEqual(stress_harness.check_invariants(initial, report), [])
+        totals = report["totals"]
+        # The starting state is tight enough that every guard is exercised.
+        self.assertGreater(totals.get("fulfill:rejected", 0) + totals.get("validate_fulfill:rejected", 0), 0)
+        self.assertGreater(totals.get("restock:ok", 0), 0)
+
+    def test_threads_never_over_dispense_or_overspend(self):
+        initial = stress_harness.prepare_database(periods=40, rx_stock=30, budget=150.0)
+        report = stress_harness.run(workers=12, ops=40, mode="threads")
+        self._assert_safe(initial, report)
+        self.assertEqual(report["lock_error_rate"], 0.0)
+
+    def test_group_commit_writer_keeps_invariants(self):
+        initial = stress_harness.prepare_database(periods=40, rx_stock=30, budget=150.0)
+        with mock.patch.object(db, "SINGLE_WRITER", True):
+            report = stress_harness.run(workers=12, ops=40, mode="threads")
+        self._assert_safe(initial, report)
+
+    def test_processes_never_over_dispense_or_overspend(self):
+        initial = stress_harness.prepare_database(periods=30, rx_stock=20, budget=150.0)
+        report = stress_harness.run(workers=4, ops=40, mode="processes")
+        self._assert_safe(initial, report)
+
+    def test_invariant_check_detects_lost_updates(self):
+        initial = stress_harness.prepare_database()
+        report = stress_harness.run(workers=2, ops=10, mode="threads")
+        report["totals"]["rx_dispensed"] = report["totals"].get("rx_dispensed", 0) + 1
+        self.assertTrue(stress_harness.check_invariants(initial, report))
+
+
+if __name__ == "__main__":
+    unittest.main()
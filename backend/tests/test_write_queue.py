@@ -0,0 +1,129 @@
+"""Tests for the group-commit single-writer queue."""
+
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+from unittest import mock
+
+from app import db
+from app.db import ConnectionPool, WriteQueue
+from app.services import ledger_service, pharmacy_service, user_service
+from data import init_db
+
+
+def _insert(conn, value):
+    conn.execute("INSERT INTO entries (value) VALUES (?);", (value,))
+    return value * 2
+
+
+def _fail(conn, value):
+    conn.execute("INSERT INTO entries (value) VALUES (?);", (value,))
+    raise ValueError(f"rejected {value}")
+
+
+class WriteQueueTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmpdir = tempfile.TemporaryDirectory()
+        self.pool = ConnectionPool(Path(self.tmpdir.name) / "queue.db", max_size=2)
+        with self.pool.connection() as conn:
+            conn.execute("CREATE TABLE entries (value INTEGER NOT NULL);")
+        self.queue = WriteQueue(self.pool, max_batch=16, max_wait=0.05)
+
+    def tearDown(self):
+        self.queue.close()
+        self.pool.close()
+        self.tmpdir.cleanup()
+
+    def _values(self) -> list:
+        with self.pool.connection() as conn:
+            return [row[0] for row in conn.execute("SELECT value FROM entries ORDER BY value;")]
+
+    def test_jobs_are_committed_in_batches(self):
+        futures = [self.queue.submit(_insert, value) for value in range(10)]
+
+        self.assertEqual([future.result(timeout=5) for future in futures], [value * 2 for value in range(10)])
+        self.assertEqual(self._values(), list(range(10)))
+        stats = self.queue.stats()
+        self.assertEqual(stats["jobs"], 10)
+        self.assertLess(stats["batches"], 10)
+        self.assertGreater(stats["largest_batch"], 1)
+
+    def test_failing_job_is_rolled_back_alone(self):
+        futures = [
+            self.queue.submit(_insert, 1),
+            self.queue.submit(_fail, 2),
+            self.queue.submit(_insert, 3),
+        ]
+
+        self.assertEqual(futures[0].result(timeout=5), 2)
+        with self.assertRaisesRegex(ValueError, "rejected 2"):
+            futures[1].result(timeout=5)
+        self.assertEqual(futures[2].result(timeout=5), 6)
+        self.assertEqual(self._values(), [1, 3])
+        self.assertEqual(self.queue.stats()["failed_jobs"], 1)
+
+    def test_nested_submit_is_refused(self):
+        future = self.queue.submit(lambda conn: self.queue.submit(_insert, 1))
+
+        with self.assertRaises(RuntimeError):
+            future.result(timeout=5)
+
+    def test_close_drains_pending_jobs(self):
+        futures = [self.queue.submit(_insert, value) for value in range(5)]
+        self.queue.close(timeout=5)
+
+        self.assertTrue(all(future.done() for future in futures))
+        self.assertEqual(self._values(), list(range(5)))
+        with self.assertRaises(RuntimeError):
+            self.queue.submit(_insert, 6)
+
+
+class SingleWriterServicesTestCase(unittest.TestCase):
+    def setUp(self):
+        init_db.initialize_database()
+        self.queue = WriteQueue(max_batch=32, max_wait=0.005)
+        patches = (
+            mock.patch.object(db, "SINGLE_WRITER", True),
+            mock.patch.object(db, "get_write_queue", lambda: self.queue),
+        )
+        for patch in patches:
+            patch.start()
+            self.addCleanup(patch.stop)
+        self.addCleanup(self.queue.close)
+
+    def test_concurrent_mutations_share_commits_without_lock_errors(self):
+        errors = []
+
+        def worker():
+            try:
+                for _ in range(10):
+                    user_service.process_transaction("User_Gal", 1.0)
+                pharmacy_service.process_restock("User_Manager", "med_acamol", 1)
+            except Exception as err:  # noqa: BLE001
+                errors.append(err)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(len(ledger_service.history(limit=1000)), 88)
+        with db.connection() as conn:
+            debt = conn.execute("SELECT debt FROM users WHERE id = 'User_Gal';").fetchone()[0]
+            budget = conn.execute("SELECT total_budget FROM pharmacy_financials WHERE id = 1;").fetchone()[0]
+        self.assertEqual(debt, 80.0)
+        self.assertEqual(budget, 10000.0 + 80.0 - 8 * 5.0)
+        self.assertLess(self.queue.stats()["batches"], 88)
+
+    def test_service_errors_reach_the_caller(self):
+        with self.assertRaisesRegex(ValueError, "User not found"):
+            user_service.process_transaction("nobody", 1.0)
+        with self.assertRaises(PermissionError):
+            pharmacy_service.process_restock("User_Gal", "med_acamol", 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
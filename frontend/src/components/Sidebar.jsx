@@ -1,7 +1,9 @@
-import { Plus, UserRound, Clock3 } from 'lucide-react'
+import { useEffect, useState } from 'react'
+import { Plus, UserRound, Clock3, Activity } from 'lucide-react'
 import { Button } from './ui/button'
 import { ScrollArea } from './ui/scroll-area'
 import { Separator } from './ui/separator'
+import { subscribeChanges } from '../services/api'
 
 const history = {
   today: ['Aspirin inquiry', 'Drug interaction check'],
@@ -30,6 +32,59 @@ function HistoryGroup({ title, items }) {
   )
 }
 
+const MAX_ACTIVITY = 8
+
+// Whose activity the sidebar follows, and on which branch; unset branch means the server default.
+const CURRENT_USER_ID = import.meta.env.VITE_USER_ID || ''
+const BRANCH = import.meta.env.VITE_PHARMACY_BRANCH || ''
+
+function describeChange(type, data) {
+  switch (type) {
+    case 'stock':
+      return `${data.med_id}: ${data.stock_quantity} in stock`
+    case 'prescription':
+      return `${data.med_id}: ${data.remaining_periods} refills left`
+    case 'debt':
+      return `Charged ${data.amount}`
+    case 'budget':
+      return `Budget ${data.budget_delta >= 0 ? '+' : ''}${data.budget_delta} (${data.kind})`
+    default:
+      return 'Missed updates, refresh to resync'
+  }
+}
+
+function LiveActivity() {
+  const [items, setItems] = useState([])
+
+  useEffect(() => {
+    if (!CURRENT_USER_ID) return undefined
+    return subscribeChanges(
+      [`user:${CURRENT_USER_ID}`],
+      (type, data) => {
+        setItems((current) => [describeChange(type, data), ...current].slice(0, MAX_ACTIVITY))
+      },
+      { userId: CURRENT_USER_ID, branch: BRANCH },
+    )
+  }, [])
+
+  return (
+    <div className="space-y-2">
+      <div className="flex items-center gap-2 px-2 text-xs font-semibold uppercase tracking-wide text-slate-500">
+        <Activity className="h-3 w-3" />
+        <span>Live activity</span>
+      </div>
+      <div className="space-y-1 px-2 text-sm text-slate-600">
+        {items.length === 0 ? (
+          <p className="text-slate-400">{CURRENT_USER_ID ? 'No changes yet' : 'Sign in to see your activity'}</p>
+        ) : null}
+        {items.map((label, index) => (
+          <p key={`${index}-${label}`}>{label}</p>
+        ))}
+      </div>
+    </div>
+  )
+}
+
 function Sidebar() {
   return (
     <aside className="flex h-full w-64 flex-col border-r bg-slate-50">
@@ -52,6 +107,8 @@ function Sidebar() {
           <HistoryGroup title="Today" items={history.today} />
           <Separator className="my-2" />
           <HistoryGroup title="Yesterday" items={history.yesterday} />
+          <Separator className="my-2" />
+          <LiveActivity />
         </ScrollArea>
       </div>
 
@@ -1,3 +1,6 @@
+// Server-side chat session; the backend assigns one on the first message.
+let sessionId = ''
+
 export async function sendMessage(message, history = [], onChunk) {
   try {
     const response = await fetch('http://127.0.0.1:5000/chat', {
@@ -6,7 +9,7 @@ export async function sendMessage(message, history = [], onChunk) {
         'Content-Type': 'application/json',
         Accept: 'text/event-stream',
       },
-      body: JSON.stringify({ message, history }),
+      body: JSON.stringify({ message, session_id: sessionId }),
     })
 
     if (!response.ok) {
@@ -38,6 +41,9 @@ export async function sendMessage(message, history = [], onChunk) {
 
         try {
           const parsed = JSON.parse(payload)
+          if (parsed.session_id) {
+            sessionId = parsed.session_id
+          }
           if (parsed.error) {
             return { done: true, error: parsed.error }
           }
@@ -74,3 +80,30 @@ export async function sendMessage(message, history = [], onChunk) {
     throw error
   }
 }
+
+export async function searchMedications(query, limit = 10) {
+  const params = new URLSearchParams({ q: query, limit: String(limit) })
+  const response = await fetch(`http://127.0.0.1:5000/api/medications/search?${params}`)
+  const body = await response.json()
+  if (!response.ok) {
+    throw new Error(body.error || `API error ${response.status}`)
+  }
+  return body.results
+}
+
+// Live change feed: calls onEvent(type, data) for each stock, prescription,
+// debt or budget change on the given topics (e.g. 'user:User_Gal', 'med:med_acamol').
+// userId must be the user of any 'user:' topic, or a manager for other users'
+// and 'branch:' topics. 'resync' means events were missed and the caller
+// should refetch. Returns a close function.
+export function subscribeChanges(topics, onEvent, { userId = '', branch = '' } = {}) {
+  const params = new URLSearchParams()
+  topics.forEach((topic) => params.append('topic', topic))
+  if (userId) params.set('user_id', userId)
+  if (branch) params.set('branch', branch)
+  const source = new EventSource(`http://127.0.0.1:5000/api/events?${params}`)
+  for (const type of ['stock', 'prescription', 'debt', 'budget', 'resync']) {
+    source.addEventListener(type, (event) => onEvent(type, JSON.parse(event.data)))
+  }
+  return () => source.close()
+}